@@ -0,0 +1,95 @@
+"""
+Local-memory cache with a byte budget.
+
+Django's LocMemCache caps the number of entries (MAX_ENTRIES) and culls a
+fraction of them when full, whatever their size; a few large list responses
+can use far more memory than intended. This backend also caps the pickled
+size of all entries (OPTIONS['MAX_BYTES']) and evicts least recently used
+entries first until a new one fits. Entries larger than the budget are not
+stored.
+
+    CACHES = {'default': {
+        'BACKEND': 'deleveryno.cache.BoundedLocMemCache',
+        'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024},
+    }}
+
+Like LocMemCache, each process has its own copy; use a shared backend
+(REDIS_URL) when several workers must see each other's invalidations.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Per cache name, shared by every instance in the process like LocMemCache's
+_sizes = {}
+_totals = {}
+
+
+class BoundedLocMemCache(LocMemCache):
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', DEFAULT_MAX_BYTES))
+        self._sizes = _sizes.setdefault(name, {})
+        # [bytes stored, evictions]
+        self._totals = _totals.setdefault(name, [0, 0])
+
+    def _forget(self, key):
+        self._totals[0] -= self._sizes.pop(key, 0)
+
+    def _evict_lru(self):
+        # LocMemCache keeps the most recently used entries first
+        key, _ = self._cache.popitem()
+        self._expire_info.pop(key, None)
+        self._forget(key)
+        self._totals[1] += 1
+
+    def _set(self, key, value, timeout=None):
+        self._delete(key)
+        size = len(value)
+        if size > self._max_bytes:
+            return
+        while self._cache and self._totals[0] + size > self._max_bytes:
+            self._evict_lru()
+        super()._set(key, value, timeout)
+        self._sizes[key] = size
+        self._totals[0] += size
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+            self._totals[0] = 0
+        else:
+            for _ in range(len(self._cache) // self._cull_frequency):
+                self._evict_lru()
+
+    def _delete(self, key):
+        self._forget(key)
+        return super()._delete(key)
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version)
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key in self._cache:
+                self._forget(key)
+                self._sizes[key] = len(self._cache[key])
+                self._totals[0] += self._sizes[key]
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+            self._totals[0] = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._cache),
+                'bytes': self._totals[0],
+                'max_bytes': self._max_bytes,
+                'evictions': self._totals[1],
+            }
@@ -0,0 +1,51 @@
+"""
+Response compression: brotli when the client accepts it and the brotli
+package is installed, gzip otherwise (Django's GZipMiddleware).
+
+Brotli runs at COMPRESSION_BROTLI_QUALITY (default 5): close to gzip's
+speed with noticeably smaller JSON. Streaming responses are left to gzip.
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+# Below this size compression isn't worth the CPU
+MIN_COMPRESS_LENGTH = 200
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if (
+            brotli is None
+            or response.streaming
+            or len(response.content) < MIN_COMPRESS_LENGTH
+            or response.has_header('Content-Encoding')
+            or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(
+            response.content,
+            mode=brotli.MODE_TEXT,
+            quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5),
+        )
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag no longer matches the bytes sent, see GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,59 @@
+"""
+Database settings built from DATABASE_URL-style environment variables.
+
+Every connection is persistent (DB_CONN_MAX_AGE) with health checks, so
+gunicorn workers don't reconnect on each request. SQLite connections are
+tuned for concurrent workers when they are opened:
+
+- WAL journal: readers don't block the writer and vice versa
+- synchronous=NORMAL: safe with WAL, avoids an fsync per commit
+- busy_timeout: wait for the write lock instead of failing with
+  "database is locked"
+- mmap_size / cache_size: serve hot pages from memory
+- IMMEDIATE transactions: take the write lock when a transaction starts,
+  so two workers can't deadlock upgrading read locks
+"""
+import os
+
+import dj_database_url
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Negative values are in KiB
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_options(pragmas=None):
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+
+def database_config(env, default=None, tuned=True):
+    """
+    Build a DATABASES entry from the URL in the env variable (or default).
+    Returns None when neither is set. With tuned=False, SQLite keeps its
+    default options (used to benchmark the difference).
+    """
+    if not os.environ.get(env) and not default:
+        return None
+    config = dj_database_url.config(
+        env=env,
+        default=default,
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=True,
+    )
+    if tuned and config['ENGINE'] == 'django.db.backends.sqlite3':
+        config.setdefault('OPTIONS', {}).update(sqlite_options())
+        # Test on a file like production: the default in-memory shared-cache
+        # database fails concurrent writers instead of waiting (busy_timeout)
+        name = str(config['NAME'])
+        config['TEST'] = {'NAME': os.path.join(os.path.dirname(name), 'test_' + os.path.basename(name))}
+    return config
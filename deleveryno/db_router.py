@@ -0,0 +1,103 @@
+"""
+Primary/replica database routing.
+
+When a 'replica' database is configured (DATABASE_REPLICA_URL), GET/HEAD
+requests to views that set `replica_reads = True` (lists, reports, exports)
+read from the replica. Everything else uses the primary ('default'):
+
+- writes, and any read that follows a write in the same request
+- authentication tokens and sessions, which must see fresh logins
+- every request from a client that wrote within REPLICA_STICKY_SECONDS,
+  so clients read their own writes even if the replica lags
+
+The write marker lives in the default cache, which every worker must share:
+settings refuse a replica without REDIS_URL.
+"""
+import contextvars
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_ALIAS = 'default'
+REPLICA_ALIAS = 'replica'
+STICKY_KEY = 'db:sticky:{}'
+
+# Apps whose reads always go to the primary
+PRIMARY_ONLY_APPS = {'authtoken', 'sessions', 'admin', 'contenttypes'}
+
+# Models whose reads always go to the primary
+PRIMARY_ONLY_MODELS = {'users.authtoken'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _client_identity(request):
+    """Token, session or address identifying the client for stickiness"""
+    identity = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _use_replica.get()
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+            and model._meta.label_lower not in PRIMARY_ONLY_MODELS
+        ):
+            return REPLICA_ALIAS
+        return PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Keep the rest of this request on the primary (read-after-write)
+        _use_replica.set(False)
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Decides per request whether reads may use the replica."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+        if request.method not in SAFE_METHODS and replica_configured():
+            cache.set(
+                STICKY_KEY.format(_client_identity(request)), True,
+                getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+        if (
+            request.method in ('GET', 'HEAD')
+            and getattr(view_class, 'replica_reads', False)
+            and replica_configured()
+            and not cache.get(STICKY_KEY.format(_client_identity(request)))
+        ):
+            _use_replica.set(True)
+        return None
@@ -13,12 +13,11 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
-import dj_database_url
-from pathlib import Path
-import os
-from dotenv import load_dotenv
+from .database import database_config
 
 
 load_dotenv()
@@ -71,9 +70,11 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'deleveryno.compression.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'deleveryno.db_router.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -104,13 +105,31 @@ WSGI_APPLICATION = 'deleveryno.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DATABASE_URL selects the engine (defaults to the local SQLite file).
+# Connection persistence and SQLite tuning are in deleveryno/database.py.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True') == 'True'
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'dbdeleveryno.sqlite3',
-    }
+    'default': database_config(
+        'DATABASE_URL',
+        default=f"sqlite:///{BASE_DIR / 'dbdeleveryno.sqlite3'}",
+        tuned=SQLITE_TUNING,
+    ),
 }
 
+# Optional read replica for list and report endpoints (see deleveryno/db_router.py).
+# Locally, point it at a second SQLite file kept in sync with `manage.py sync_replica`.
+# Needs REDIS_URL: the read-your-writes marker must be seen by every worker.
+replica = database_config('DATABASE_REPLICA_URL', tuned=SQLITE_TUNING)
+if replica:
+    DATABASES['replica'] = replica
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['deleveryno.db_router.PrimaryReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -131,6 +150,37 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (users/hashers.py). PASSWORD_HASHER picks the preferred
+# hasher (pbkdf2_sha256, scrypt or argon2, which needs argon2-cffi); the
+# others stay listed so existing hashes verify and are rehashed on login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2_sha256')
+_PASSWORD_HASHERS = {
+    'pbkdf2_sha256': 'users.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 870000))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+
+# API tokens (users/authentication.py)
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 30 * 24 * 60 * 60))
+TOKEN_LAST_USED_INTERVAL = int(os.environ.get('TOKEN_LAST_USED_INTERVAL', 60))
+
+# Password hashing processes for CSV user imports (users/imports.py)
+USER_IMPORT_WORKERS = int(os.environ.get('USER_IMPORT_WORKERS', os.cpu_count() or 1))
+
+# Failed-login rate limiting (users/login_limits.py)
+LOGIN_FAILURE_LIMIT = int(os.environ.get('LOGIN_FAILURE_LIMIT', 5))
+LOGIN_FAILURE_IP_LIMIT = int(os.environ.get('LOGIN_FAILURE_IP_LIMIT', 50))
+LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW', 15 * 60))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -158,6 +208,7 @@ AUTH_USER_MODEL = 'users.User'
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Specific CORS settings for ngrok
 CORS_ALLOWED_ORIGINS = [
@@ -169,7 +220,11 @@ CORS_ALLOWED_ORIGINS = [
 # Add to settings.py
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.ExpiringTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'mainapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -187,6 +242,72 @@ REST_FRAMEWORK = {
     'ALLOWED_VERSIONS': ['v1'],
 }
 
+# List endpoints serialize straight from .values() rows (mainapp/fastpath.py)
+FAST_LIST_SERIALIZATION = os.environ.get('FAST_LIST_SERIALIZATION', 'True') == 'True'
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+# A shared Redis cache lets every worker see the others' invalidations;
+# without it each process keeps its own memory-capped LRU cache
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'deleveryno.cache.BoundedLocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+                'MAX_BYTES': int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            },
+        }
+    }
+
+if 'replica' in DATABASES and not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured(
+        "DATABASE_REPLICA_URL needs REDIS_URL: with a per-process cache a client's "
+        "next request can reach a worker that never saw its write and read the lagging replica"
+    )
+
+# Per-user GET response cache (mainapp/response_cache.py). Invalidations only
+# reach the process that made them, so it needs the shared cache.
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', str(bool(os.environ.get('REDIS_URL')))) == 'True'
+if RESPONSE_CACHE_ENABLED and not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured("RESPONSE_CACHE_ENABLED needs REDIS_URL; each worker would serve its own stale copies")
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 60))
+
+# Stored results of Idempotency-Key requests (mainapp/idempotency.py)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Background jobs (mainapp/jobs.py, manage.py run_workers)
+JOB_RETRY_BASE_DELAY = int(os.environ.get('JOB_RETRY_BASE_DELAY', 10))
+JOB_RETRY_MAX_DELAY = int(os.environ.get('JOB_RETRY_MAX_DELAY', 3600))
+JOB_STALE_TIMEOUT = int(os.environ.get('JOB_STALE_TIMEOUT', 600))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
+# Seller webhooks (mainapp/webhooks.py, manage.py dispatch_webhooks)
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 50))
+WEBHOOK_TIMEOUT = int(os.environ.get('WEBHOOK_TIMEOUT', 5))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+WEBHOOK_DISPATCH_THREADS = int(os.environ.get('WEBHOOK_DISPATCH_THREADS', 8))
+# Allow http:// and private addresses, for local development only
+WEBHOOK_ALLOW_PRIVATE_HOSTS = os.environ.get('WEBHOOK_ALLOW_PRIVATE_HOSTS', 'False') == 'True'
+
+# Delivered/canceled orders not updated for this many days are moved to the
+# archive table by `manage.py archive_orders` (mainapp/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 90))
+
+# Monthly order partitions created ahead by `manage.py order_partitions`
+# (PostgreSQL only, mainapp/partitions.py)
+ORDER_PARTITIONS_AHEAD = int(os.environ.get('ORDER_PARTITIONS_AHEAD', 3))
+
+# Admin changelists use the database's row estimate above this many rows
+# (mainapp/admin_tools.py)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
 AUTHENTICATION_BACKENDS = [
     'users.auth_backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',  # Keep the default backend
@@ -209,4 +330,8 @@ FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 # Static files configuration
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Uploads waiting for the background workers (user imports); with several
+# machines, point it at a shared volume
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
\ No newline at end of file
@@ -1,26 +1,57 @@
 from django.contrib import admin
+from django.db.models import Q
+from .admin_tools import AutocompleteFilter, AutocompleteFilterMixin, EstimatedCountPaginator
 from .models import  Order, Stock , Message
+from .search import search_orders, search_terms
 
 
+class SellerFilter(AutocompleteFilter):
+    field_name = 'seller'
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'customer_name', 'seller', 'driver', 'item', 'quantity', 'status', 'created_at')
     list_filter = ('status', 'created_at')
+    list_select_related = ('seller', 'driver')
     search_fields = ('customer_name', 'customer_phone', 'item', 'delivery_street', 'delivery_city')
     readonly_fields = ('created_at', 'updated_at')
     raw_id_fields = ('seller', 'driver')  
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the order search index instead of icontains scans over search_fields
+        terms = search_term.split()
+        if not terms:
+            return queryset, False
+        if len(search_terms(search_term)) < len(terms):
+            # Some term is too short for the trigram index; scan like Django does
+            return super().get_search_results(request, queryset, search_term)
+        # The index doesn't cover delivery_city: every term matches the index or the city
+        for term in terms:
+            indexed = search_orders(Order.objects.all(), term).values('pk')
+            queryset = queryset.filter(Q(pk__in=indexed) | Q(delivery_city__icontains=term))
+        return queryset, False
 
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
+class StockAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('id', 'seller', 'item_name', 'quantity')
-    list_filter = ('seller',)
+    # An autocomplete rather than a sidebar entry for every user
+    list_filter = (SellerFilter,)
+    list_select_related = ('seller',)
     search_fields = ('item_name',)
+    autocomplete_fields = ('seller',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'sender', 'recipient', 'subject', 'status', 'created_at')
     list_filter = ('status', 'created_at')
+    list_select_related = ('sender', 'recipient')
     search_fields = ('subject', 'content')
     readonly_fields = ('created_at', 'updated_at')
-    raw_id_fields = ('sender', 'recipient')
\ No newline at end of file
+    raw_id_fields = ('sender', 'recipient')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class MainappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mainapp'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import signals
+
+        post_migrate.connect(signals.ensure_order_search_index, sender=self)
+        # Register background job tasks from every app's tasks.py
+        autodiscover_modules('tasks')
@@ -0,0 +1,179 @@
+"""
+Archival of finished orders.
+
+Delivered and canceled orders can't change status any more, but kept in the
+order table they grow every index and scan the live endpoints use.
+`manage.py archive_orders` moves the ones not updated for
+ORDER_ARCHIVE_AFTER_DAYS (default 90) to the ArchivedOrder table, in chunks:
+each chunk is one INSERT ... SELECT and one DELETE in a transaction, so an
+order is always in exactly one of the tables. The delete skips the ORM, so
+the cached responses of the affected sellers and drivers are invalidated
+once per chunk; the search index triggers drop the rows from the index.
+
+Reads don't see the archive unless asked. Order list and detail views with
+ArchiveReadThroughMixin also read it for ?include_archived=1, and the order
+list does for a date range archived orders can fall in: min_date before the
+hot window, or a max_date with no min_date. Lists merge both tables by
+-updated_at. ?q= searches current orders only.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.response import Response
+
+from .models import ArchivedOrder, Order
+from .response_cache import invalidate_orders
+
+TERMINAL_STATUSES = [name for name, allowed in Order.VALID_TRANSITIONS.items() if not allowed]
+
+
+def hot_window_start(now=None):
+    """Orders updated before this can be in the archive."""
+    days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _move_to_archive(ids, archived_at):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in Order._meta.concrete_fields)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(ArchivedOrder._meta.db_table)} ({columns}, {quote('archived_at')}) "
+            f"SELECT {columns}, %s FROM {quote(Order._meta.db_table)} WHERE id IN ({placeholders})",
+            [connection.ops.adapt_datetimefield_value(archived_at), *ids],
+        )
+        cursor.execute(f"DELETE FROM {quote(Order._meta.db_table)} WHERE id IN ({placeholders})", ids)
+
+
+def archive_orders(cutoff=None, batch_size=500):
+    """Move terminal orders last updated before cutoff to the archive. Returns the number moved."""
+    cutoff = cutoff or hot_window_start()
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Order.objects.select_for_update()
+                .filter(status__in=TERMINAL_STATUSES, updated_at__lt=cutoff)
+                .order_by('updated_at')
+                .values_list('pk', 'seller_id', 'driver_id')[:batch_size]
+            )
+            if not rows:
+                return total
+            _move_to_archive([pk for pk, _, _ in rows], timezone.now())
+            invalidate_orders({seller_id for _, seller_id, _ in rows}, {driver_id for _, _, driver_id in rows})
+        total += len(rows)
+
+
+class ReadThroughRows:
+    """
+    Two querysets ordered by -updated_at, read as one list. A slice [a:b]
+    reads the first b rows of each and merges them, so deep pages cost
+    like an OFFSET on a single table.
+    """
+    ordered = True
+
+    def __init__(self, current, archived, key):
+        self.current = current
+        self.archived = archived
+        self.key = key
+
+    def count(self):
+        return self.current.count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        current = self.current if stop is None else self.current[:stop]
+        archived = self.archived if stop is None else self.archived[:stop]
+        merged = heapq.merge(current, archived, key=self.key, reverse=True)
+        return list(merged)[start:stop]
+
+
+def _updated_at(row):
+    return row['updated_at'] if isinstance(row, dict) else row.sort_updated_at
+
+
+class ArchiveReadThroughMixin:
+    """
+    Order views that also read archived orders when asked. Views provide
+    get_archive_queryset(), scoped like get_queryset(); archived orders are
+    read-only, so only GET and HEAD read through.
+    """
+    # (lower, upper) date filter params; a range starting before the hot
+    # window, or open below, reaches the archive
+    archive_date_range = None
+
+    def include_archived(self):
+        request = self.request
+        if request.method not in ('GET', 'HEAD') or request.query_params.get('q'):
+            return False
+        if request.query_params.get('include_archived', '').lower() in ('1', 'true'):
+            return True
+        if self.archive_date_range is None:
+            return False
+        lower, upper = (parse_date(request.query_params.get(param, '')) for param in self.archive_date_range)
+        if lower is None:
+            return upper is not None
+        return lower < hot_window_start().date()
+
+    def get_archive_queryset(self):
+        return ArchivedOrder.objects.none()
+
+    def filter_archive_queryset(self, queryset):
+        """The view's filters and serializer narrowing, applied to archived orders"""
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is not None:
+            queryset = filterset_class(self.request.query_params, queryset=queryset, request=self.request).qs
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'narrow_queryset'):
+            queryset = serializer_class.narrow_queryset(queryset, self.request)
+        return queryset
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if not self.include_archived():
+                raise
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_archive_queryset(self.get_archive_queryset())
+        instance = queryset.filter(**{self.lookup_field: self.kwargs[lookup]}).first()
+        if instance is None:
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def list(self, request, *args, **kwargs):
+        if not self.include_archived():
+            return super().list(request, *args, **kwargs)
+
+        current = self.filter_queryset(self.get_queryset())
+        archived = self.filter_archive_queryset(self.get_archive_queryset())
+        if self.use_values_serializer(request):
+            serializer = self.values_serializer_class()
+            rows = ReadThroughRows(serializer.values(current), serializer.values(archived), _updated_at)
+            serialize = serializer.serialize
+        else:
+            # Annotated, so ?fields= without updated_at doesn't defer the sort key
+            rows = ReadThroughRows(
+                current.annotate(sort_updated_at=F('updated_at')),
+                archived.annotate(sort_updated_at=F('updated_at')),
+                _updated_at,
+            )
+            serialize = lambda page: self.get_serializer(page, many=True).data
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize(page))
+        return Response(serialize(rows[:]))
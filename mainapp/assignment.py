@@ -0,0 +1,125 @@
+"""
+Automatic assignment of pending orders to drivers.
+
+Orders are matched to approved drivers working in the same city as the
+delivery, and spread so that each order goes to the driver with the fewest
+open orders at that moment. Planning happens in memory; the resulting
+assignments are written with one UPDATE per driver inside a single
+transaction.
+"""
+import heapq
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Order
+from .response_cache import invalidate_orders
+from .webhooks import record_order_events
+
+User = get_user_model()
+
+# Statuses in which an order still occupies a driver
+OPEN_ORDER_STATUSES = ['assigned', 'in_transit', 'no_answer', 'postponed']
+
+
+def normalize_city(city):
+    return (city or '').strip().casefold()
+
+
+def plan_assignments(orders, drivers, open_counts, max_open_orders=None):
+    """
+    Match orders to drivers without touching the database.
+
+    orders: iterable of (order_id, delivery_city), in priority order
+    drivers: iterable of (driver_id, city)
+    open_counts: mapping of driver_id to the number of orders already open
+    max_open_orders: optional cap on a driver's open orders
+
+    Returns (assignments, unassigned) where assignments maps order_id to
+    driver_id and unassigned lists orders with no available driver in their city.
+    """
+    heaps = defaultdict(list)
+    for driver_id, city in drivers:
+        heaps[normalize_city(city)].append((open_counts.get(driver_id, 0), driver_id))
+    for heap in heaps.values():
+        heapq.heapify(heap)
+
+    assignments = {}
+    unassigned = []
+    for order_id, city in orders:
+        heap = heaps.get(normalize_city(city))
+        if not heap or (max_open_orders is not None and heap[0][0] >= max_open_orders):
+            unassigned.append(order_id)
+            continue
+        load, driver_id = heap[0]
+        heapq.heapreplace(heap, (load + 1, driver_id))
+        assignments[order_id] = driver_id
+    return assignments, unassigned
+
+
+def assign_pending_orders(order_ids=None, driver_ids=None, dry_run=False, max_open_orders=None):
+    """
+    Assign pending orders to approved drivers in the same city.
+
+    order_ids / driver_ids narrow the batch; by default every pending order and
+    every approved, active driver is considered. Oldest orders are served first.
+    With dry_run the plan is returned without writing anything.
+    """
+    orders = Order.objects.filter(status='pending', driver__isnull=True)
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+    orders = list(orders.order_by('created_at', 'id').values_list('id', 'delivery_city'))
+
+    drivers = User.objects.filter(role='driver', approved=True, is_active=True)
+    if driver_ids is not None:
+        drivers = drivers.filter(pk__in=driver_ids)
+    drivers = list(drivers.values_list('id', 'city'))
+
+    open_counts = dict(
+        Order.objects.filter(driver_id__in=[driver_id for driver_id, _ in drivers],
+                             status__in=OPEN_ORDER_STATUSES)
+        .order_by()
+        .values_list('driver_id')
+        .annotate(total=Count('id'))
+    )
+
+    assignments, unassigned = plan_assignments(orders, drivers, open_counts, max_open_orders)
+
+    if not dry_run and assignments:
+        by_driver = defaultdict(list)
+        for order_id, driver_id in assignments.items():
+            by_driver[driver_id].append(order_id)
+
+        now = timezone.now()
+        with transaction.atomic():
+            for driver_id, driver_order_ids in by_driver.items():
+                # The status filter keeps orders changed since planning untouched
+                updated = Order.objects.filter(
+                    pk__in=driver_order_ids, status='pending', driver__isnull=True
+                ).update(driver_id=driver_id, status='assigned', updated_at=now)
+                if updated != len(driver_order_ids):
+                    still_assigned = set(
+                        Order.objects.filter(pk__in=driver_order_ids, driver_id=driver_id)
+                        .values_list('id', flat=True)
+                    )
+                    for order_id in driver_order_ids:
+                        if order_id not in still_assigned:
+                            del assignments[order_id]
+            if assignments:
+                assigned = list(
+                    Order.objects.filter(pk__in=list(assignments)).order_by()
+                    .values('id', 'seller_id', 'status', 'driver_id', 'updated_at')
+                )
+                invalidate_orders({order['seller_id'] for order in assigned}, set(assignments.values()))
+                record_order_events(
+                    'order.assigned', assigned, {order['id']: 'pending' for order in assigned}
+                )
+
+    return {
+        'dry_run': dry_run,
+        'assignments': assignments,
+        'unassigned': unassigned,
+    }
@@ -0,0 +1,174 @@
+"""
+Bulk order operations for admins.
+
+Assigning or moving many orders one request at a time costs a lookup, a
+re-fetch in Order.clean, a full save and a nested re-serialization per
+order. These helpers validate every order against Order.VALID_TRANSITIONS in
+memory, then apply one UPDATE per target state inside a transaction and
+return an outcome per order.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, Stock
+from .response_cache import invalidate_orders, invalidate_stock
+from .webhooks import record_order_events
+
+# Upper bound on the number of orders handled in one request
+BULK_MAX_ORDERS = 1000
+
+
+def _lock_orders(order_ids):
+    return {
+        row['id']: row
+        for row in Order.objects.select_for_update()
+        .filter(pk__in=order_ids)
+        .order_by()
+        .values('id', 'status', 'driver_id', 'seller_id', 'item', 'quantity')
+    }
+
+
+def _outcome(order_id, result, **extra):
+    return {'id': order_id, 'result': result, **extra}
+
+
+def apply_stock_on_transit(orders):
+    """
+    Decrement stock for orders entering in_transit, reading and writing each
+    affected stock row once. Orders are applied in sequence so an order that
+    doesn't fit in the remaining stock is skipped, as in the single update path.
+    Returns a mapping of order id to warning message for skipped orders.
+    """
+    warnings = {}
+    if not orders:
+        return warnings
+
+    stocks = {}
+    for stock in Stock.objects.select_for_update().filter(
+        seller_id__in={order['seller_id'] for order in orders},
+        item_name__in={order['item'] for order in orders},
+    ).order_by('id'):
+        stocks.setdefault((stock.seller_id, stock.item_name), stock)
+
+    changed = {}
+    for order in orders:
+        stock = stocks.get((order['seller_id'], order['item']))
+        if stock is None:
+            warnings[order['id']] = f"Stock not found for item {order['item']}"
+        elif stock.quantity >= order['quantity']:
+            stock.quantity -= order['quantity']
+            changed[stock.pk] = stock
+        else:
+            warnings[order['id']] = (
+                f"Insufficient stock for item {order['item']}. "
+                f"Required: {order['quantity']}, Available: {stock.quantity}"
+            )
+
+    if changed:
+        now = timezone.now()
+        for stock in changed.values():
+            stock.updated_at = now
+        Stock.objects.bulk_update(changed.values(), ['quantity', 'updated_at'])
+        invalidate_stock({stock.seller_id for stock in changed.values()})
+    return warnings
+
+
+def bulk_update_status(order_ids, new_status):
+    """
+    Move several orders to new_status.
+    Returns a list of per-order outcomes in the order the ids were given.
+    """
+    outcomes = {}
+    with transaction.atomic():
+        orders = _lock_orders(order_ids)
+        to_update = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                outcomes[order_id] = _outcome(order_id, 'error', error="Order not found")
+            elif order['status'] == new_status:
+                outcomes[order_id] = _outcome(order_id, 'unchanged', status=new_status)
+            elif not Order.is_valid_transition(order['status'], new_status):
+                outcomes[order_id] = _outcome(
+                    order_id, 'error',
+                    error=f"Invalid status transition from {order['status']} to {new_status}"
+                )
+            else:
+                to_update.append(order)
+                outcomes[order_id] = _outcome(order_id, 'updated', status=new_status)
+
+        if to_update:
+            now = timezone.now()
+            Order.objects.filter(pk__in=[order['id'] for order in to_update]).update(
+                status=new_status, updated_at=now
+            )
+            invalidate_orders(
+                {order['seller_id'] for order in to_update}, {order['driver_id'] for order in to_update}
+            )
+            record_order_events(
+                'order.status_changed',
+                [{**order, 'status': new_status, 'updated_at': now} for order in to_update],
+                {order['id']: order['status'] for order in to_update},
+            )
+            if new_status == 'in_transit':
+                for order_id, warning in apply_stock_on_transit(to_update).items():
+                    outcomes[order_id]['warning'] = warning
+
+    return [outcomes[order_id] for order_id in order_ids]
+
+
+def bulk_assign_driver(order_ids, driver):
+    """
+    Assign several orders to one driver, moving them to 'assigned'.
+    Returns a list of per-order outcomes in the order the ids were given.
+    """
+    outcomes = {}
+    with transaction.atomic():
+        orders = _lock_orders(order_ids)
+        to_update = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                outcomes[order_id] = _outcome(order_id, 'error', error="Order not found")
+            elif order['status'] == 'assigned' and order['driver_id'] == driver.pk:
+                outcomes[order_id] = _outcome(order_id, 'unchanged', driver_id=driver.pk)
+            elif not Order.is_valid_transition(order['status'], 'assigned'):
+                outcomes[order_id] = _outcome(
+                    order_id, 'error',
+                    error=f"Invalid status transition from {order['status']} to assigned"
+                )
+            else:
+                to_update.append(order_id)
+                outcomes[order_id] = _outcome(order_id, 'updated', driver_id=driver.pk)
+
+        if to_update:
+            now = timezone.now()
+            Order.objects.filter(pk__in=to_update).update(
+                driver=driver, status='assigned', updated_at=now
+            )
+            invalidate_orders(
+                {orders[order_id]['seller_id'] for order_id in to_update},
+                {orders[order_id]['driver_id'] for order_id in to_update} | {driver.pk}
+            )
+            record_order_events(
+                'order.assigned',
+                [{**orders[order_id], 'status': 'assigned', 'driver_id': driver.pk, 'updated_at': now}
+                 for order_id in to_update],
+                {order_id: orders[order_id]['status'] for order_id in to_update},
+            )
+
+    return [outcomes[order_id] for order_id in order_ids]
+
+
+def summarize(outcomes):
+    counts = defaultdict(int)
+    for outcome in outcomes:
+        counts[outcome['result']] += 1
+    return {
+        'updated_count': counts['updated'],
+        'unchanged_count': counts['unchanged'],
+        'error_count': counts['error'],
+        'results': outcomes,
+    }
@@ -0,0 +1,79 @@
+"""
+Conditional GET (ETag / Last-Modified) for detail and list endpoints.
+
+The validators come from one small query on the view's scoped queryset,
+run before anything is serialized:
+
+- detail: the row's pk and updated_at
+- list:   COUNT(*) and MAX(updated_at) over the filtered queryset (the
+          count catches deletions, which don't move MAX(updated_at))
+
+Nested users are part of the representation, so the updated_at of the
+relations named in `conditional_related` is included too. The ETag also
+covers the user and the full URL (page, filters, ?fields=), so different
+representations of the same rows never share one.
+
+Lists revalidate with If-None-Match only: Last-Modified is sent, but a
+deleted row doesn't change it, so If-Modified-Since alone would hide the
+deletion.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _timestamps(values):
+    return [value for value in values if value is not None]
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET with 304 Not Modified when the client's ETag (or, for
+    detail views, Last-Modified date) still matches.
+    """
+    conditional_related = []
+
+    def get_validators(self, request, kwargs):
+        """(etag, last_modified datetime) or None when there is nothing to validate"""
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        related = [f'{name}__updated_at' for name in self.conditional_related]
+        if lookup in kwargs:
+            row = self.get_queryset().filter(
+                **{self.lookup_field: kwargs[lookup]}
+            ).values_list('pk', 'updated_at', *related).first()
+            if row is None:
+                return None  # Let the view answer 404
+            parts = list(row)
+            timestamps = _timestamps(row[1:])
+        else:
+            aggregates = {'count': Count('pk'), 'last': Max('updated_at')}
+            aggregates.update({name: Max(field) for name, field in zip(self.conditional_related, related)})
+            result = self.filter_queryset(self.get_queryset()).order_by().aggregate(**aggregates)
+            parts = list(result.values())
+            timestamps = _timestamps([result['last']] + [result[name] for name in self.conditional_related])
+
+        last_modified = max(timestamps) if timestamps else None
+        digest = hashlib.sha1(
+            '|'.join(str(part) for part in [request.user.pk, request.get_full_path(), *parts]).encode()
+        ).hexdigest()
+        return f'W/"{digest}"', last_modified
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request, kwargs)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        is_detail = (self.lookup_url_kwarg or self.lookup_field) in kwargs
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=timestamp if is_detail else None
+        )
+        response = not_modified or super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
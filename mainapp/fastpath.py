@@ -0,0 +1,139 @@
+"""
+Read-only list serialization straight from .values() rows.
+
+ModelSerializer builds a model instance per row and runs every field's
+to_representation; for the large order lists that is most of the request
+time. The serializers here select the same columns with .values() (related
+users through a JOIN) and build the output dicts directly. The output is
+identical to the DRF serializers they stand in for:
+
+- OrderValuesSerializer    OrderDetailSerializer
+- StockValuesSerializer    StockSerializer
+- MessageValuesSerializer  MessageSerializer
+- UserValuesSerializer     UserSerializer
+
+List views opt in with FastListMixin. Requests using ?fields= / ?expand=
+(SparseFieldsMixin) keep the regular serializer, as does everything when
+the FAST_LIST_SERIALIZATION setting is False.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+USER_FIELDS = ['id', 'username', 'email', 'first_name', 'last_name', 'phone', 'city', 'role', 'approved', 'rib']
+
+
+def format_datetime(value):
+    """Same output as DRF's DateTimeField with the default ISO 8601 format."""
+    if not value:
+        return None
+    if settings.USE_TZ:
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def user_from_row(row, prefix=''):
+    """
+    The UserSerializer representation of the user columns under prefix,
+    or None for an empty (LEFT JOINed) relation. UserSerializer lists rib in
+    Meta.fields, so it is present for every role; its seller-only branch in
+    to_representation returns the same value.
+    """
+    if row[prefix + 'id'] is None:
+        return None
+    return {name: row[prefix + name] for name in USER_FIELDS}
+
+
+class ValuesSerializer:
+    """
+    Base class: `fields` in output order, `relations` naming the user foreign
+    keys rendered as nested users, `datetime_fields` formatted like DRF.
+    """
+    fields = []
+    relations = []
+    datetime_fields = []
+
+    def columns(self):
+        columns = []
+        for name in self.fields:
+            if name in self.relations:
+                columns.extend(f'{name}__{field}' for field in USER_FIELDS)
+            else:
+                columns.append(name)
+        return columns
+
+    def values(self, queryset):
+        return queryset.values(*self.columns())
+
+    def to_representation(self, row):
+        data = {}
+        for name in self.fields:
+            if name in self.relations:
+                data[name] = user_from_row(row, f'{name}__')
+            elif name in self.datetime_fields:
+                data[name] = format_datetime(row[name])
+            else:
+                data[name] = row[name]
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    fields = [
+        'id', 'seller', 'driver', 'customer_name', 'customer_phone',
+        'delivery_street', 'delivery_city', 'delivery_location',
+        'delivery_latitude', 'delivery_longitude', 'location_short_link',
+        'item', 'quantity', 'status', 'comment',
+        'created_at', 'updated_at'
+    ]
+    relations = ['seller', 'driver']
+    datetime_fields = ['created_at', 'updated_at']
+
+
+class StockValuesSerializer(ValuesSerializer):
+    fields = ['id', 'seller', 'item_name', 'quantity', 'approved', 'created_at', 'updated_at']
+    relations = ['seller']
+    datetime_fields = ['created_at', 'updated_at']
+
+
+class MessageValuesSerializer(ValuesSerializer):
+    fields = ['id', 'sender', 'recipient', 'subject', 'content', 'status', 'created_at', 'updated_at']
+    relations = ['sender', 'recipient']
+    datetime_fields = ['created_at', 'updated_at']
+
+
+class UserValuesSerializer(ValuesSerializer):
+    fields = USER_FIELDS
+
+    def to_representation(self, row):
+        return user_from_row(row)
+
+
+class FastListMixin:
+    """
+    Serves GET list requests through `values_serializer_class`, paginated
+    like the regular response.
+    """
+    values_serializer_class = None
+
+    def use_values_serializer(self, request):
+        if self.values_serializer_class is None or not getattr(settings, 'FAST_LIST_SERIALIZATION', True):
+            return False
+        # Sparse fieldsets reshape the response; leave them to the serializer
+        return 'fields' not in request.query_params and 'expand' not in request.query_params
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer(request):
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class()
+        rows = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
@@ -0,0 +1,79 @@
+"""
+Offline helpers for delivery coordinates.
+
+Coordinates are extracted from the Google Maps link stored in
+Order.delivery_location without any network call. Short links
+(goo.gl / maps.app.goo.gl) only redirect to the real URL, so they are
+flagged instead of resolved.
+"""
+import math
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+EARTH_RADIUS_KM = 6371.0088
+
+SHORT_LINK_PREFIXES = ('https://goo.gl/maps', 'https://maps.app.goo.gl')
+
+_NUMBER = r'[-+]?\d{1,3}(?:\.\d+)?'
+_AT_PATTERN = re.compile(rf'@({_NUMBER}),({_NUMBER})')
+_PLACE_PATTERN = re.compile(rf'!3d({_NUMBER})!4d({_NUMBER})')
+_PAIR_PATTERN = re.compile(rf'^(?:loc:)?\s*({_NUMBER})\s*,\s*({_NUMBER})\s*$')
+
+
+def is_short_maps_link(value):
+    return bool(value) and value.strip().startswith(SHORT_LINK_PREFIXES)
+
+
+def _valid(lat, lng):
+    lat, lng = float(lat), float(lng)
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None
+
+
+def parse_maps_coordinates(value):
+    """
+    Return (latitude, longitude) from a Google Maps link, or None.
+    Understands the '!3d..!4d..' place marker, '@lat,lng' and the
+    'q=' / 'll=' / 'query=' query parameters.
+    """
+    if not value:
+        return None
+    value = value.strip()
+
+    # A place marker is the pin itself, '@' is only the viewport center
+    for pattern in (_PLACE_PATTERN, _AT_PATTERN):
+        match = pattern.search(value)
+        if match:
+            coordinates = _valid(*match.groups())
+            if coordinates:
+                return coordinates
+
+    params = parse_qs(urlparse(value).query)
+    for name in ('q', 'll', 'query'):
+        for candidate in params.get(name, []):
+            match = _PAIR_PATTERN.match(unquote(candidate))
+            if match:
+                coordinates = _valid(*match.groups())
+                if coordinates:
+                    return coordinates
+    return None
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometers."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat, lng, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing a circle."""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-9:
+        delta_lng = 180.0
+    else:
+        delta_lng = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return lat - delta_lat, lat + delta_lat, lng - delta_lng, lng + delta_lng
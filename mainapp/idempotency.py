@@ -0,0 +1,136 @@
+"""
+Idempotency-Key support for order creation and status updates.
+
+A client that may retry sends a unique Idempotency-Key header. The first
+request with a key runs normally and its successful (2xx) response is
+stored; any retry with the same key, from the same user, on the same
+method and path gets that stored response back (with an
+Idempotent-Replayed header) without the view running again, so no
+duplicate order is inserted and no stock is decremented twice.
+
+- The same key with a different body is rejected with 422.
+- A retry while the first request is still running gets 409.
+- Failed requests (4xx/5xx, exceptions) are not stored; retrying with the
+  same key runs the request again.
+
+Rows are kept for IDEMPOTENCY_KEY_TTL seconds (default 24h) and removed by
+`manage.py purge_idempotency_keys`.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# An in-progress row older than this belongs to a request that died
+IN_PROGRESS_TIMEOUT = timedelta(seconds=60)
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _claim(key, request_hash):
+    """
+    Insert the in-progress row for key. Returns None when claimed, or the
+    existing (request_hash, status_code, response_body, created_at) row.
+    """
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key, request_hash=request_hash)
+        return None
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(pk=key).values_list(
+            'request_hash', 'status_code', 'response_body', 'created_at'
+        ).first()
+
+
+def idempotent(handler):
+    """Decorator for APIView handler methods (post, patch, ...)."""
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        value = request.headers.get(HEADER)
+        if not value:
+            return handler(self, request, *args, **kwargs)
+        if len(value) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        key = _digest(request.user.pk, request.method, request.path, value)
+        request_hash = _digest(json.dumps(request.data, sort_keys=True, cls=JSONEncoder))
+
+        # Retries normally find the finished row with this one read
+        existing = IdempotencyKey.objects.filter(pk=key).values_list(
+            'request_hash', 'status_code', 'response_body', 'created_at'
+        ).first()
+        now = timezone.now()
+        if existing is not None and existing[3] < now - key_ttl():
+            IdempotencyKey.objects.filter(pk=key).delete()
+            existing = None
+        if existing is None:
+            existing = _claim(key, request_hash)
+        if existing is not None and existing[1] is None and existing[3] < now - IN_PROGRESS_TIMEOUT:
+            IdempotencyKey.objects.filter(pk=key, status_code__isnull=True).delete()
+            existing = _claim(key, request_hash)
+
+        if existing is not None:
+            stored_hash, status_code, body, _ = existing
+            if stored_hash != request_hash:
+                return Response(
+                    {"error": f"This {HEADER} was already used with a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if status_code is None:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still being processed"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            response = Response(json.loads(body) if body else None, status=status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=key).delete()
+            raise
+        if 200 <= response.status_code < 300:
+            IdempotencyKey.objects.filter(pk=key).update(
+                status_code=response.status_code,
+                response_body=json.dumps(response.data, cls=JSONEncoder) if response.data is not None else '',
+            )
+        else:
+            IdempotencyKey.objects.filter(pk=key).delete()
+        return response
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000):
+    """Delete rows older than the TTL in batches. Returns the number deleted."""
+    cutoff = timezone.now() - key_ttl()
+    total = 0
+    while True:
+        keys = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not keys:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=keys).delete()[0]
@@ -0,0 +1,171 @@
+"""
+Background jobs stored in the main database.
+
+Side effects that can be slow or fail (email, webhooks) are queued with
+enqueue() and run by `manage.py run_workers`, so requests never wait on
+an SMTP server. Enqueueing inside a transaction is atomic with the rest of
+the writes: a rolled-back request leaves no job behind.
+
+    @task(max_attempts=5)
+    def send_email(subject, message, recipient_list): ...
+
+    enqueue('send_email', subject=..., message=..., recipient_list=[...])
+
+Task modules are imported from every installed app's `tasks.py`.
+
+Workers claim due jobs in batches:
+
+- PostgreSQL / MySQL: SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+  workers never wait on or double-claim the same rows.
+- SQLite has no row locks: candidates are read, then taken with a
+  conditional UPDATE (status still 'queued') tagged with a claim token,
+  and only the rows carrying that token are run. Writes are serialized by
+  the database lock, so each row is claimed by exactly one worker.
+
+A failed job is retried after an exponential backoff (JOB_RETRY_BASE_DELAY
+seconds, doubled per attempt, capped at JOB_RETRY_MAX_DELAY, with jitter)
+until max_attempts, then marked failed with its last error. Jobs left
+'running' by a worker that died are requeued after JOB_STALE_TIMEOUT.
+Done and failed jobs are deleted JOB_RETENTION_DAYS (default 7) after they
+finished, by run_workers or `manage.py purge_jobs`.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func=None, *, name=None, max_attempts=5, clear_payload=False):
+    """
+    Register a function as a job task, under its name by default. With
+    clear_payload the job's payload is emptied once it is done or failed.
+    """
+    def register(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        func.clear_payload = clear_payload
+        TASKS[func.task_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(task_name, *, run_at=None, max_attempts=None, **payload):
+    """Queue a job; payload must be JSON-serializable keyword arguments."""
+    if callable(task_name):
+        task_name = task_name.task_name
+    func = TASKS.get(task_name)
+    if func is None:
+        raise KeyError(f"Unknown task '{task_name}'")
+    return Job.objects.create(
+        task=task_name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or func.max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', 10)
+    cap = getattr(settings, 'JOB_RETRY_MAX_DELAY', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(worker_id, limit):
+    """Take up to limit due jobs for worker_id, oldest first."""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(status='running', locked_by=worker_id, locked_at=now)
+        return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    ids = list(due.values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    Job.objects.filter(id__in=ids, status='queued').update(status='running', locked_by=token, locked_at=now)
+    return list(Job.objects.filter(id__in=ids, locked_by=token).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    func = TASKS.get(job.task)
+    job.attempts += 1
+    try:
+        if func is None:
+            raise KeyError(f"Unknown task '{job.task}'")
+        func(**job.payload)
+    except Exception as exc:
+        job.last_error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            logger.error("Job %s (%s) failed after %s attempts: %s", job.pk, job.task, job.attempts, job.last_error)
+            _clear_payload(job, func)
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        job.locked_by = ''
+        job.locked_at = None
+        job.save(update_fields=[
+            'attempts', 'status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'payload', 'updated_at'
+        ])
+        return False
+
+    job.status = 'done'
+    job.last_error = ''
+    _clear_payload(job, func)
+    job.save(update_fields=['attempts', 'status', 'last_error', 'payload', 'updated_at'])
+    return True
+
+
+def _clear_payload(job, func):
+    if getattr(func, 'clear_payload', False):
+        job.payload = {}
+
+
+def requeue_stale_jobs():
+    """Release jobs whose worker stopped before finishing them."""
+    timeout = timedelta(seconds=getattr(settings, 'JOB_STALE_TIMEOUT', 600))
+    return Job.objects.filter(status='running', locked_at__lt=timezone.now() - timeout).update(
+        status='queued', locked_by='', locked_at=None
+    )
+
+
+def purge_finished_jobs(batch_size=1000):
+    """Delete done and failed jobs older than JOB_RETENTION_DAYS in batches. Returns the number deleted."""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'JOB_RETENTION_DAYS', 7))
+    total = 0
+    while True:
+        ids = list(
+            Job.objects.filter(status__in=['done', 'failed'], updated_at__lt=cutoff)
+            .order_by('updated_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += Job.objects.filter(pk__in=ids).delete()[0]
+
+
+def run_pending(worker_id='inline', limit=100):
+    """Run due jobs in the current thread until none are left. Returns the number run."""
+    total = 0
+    while True:
+        jobs = claim_jobs(worker_id, limit)
+        if not jobs:
+            return total
+        for job in jobs:
+            run_job(job)
+        total += len(jobs)
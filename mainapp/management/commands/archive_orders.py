@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mainapp.archive import archive_orders, hot_window_start
+
+
+class Command(BaseCommand):
+    help = "Move delivered and canceled orders older than the hot window to the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override ORDER_ARCHIVE_AFTER_DAYS")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        else:
+            cutoff = hot_window_start()
+        moved = archive_orders(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders last updated before {cutoff:%Y-%m-%d %H:%M}"))
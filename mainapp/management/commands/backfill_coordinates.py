@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import Order
+
+
+class Command(BaseCommand):
+    help = "Extract delivery coordinates from delivery_location for existing orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Reprocess every order, not only those without coordinates"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Order.objects.exclude(delivery_location='')
+        if not options['all']:
+            queryset = queryset.filter(delivery_latitude__isnull=True, location_short_link=False)
+
+        fields = ['delivery_latitude', 'delivery_longitude', 'location_short_link']
+        last_id = 0
+        processed = located = short_links = 0
+        while True:
+            # Keyset pagination keeps every batch an indexed range scan
+            batch = list(
+                queryset.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('id', 'delivery_location', *fields)[:batch_size]
+            )
+            if not batch:
+                break
+            for order in batch:
+                order.update_coordinates()
+                located += order.delivery_latitude is not None
+                short_links += order.location_short_link
+            Order.objects.bulk_update(batch, fields)
+            processed += len(batch)
+            last_id = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} orders: {located} located, {short_links} short links flagged"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import Order
+from mainapp.phones import normalize_e164
+
+
+class Command(BaseCommand):
+    help = "Fill customer_phone_normalized for existing orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Reprocess every order, not only those without a normalized phone"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Order.objects.exclude(customer_phone='')
+        if not options['all']:
+            queryset = queryset.filter(customer_phone_normalized='')
+
+        last_id = 0
+        processed = 0
+        while True:
+            # Keyset pagination keeps every batch an indexed range scan
+            batch = list(
+                queryset.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('id', 'customer_phone', 'customer_phone_normalized')[:batch_size]
+            )
+            if not batch:
+                break
+            for order in batch:
+                order.customer_phone_normalized = normalize_e164(order.customer_phone)
+            Order.objects.bulk_update(batch, ['customer_phone_normalized'])
+            processed += len(batch)
+            last_id = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Normalized phones for {processed} orders"))
@@ -0,0 +1,41 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.assignment import plan_assignments
+
+
+class Command(BaseCommand):
+    help = "Benchmark the automatic driver assignment planner on synthetic data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--drivers', type=int, default=500)
+        parser.add_argument('--cities', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cities = [f"City {index}" for index in range(options['cities'])]
+        orders = [(order_id, rng.choice(cities)) for order_id in range(options['orders'])]
+        drivers = [(driver_id, rng.choice(cities)) for driver_id in range(options['drivers'])]
+        open_counts = {driver_id: rng.randint(0, 10) for driver_id, _ in drivers}
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            assignments, unassigned = plan_assignments(orders, drivers, open_counts)
+            timings.append(time.perf_counter() - start)
+
+        loads = {}
+        for driver_id in assignments.values():
+            loads[driver_id] = loads.get(driver_id, 0) + 1
+        best = min(timings)
+        self.stdout.write(
+            f"{options['orders']} orders x {options['drivers']} drivers: "
+            f"best {best * 1000:.1f} ms, {options['orders'] / best:,.0f} orders/s; "
+            f"assigned {len(assignments)}, unassigned {len(unassigned)}, "
+            f"max per driver {max(loads.values(), default=0)}"
+        )
@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.geo import haversine_km
+from mainapp.routes import optimize_route
+
+
+class Command(BaseCommand):
+    help = "Benchmark delivery route ordering on random stops around a city center."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Roughly the size of Casablanca
+        points = [
+            (33.57 + rng.uniform(-0.1, 0.1), -7.59 + rng.uniform(-0.15, 0.15))
+            for _ in range(options['stops'])
+        ]
+
+        identity_km = sum(
+            haversine_km(*points[index - 1], *points[index]) for index in range(1, len(points))
+        )
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            _, legs = optimize_route(points)
+            timings.append(time.perf_counter() - start)
+
+        self.stdout.write(
+            f"{options['stops']} stops: best {min(timings) * 1000:.1f} ms; "
+            f"route {sum(legs):.1f} km vs {identity_km:.1f} km in input order"
+        )
@@ -0,0 +1,89 @@
+import gzip
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from mainapp.fastpath import OrderValuesSerializer
+from mainapp.models import Order
+from mainapp.renderers import FastJSONRenderer, orjson
+from mainapp.serializers import OrderDetailSerializer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rendering a driver's order list: OrderDetailSerializer + JSONRenderer "
+        "against the .values() path + FastJSONRenderer. Test rows are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs")
+
+    def create_rows(self, count):
+        tag = uuid.uuid4().hex[:8]
+        seller = User.objects.create(
+            username=f'bench-seller-{tag}', email=f'bench-seller-{tag}@example.com', role='seller', rib='RIB'
+        )
+        driver = User.objects.create(
+            username=f'bench-driver-{tag}', email=f'bench-driver-{tag}@example.com', role='driver'
+        )
+        Order.objects.bulk_create(
+            Order(
+                seller=seller, driver=driver, customer_name=f'Customer {number}',
+                customer_phone='0612345678', delivery_street=f'{number} Rue Ibn Battouta',
+                delivery_city='Casablanca', item='Phone case', quantity=1 + number % 3,
+                status='assigned', comment='Call before delivery' if number % 2 else None,
+            )
+            for number in range(count)
+        )
+        return Order.objects.filter(driver=driver).order_by('-updated_at')
+
+    def measure(self, render, repeat):
+        best, body = None, b''
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
+
+    def handle(self, *args, **options):
+        count, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            queryset = self.create_rows(count)
+
+            def drf():
+                data = OrderDetailSerializer(queryset.select_related('seller', 'driver'), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast():
+                serializer = OrderValuesSerializer()
+                return FastJSONRenderer().render(serializer.serialize(serializer.values(queryset)))
+
+            results = [('DRF serializer + JSONRenderer', *self.measure(drf, repeat)),
+                       ('.values() + FastJSONRenderer', *self.measure(fast, repeat))]
+            transaction.set_rollback(True)
+
+        if results[0][2] != results[1][2]:
+            self.stderr.write(self.style.ERROR("Outputs differ"))
+        self.stdout.write(f"{count} orders, best of {repeat} (orjson {'on' if orjson else 'not installed'})")
+        for label, elapsed, body in results:
+            self.stdout.write(f"{label:32} {count / elapsed:>10,.0f} rows/s  {elapsed * 1000:8.1f} ms")
+
+        body = results[1][2]
+        sizes = [f"raw {len(body):,} B", f"gzip {len(gzip.compress(body)):,} B"]
+        if brotli is not None:
+            sizes.append(f"brotli {len(brotli.compress(body, mode=brotli.MODE_TEXT, quality=5)):,} B")
+        self.stdout.write("Response size: " + ", ".join(sizes))
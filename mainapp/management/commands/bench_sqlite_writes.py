@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from deleveryno.database import sqlite_options
+
+ALIAS = 'bench'
+
+
+def _worker(path, tuned, worker_id, operations, results):
+    """One process standing in for a gunicorn worker: small write transactions"""
+    connections.settings[ALIAS] = connections.configure_settings({
+        'default': connections.settings['default'],
+        ALIAS: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+            'OPTIONS': sqlite_options() if tuned else {},
+        },
+    })[ALIAS]
+    done = errors = 0
+    try:
+        for number in range(operations):
+            try:
+                with transaction.atomic(using=ALIAS):
+                    with connections[ALIAS].cursor() as cursor:
+                        # Read-then-write, like a status update with a stock check
+                        cursor.execute("SELECT COUNT(*) FROM bench_writes WHERE worker = %s", [worker_id])
+                        cursor.fetchone()
+                        cursor.execute(
+                            "INSERT INTO bench_writes (worker, number, payload) VALUES (%s, %s, %s)",
+                            [worker_id, number, 'x' * 200]
+                        )
+                done += 1
+            except OperationalError:
+                errors += 1
+        connections[ALIAS].close()
+    finally:
+        results.put((done, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark SQLite write throughput from concurrent worker processes, "
+        "with default options and with the tuned options from deleveryno/database.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=300, help="Write transactions per worker")
+
+    def run(self, tuned, workers, operations):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            setup = sqlite3.connect(path)
+            setup.execute(
+                "CREATE TABLE bench_writes (id INTEGER PRIMARY KEY, worker INTEGER, number INTEGER, payload TEXT)"
+            )
+            setup.execute("CREATE INDEX bench_writes_worker ON bench_writes (worker)")
+            setup.commit()
+            setup.close()
+
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            processes = [
+                context.Process(target=_worker, args=(path, tuned, worker_id, operations, results))
+                for worker_id in range(workers)
+            ]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - start
+
+        done = sum(total[0] for total in totals)
+        errors = sum(total[1] for total in totals)
+        return done / elapsed, errors
+
+    def handle(self, *args, **options):
+        workers, operations = options['workers'], options['operations']
+        connections.close_all()
+        for label, tuned in [('default options', False), ('tuned (WAL)', True)]:
+            rate, errors = self.run(tuned, workers, operations)
+            self.stdout.write(
+                f"{label:16} {workers} workers x {operations} writes: "
+                f"{rate:,.0f} commits/s, {errors} 'database is locked' errors"
+            )
@@ -0,0 +1,53 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.webhooks import dispatch_webhooks, requeue_stale_events
+
+# How often to look for events abandoned by a dead dispatcher
+STALE_CHECK_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = "Deliver queued seller webhook events, in parallel across endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Endpoints sent to at once (default WEBHOOK_DISPATCH_THREADS)")
+        parser.add_argument('--limit', type=int, default=500,
+                            help="Events claimed per round")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when nothing is due")
+        parser.add_argument('--once', action='store_true',
+                            help="Deliver the events that are due, then exit")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        delivered = failed = 0
+        last_stale_check = 0
+
+        try:
+            while not stop.is_set():
+                if time.monotonic() - last_stale_check > STALE_CHECK_SECONDS:
+                    requeue_stale_events()
+                    last_stale_check = time.monotonic()
+
+                round_delivered, round_failed = dispatch_webhooks(options['limit'], options['threads'])
+                delivered += round_delivered
+                failed += round_failed
+                if not round_delivered and not round_failed:
+                    if options['once']:
+                        break
+                    stop.wait(options['poll_interval'])
+                elif options['once'] and not round_delivered:
+                    # Everything left is backing off
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+        self.stdout.write(f"Webhooks: {delivered} events delivered, {failed} failed attempts")
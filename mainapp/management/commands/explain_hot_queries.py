@@ -0,0 +1,123 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+User = get_user_model()
+
+# Plan lines that mean the database reads a whole table or sorts rows itself
+WARNING_PATTERNS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (?!.*USING (COVERING )?INDEX)(\w+)'), 'full scan'),
+        (re.compile(r'USE TEMP B-TREE'), 'temp sort'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan on (\w+)'), 'full scan'),
+        (re.compile(r'^\s*(->\s*)?Sort\b'), 'temp sort'),
+    ],
+}
+
+# Extra query strings worth checking for list views that filter on them
+SAMPLE_PARAMS = [
+    {},
+    {'status': 'pending'},
+    {'delivery_city': 'Casablanca'},
+    {'status': 'pending', 'delivery_city': 'Casablanca'},
+]
+
+
+def iter_views(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is not None and hasattr(view_class, 'get_queryset'):
+                yield prefix + str(pattern.pattern), view_class
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queryset of every list/detail API view, for each role, "
+        "and flag full table scans and temporary sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help="Run ANALYZE first so the planner has fresh statistics")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the full plan of every query")
+
+    def sample_user(self, role):
+        user = User.objects.filter(role=role).order_by('pk').first()
+        return user or User(pk=0, role=role, username=f'explain-{role}')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        patterns = WARNING_PATTERNS.get(connection.vendor, [])
+        factory = APIRequestFactory()
+        users = [self.sample_user(role) for role, _ in User.ROLE_CHOICES]
+        flagged = checked = 0
+
+        for route, view_class in iter_views(get_resolver().url_patterns):
+            is_detail = '<int:pk>' in route
+            filter_names = set(getattr(view_class, 'filterset_fields', None) or [])
+            filterset_class = getattr(view_class, 'filterset_class', None)
+            if filterset_class is not None:
+                filter_names |= set(filterset_class.base_filters)
+            params_list = [{}] if is_detail else [
+                params for params in SAMPLE_PARAMS if set(params) <= filter_names
+            ]
+            seen = set()
+            for user in users:
+                for params in params_list:
+                    request = Request(factory.get('/', params))
+                    request.user = user
+                    view = view_class()
+                    view.setup(request, pk=1)
+                    view.request = request
+                    view.format_kwarg = None
+                    try:
+                        queryset = view.get_queryset()
+                        if hasattr(view, 'filter_queryset'):
+                            queryset = view.filter_queryset(queryset)
+                    except Exception as exc:
+                        self.stdout.write(f"{route} [{user.role}] skipped: {exc}")
+                        continue
+                    queryset = queryset.filter(pk=1) if is_detail else queryset[:20]
+                    if queryset.query.is_empty():
+                        continue
+                    sql = str(queryset.query)
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+
+                    # SQLite prefixes plan rows with 'id parent notused'
+                    plan = re.sub(r'(?m)^\d+ \d+ \d+ ', '', queryset.explain())
+                    checked += 1
+                    warnings = []
+                    for line in plan.splitlines():
+                        for pattern, label in patterns:
+                            if pattern.search(line):
+                                warnings.append(f"{label}: {line.strip()}")
+
+                    label = f"{route} [{user.role}]" + (f" {params}" if params else '')
+                    if warnings:
+                        flagged += 1
+                        self.stdout.write(self.style.WARNING(label))
+                        for warning in warnings:
+                            self.stdout.write(f"    {warning}")
+                    elif options['verbose_plans']:
+                        self.stdout.write(self.style.SUCCESS(label))
+                    if options['verbose_plans']:
+                        for line in plan.splitlines():
+                            self.stdout.write(f"      {line}")
+
+        self.stdout.write(f"Checked {checked} queries, {flagged} flagged")
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp.partitions import ensure_partitions, is_partitioned, retire_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly order partitions for the coming months and, with "
+        "--retire-before, archive and drop older ones (PostgreSQL only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, help="Months to create ahead (default ORDER_PARTITIONS_AHEAD)")
+        parser.add_argument('--retire-before', help="YYYY-MM: retire the partitions of earlier months")
+        parser.add_argument(
+            '--no-archive', action='store_true',
+            help="Drop retired partitions without copying them to the archive table"
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write(
+                "The order table isn't partitioned (PostgreSQL only); "
+                "use archive_orders to move old orders out of it."
+            )
+            return
+
+        before = None
+        if options['retire_before']:
+            try:
+                before = datetime.strptime(options['retire_before'], '%Y-%m').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise CommandError("--retire-before must look like 2024-01")
+
+        for name in ensure_partitions(options['ahead']):
+            self.stdout.write(f"Created {name}")
+        if before is not None:
+            for name, outcome, rows in retire_partitions(before, archive=not options['no_archive']):
+                if outcome == 'skipped':
+                    self.stdout.write(self.style.WARNING(f"Kept {name}: {rows} orders are still open"))
+                else:
+                    self.stdout.write(f"{outcome.capitalize()} {name} ({rows} orders)")
+        self.stdout.write(self.style.SUCCESS("Order partitions are up to date"))
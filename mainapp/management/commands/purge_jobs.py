@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.jobs import purge_finished_jobs
+
+
+class Command(BaseCommand):
+    help = "Delete done and failed background jobs older than JOB_RETENTION_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_finished_jobs(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished jobs"))
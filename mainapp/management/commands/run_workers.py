@@ -0,0 +1,98 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from mainapp.jobs import claim_jobs, purge_finished_jobs, requeue_stale_jobs, run_job
+
+# How often to look for jobs abandoned by dead workers
+STALE_CHECK_SECONDS = 60
+
+# How often to delete finished jobs past JOB_RETENTION_DAYS
+PURGE_SECONDS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (email, webhooks) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Run the jobs that are due, then exit")
+
+    def run(self, job):
+        close_old_connections()
+        try:
+            return run_job(job)
+        finally:
+            close_old_connections()
+
+    def purge_if_due(self):
+        if self.last_purge is None or time.monotonic() - self.last_purge > PURGE_SECONDS:
+            purge_finished_jobs()
+            self.last_purge = time.monotonic()
+
+    def handle(self, *args, **options):
+        threads, poll_interval, once = options['threads'], options['poll_interval'], options['once']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        succeeded = failed = 0
+        self.last_purge = None
+
+        try:
+            if threads <= 1:
+                # Single-threaded: run everything in this thread
+                while not stop.is_set():
+                    requeue_stale_jobs()
+                    self.purge_if_due()
+                    jobs = claim_jobs(worker_id, 100)
+                    for job in jobs:
+                        if run_job(job):
+                            succeeded += 1
+                        else:
+                            failed += 1
+                    if once and not jobs:
+                        break
+                    if not jobs:
+                        stop.wait(poll_interval)
+            else:
+                with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as pool:
+                    running = set()
+                    last_stale_check = 0
+                    while not stop.is_set():
+                        if time.monotonic() - last_stale_check > STALE_CHECK_SECONDS:
+                            requeue_stale_jobs()
+                            self.purge_if_due()
+                            last_stale_check = time.monotonic()
+
+                        jobs = claim_jobs(worker_id, threads - len(running)) if len(running) < threads else []
+                        running |= {pool.submit(self.run, job) for job in jobs}
+                        if once and not running:
+                            break
+                        if running:
+                            # Claim again as soon as a thread is free
+                            done, running = wait(
+                                running, timeout=None if jobs or once else poll_interval,
+                                return_when=FIRST_COMPLETED
+                            )
+                            for future in done:
+                                if future.result():
+                                    succeeded += 1
+                                else:
+                                    failed += 1
+                        else:
+                            stop.wait(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+        self.stdout.write(f"Worker {worker_id} stopped: {succeeded} jobs succeeded, {failed} failed")
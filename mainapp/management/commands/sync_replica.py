@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from deleveryno.db_router import PRIMARY_ALIAS, REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the replica file. "
+        "Used to run the primary/replica setup locally."
+    )
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database configured (set DATABASE_REPLICA_URL)")
+        primary = connections[PRIMARY_ALIAS]
+        replica = connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("sync_replica only copies SQLite databases; use native replication otherwise")
+
+        replica.close()
+        primary.ensure_connection()
+        # The backup API copies a consistent snapshot even while the primary is in use
+        target = sqlite3.connect(str(replica.settings_dict['NAME']))
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']}"
+        ))
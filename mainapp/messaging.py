@@ -0,0 +1,121 @@
+"""
+Routing of support messages to admins.
+
+Sellers and drivers can send a message without choosing a recipient. Those
+messages are spread over the active admins instead of always landing on the
+first one. The admin pool and the per-admin count of open (unread) messages
+are kept in the cache, so routing a message does not query the users table
+or recount messages.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Message
+
+User = get_user_model()
+
+ADMIN_POOL_KEY = 'messaging:admin_pool'
+ROUND_ROBIN_KEY = 'messaging:round_robin'
+OPEN_COUNT_KEY = 'messaging:open:{}'
+
+# Safety net in case an invalidation is missed (e.g. raw SQL updates)
+ADMIN_POOL_TIMEOUT = getattr(settings, 'MESSAGE_ADMIN_POOL_TIMEOUT', 300)
+
+
+def _open_count_key(admin_id):
+    return OPEN_COUNT_KEY.format(admin_id)
+
+
+def get_admin_pool():
+    """
+    Return the ids of active admins, building and caching the pool if needed.
+    Open message counters are seeded in the same step with one aggregate query.
+    """
+    pool = cache.get(ADMIN_POOL_KEY)
+    if pool is not None:
+        return pool
+
+    pool = list(
+        User.objects.filter(role='admin', is_active=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    open_counts = dict(
+        Message.objects.filter(recipient_id__in=pool, status='unread')
+        .order_by()
+        .values_list('recipient_id')
+        .annotate(total=Count('id'))
+    )
+    cache.set_many(
+        {_open_count_key(admin_id): open_counts.get(admin_id, 0) for admin_id in pool},
+        ADMIN_POOL_TIMEOUT
+    )
+    cache.set(ADMIN_POOL_KEY, pool, ADMIN_POOL_TIMEOUT)
+    return pool
+
+
+def invalidate_admin_pool():
+    """Drop the cached admin pool so the next message rebuilds it."""
+    cache.delete(ADMIN_POOL_KEY)
+
+
+def _next_round_robin(pool):
+    cache.add(ROUND_ROBIN_KEY, 0, None)
+    try:
+        position = cache.incr(ROUND_ROBIN_KEY)
+    except ValueError:
+        # Key was evicted between add() and incr()
+        cache.set(ROUND_ROBIN_KEY, 0, None)
+        position = 0
+    return pool[position % len(pool)]
+
+
+def _least_open(pool):
+    keys = [_open_count_key(admin_id) for admin_id in pool]
+    counts = cache.get_many(keys)
+    if len(counts) != len(keys):
+        # Some counters were evicted, reseed them together with the pool
+        invalidate_admin_pool()
+        pool = get_admin_pool()
+        if not pool:
+            return None
+        counts = cache.get_many([_open_count_key(admin_id) for admin_id in pool])
+    return min(pool, key=lambda admin_id: (counts.get(_open_count_key(admin_id), 0), admin_id))
+
+
+def pick_admin_recipient():
+    """
+    Choose the admin that should receive a support message.
+    Returns the admin's id, or None if there is no active admin.
+
+    The strategy is set with MESSAGE_ROUTING_STRATEGY: 'least_open' (default)
+    picks the admin with the fewest unread messages, 'round_robin' rotates.
+    """
+    pool = get_admin_pool()
+    if not pool:
+        return None
+
+    strategy = getattr(settings, 'MESSAGE_ROUTING_STRATEGY', 'least_open')
+    if strategy == 'round_robin':
+        return _next_round_robin(pool)
+    return _least_open(pool)
+
+
+def message_opened(recipient_id):
+    """Count an unread message for an admin (called once the write commits)."""
+    try:
+        cache.incr(_open_count_key(recipient_id))
+    except ValueError:
+        # Counter not seeded (recipient is not in the pool), nothing to track
+        pass
+
+
+def message_closed(recipient_id):
+    """Release an admin's open message slot once a message leaves 'unread' or is deleted."""
+    try:
+        if cache.decr(_open_count_key(recipient_id)) < 0:
+            cache.set(_open_count_key(recipient_id), 0, ADMIN_POOL_TIMEOUT)
+    except ValueError:
+        pass
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace(replace("
+    "{row}.customer_phone, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', ''), '/', '')"
+)
+
+SQLITE_INSERT = (
+    "INSERT INTO mainapp_order_search"
+    "(rowid, customer_name, customer_phone, delivery_street, item, comment) "
+    "VALUES ({row}.id, {row}.customer_name, " + PHONE_DIGITS + ", "
+    "{row}.delivery_street, {row}.item, coalesce({row}.comment, ''));"
+)
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE mainapp_order_search USING fts5("
+    "customer_name, customer_phone, delivery_street, item, comment, tokenize='trigram')",
+    "CREATE TRIGGER mainapp_order_search_ai AFTER INSERT ON mainapp_order BEGIN "
+    + SQLITE_INSERT.format(row='new') + " END",
+    "CREATE TRIGGER mainapp_order_search_ad AFTER DELETE ON mainapp_order BEGIN "
+    "DELETE FROM mainapp_order_search WHERE rowid = old.id; END",
+    "CREATE TRIGGER mainapp_order_search_au AFTER UPDATE OF "
+    "customer_name, customer_phone, delivery_street, item, comment ON mainapp_order BEGIN "
+    "DELETE FROM mainapp_order_search WHERE rowid = old.id; "
+    + SQLITE_INSERT.format(row='new') + " END",
+    "INSERT INTO mainapp_order_search"
+    "(rowid, customer_name, customer_phone, delivery_street, item, comment) "
+    "SELECT id, customer_name, " + PHONE_DIGITS.format(row='mainapp_order') + ", "
+    "delivery_street, item, coalesce(comment, '') FROM mainapp_order",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS mainapp_order_search_au",
+    "DROP TRIGGER IF EXISTS mainapp_order_search_ad",
+    "DROP TRIGGER IF EXISTS mainapp_order_search_ai",
+    "DROP TABLE IF EXISTS mainapp_order_search",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS mainapp_order_search_trgm ON mainapp_order USING gin (("
+    "customer_name || ' ' || regexp_replace(customer_phone, '\\D', '', 'g') "
+    "|| ' ' || delivery_street || ' ' || item || ' ' || coalesce(comment, '')"
+    ") gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS mainapp_order_search_trgm",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0008_order_delivery_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
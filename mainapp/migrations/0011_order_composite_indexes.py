@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-19 11:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0010_order_customer_phone_normalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', '-updated_at'], name='mainapp_ord_seller__3ab345_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['driver', '-updated_at'], name='mainapp_ord_driver__bea192_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', 'status', '-updated_at'], name='mainapp_ord_seller__f4f2f6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_city', 'status'], name='mainapp_ord_deliver_e3e76f_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0014_webhooks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(max_length=255)),
+                ('customer_phone', models.CharField(max_length=20)),
+                ('customer_phone_normalized', models.CharField(blank=True, default='', max_length=20)),
+                ('delivery_street', models.CharField(max_length=255)),
+                ('delivery_city', models.CharField(max_length=100)),
+                ('delivery_location', models.CharField(blank=True, max_length=255)),
+                ('delivery_latitude', models.FloatField(blank=True, null=True)),
+                ('delivery_longitude', models.FloatField(blank=True, null=True)),
+                ('location_short_link', models.BooleanField(default=False)),
+                ('item', models.CharField(max_length=255)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Driver Assigned'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('canceled', 'Canceled'), ('no_answer', 'No Answer'), ('postponed', 'Postponed')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('comment', models.TextField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField()),
+                ('driver', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assigned_orders', to=settings.AUTH_USER_MODEL)),
+                ('seller', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'indexes': [models.Index(fields=['created_at'], name='mainapp_arc_created_31ea54_idx'), models.Index(fields=['seller', '-updated_at'], name='mainapp_arc_seller__55dea7_idx'), models.Index(fields=['driver', '-updated_at'], name='mainapp_arc_driver__6d5069_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,131 @@
+"""
+PostgreSQL only: rebuild mainapp_order as a table partitioned by month of
+created_at (see mainapp/partitions.py). Other databases are left alone.
+
+The rows, indexes, foreign keys and the id sequence move to the new table;
+the primary key becomes (id, created_at) because PostgreSQL requires the
+partition key in it. Partitions are created from the oldest order's month
+to three months ahead, plus a default partition.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'mainapp_order'
+DEFAULT_PARTITION = 'mainapp_order_default'
+MONTHS_AHEAD = 3
+
+
+def _month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+    return cursor.fetchone()[0] == 'p'
+
+
+def _detach_id_sequence(cursor):
+    """Free the id sequence from the current table and return its name."""
+    cursor.execute(
+        "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [TABLE]
+    )
+    if cursor.fetchone()[0]:
+        # Identity sequences are dropped with their column; use a plain one
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP IDENTITY")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq AS bigint")
+        return f'{TABLE}_id_seq'
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    return sequence
+
+
+def _rebuild(cursor, partitioned):
+    old = f'{TABLE}_old'
+    cursor.execute(
+        "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+        [TABLE],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [TABLE],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f"SELECT coalesce(max(id), 0), min(created_at) FROM {TABLE}")
+    highest, first = cursor.fetchone()
+
+    sequence = _detach_id_sequence(cursor)
+    cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {old}")
+    # Index names are unique per schema; the definitions are replayed below
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+
+    if partitioned:
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        month = _month_start(first or timezone.now())
+        last = _month_start(timezone.now())
+        for _ in range(MONTHS_AHEAD):
+            last = _next_month(last)
+        while month <= last:
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            )
+            month = _next_month(month)
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+    else:
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+    cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    cursor.execute(f"SELECT setval('{sequence}', %s, %s)", [max(highest, 1), highest > 0])
+
+    cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {old}")
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+    for _, definition in indexes:
+        cursor.execute(definition)
+    # Drops the old monthly partitions too when going backwards
+    cursor.execute(f"DROP TABLE {old}")
+
+
+def partition_orders(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _is_partitioned(cursor):
+            _rebuild(cursor, partitioned=True)
+
+
+def unpartition_orders(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if _is_partitioned(cursor):
+            _rebuild(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0015_archived_orders'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_orders, unpartition_orders),
+    ]
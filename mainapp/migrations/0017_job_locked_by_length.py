@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0016_partition_orders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .geo import is_short_maps_link, parse_maps_coordinates
+from .phones import normalize_e164
 
 
 
@@ -29,6 +33,8 @@ class Order(models.Model):
     # Customer details provided by the seller
     customer_name = models.CharField(max_length=255)
     customer_phone = models.CharField(max_length=20)
+    # E.164-style form of customer_phone, filled on save
+    customer_phone_normalized = models.CharField(max_length=20, blank=True, default='', editable=False)
     
     # Delivery address details (flattened from the previous Address model)
     delivery_street = models.CharField(max_length=255)
@@ -38,6 +44,14 @@ class Order(models.Model):
         blank=True, 
         help_text="Google Maps location string"
     )
+    # Coordinates extracted from delivery_location when the order is saved
+    delivery_latitude = models.FloatField(null=True, blank=True, editable=False)
+    delivery_longitude = models.FloatField(null=True, blank=True, editable=False)
+    location_short_link = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Short maps link whose coordinates can't be extracted offline"
+    )
     
     # Item details
     item = models.CharField(max_length=255)
@@ -61,6 +75,22 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     comment = models.TextField(blank=True, null=True, help_text="Additional notes about the order")
 
+    # Valid status transitions
+    VALID_TRANSITIONS = {
+        'pending': ['assigned', 'canceled'],
+        'assigned': ['in_transit', 'canceled', 'pending'],
+        'in_transit': ['delivered', 'no_answer', 'postponed', 'canceled'],
+        'no_answer': ['in_transit', 'canceled', 'postponed'],
+        'postponed': ['in_transit', 'canceled'],
+        'delivered': [],  # Terminal state
+        'canceled': [],   # Terminal state
+    }
+
+    @classmethod
+    def is_valid_transition(cls, old_status, new_status):
+        """Check a status change against the transition table (no-op changes are allowed)"""
+        return old_status == new_status or new_status in cls.VALID_TRANSITIONS.get(old_status, [])
+
     def clean(self):
         """Validate status transitions"""
         if not self.pk:
@@ -68,23 +98,19 @@ class Order(models.Model):
             
         old_instance = Order.objects.get(pk=self.pk)
         
-        # Define valid status transitions
-        valid_transitions = {
-            'pending': ['assigned', 'canceled'],
-            'assigned': ['in_transit', 'canceled', 'pending'],
-            'in_transit': ['delivered', 'no_answer', 'postponed', 'canceled'],
-            'no_answer': ['in_transit', 'canceled', 'postponed'],
-            'postponed': ['in_transit', 'canceled'],
-            'delivered': [],  # Terminal state
-            'canceled': [],   # Terminal state
-        }
-        
-        if (old_instance.status != self.status and 
-            self.status not in valid_transitions.get(old_instance.status, [])):
+        if not self.is_valid_transition(old_instance.status, self.status):
             raise ValidationError(f"Invalid status transition from {old_instance.status} to {self.status}")
     
+    def update_coordinates(self):
+        """Extract delivery coordinates from delivery_location"""
+        coordinates = parse_maps_coordinates(self.delivery_location)
+        self.delivery_latitude, self.delivery_longitude = coordinates or (None, None)
+        self.location_short_link = coordinates is None and is_short_maps_link(self.delivery_location)
+
     def save(self, *args, **kwargs):
         self.clean()
+        self.update_coordinates()
+        self.customer_phone_normalized = normalize_e164(self.customer_phone)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -97,6 +123,65 @@ class Order(models.Model):
             models.Index(fields=['seller']),
             models.Index(fields=['driver']),
             models.Index(fields=['-updated_at']),
+            models.Index(fields=['delivery_latitude', 'delivery_longitude']),
+            models.Index(fields=['customer_phone_normalized', 'seller']),
+            # Composite indexes for the scoped list queries (seller/driver lists
+            # ordered by -updated_at, optionally filtered by status or city)
+            models.Index(fields=['seller', '-updated_at']),
+            models.Index(fields=['driver', '-updated_at']),
+            models.Index(fields=['seller', 'status', '-updated_at']),
+            models.Index(fields=['delivery_city', 'status']),
+        ]
+
+
+class ArchivedOrder(models.Model):
+    """
+    A delivered or canceled order moved out of the order table by
+    `manage.py archive_orders` (see mainapp/archive.py). Same columns and
+    id as the order it was, plus archived_at; read-only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Covered by the (seller/driver, -updated_at) indexes
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_orders",
+        db_index=False
+    )
+    customer_name = models.CharField(max_length=255)
+    customer_phone = models.CharField(max_length=20)
+    customer_phone_normalized = models.CharField(max_length=20, blank=True, default='')
+    delivery_street = models.CharField(max_length=255)
+    delivery_city = models.CharField(max_length=100)
+    delivery_location = models.CharField(max_length=255, blank=True)
+    delivery_latitude = models.FloatField(null=True, blank=True)
+    delivery_longitude = models.FloatField(null=True, blank=True)
+    location_short_link = models.BooleanField(default=False)
+    item = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    driver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_assigned_orders",
+        db_index=False
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    comment = models.TextField(blank=True, null=True)
+    archived_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived order #{self.pk} for {self.customer_name}"
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['seller', '-updated_at']),
+            models.Index(fields=['driver', '-updated_at']),
         ]
 
 
@@ -172,7 +257,113 @@ class Message(models.Model):
     
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username}: {self.subject}"
-    
 
-    
 
+class IdempotencyKey(models.Model):
+    """
+    Stored result of a request sent with an Idempotency-Key header
+    (see mainapp/idempotency.py). The primary key is a digest of the user,
+    method, path and header value, so a retry is one primary-key read.
+    status_code stays null while the first request is still running.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in progress'})"
+
+
+class Job(models.Model):
+    """
+    A unit of background work (see mainapp/jobs.py), run by
+    `manage.py run_workers`.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest due jobs: WHERE status = 'queued' AND run_at <= now
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A URL a seller subscribes to for order events (see mainapp/webhooks.py).
+    Deliveries are signed with the endpoint's secret.
+    """
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="webhook_endpoints"
+    )
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', 'is_active']),
+        ]
+
+    def __str__(self):
+        return f"{self.seller_id} -> {self.url}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Outbox row: one event for one endpoint, written in the same transaction
+    as the order change and delivered later by the webhook dispatcher.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    ]
+
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name="events")
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Dispatcher: WHERE status = 'pending' AND next_attempt_at <= now
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} ({self.status})"
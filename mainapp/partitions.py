@@ -0,0 +1,145 @@
+"""
+Monthly partitions of the order table.
+
+On PostgreSQL, migration 0016_partition_orders makes mainapp_order a table
+partitioned by RANGE (created_at): one partition per calendar month (UTC),
+named mainapp_order_pYYYY_MM, and a default partition for rows outside
+them. Most reads touch the current and previous month, and:
+
+- OrderFilter's min_date/max_date compare created_at with constant
+  timestamps (day_start()), so the planner only reads the partitions in
+  range.
+- `manage.py order_partitions` creates the partitions for the coming
+  months (ORDER_PARTITIONS_AHEAD, default 3); run it monthly. A month's
+  partition can't be created while the default partition holds rows of that
+  month, so keep it ahead.
+- `manage.py order_partitions --retire-before YYYY-MM` copies every older
+  partition that holds only delivered/canceled orders into the archive
+  table (mainapp/archive.py), then detaches and drops it: one INSERT ...
+  SELECT and a DROP instead of a long DELETE. Partitions still holding open
+  orders are skipped.
+
+SQLite has no partitioning. Per-month tables there would need every write
+path (the search triggers, bulk UPDATEs, the archiver's SQL) to know about
+them, so on SQLite the order table stays whole: min_date/max_date are a
+range on the created_at index, and old orders leave through
+`manage.py archive_orders`.
+"""
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .archive import TERMINAL_STATUSES
+from .models import ArchivedOrder, Order
+from .response_cache import invalidate_orders
+
+TABLE = Order._meta.db_table
+PARTITION_NAME = re.compile(rf'{TABLE}_p(\d{{4}})_(\d{{2}})')
+
+
+def day_start(day):
+    """Aware datetime for the start of day in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned(using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+        return cursor.fetchone()[0] == 'p'
+
+
+def monthly_partitions(using='default'):
+    """[(name, month start)] of the order table's monthly partitions, oldest first."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.fullmatch(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(months_ahead=None, using='default'):
+    """Create this month's partition and the next months_ahead. Returns the names created."""
+    if not is_partitioned(using):
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'ORDER_PARTITIONS_AHEAD', 3)
+    existing = {name for name, _ in monthly_partitions(using)}
+    created = []
+    month = month_start(timezone.now())
+    with connections[using].cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            name = partition_name(month)
+            if name not in existing:
+                cursor.execute(
+                    f"CREATE TABLE {name} PARTITION OF {TABLE} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                )
+                created.append(name)
+            month = next_month(month)
+    return created
+
+
+def retire_partitions(before, archive=True, using='default'):
+    """
+    Archive (unless archive=False) and drop the monthly partitions of months
+    before `before`. Returns [(name, 'archived' | 'dropped' | 'skipped', rows)];
+    for skipped partitions rows counts the open orders keeping them.
+    """
+    if not is_partitioned(using):
+        return []
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in Order._meta.concrete_fields)
+    terminal = ', '.join(f"'{name}'" for name in TERMINAL_STATUSES)
+    results = []
+    for name, month in monthly_partitions(using):
+        if month >= month_start(before):
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            # Hold off writes to the partition until it is gone
+            cursor.execute(f"LOCK TABLE {name} IN EXCLUSIVE MODE")
+            cursor.execute(
+                f"SELECT count(*), count(*) FILTER (WHERE status NOT IN ({terminal})), "
+                f"array_agg(DISTINCT seller_id), array_agg(DISTINCT driver_id) FROM {name}"
+            )
+            rows, open_orders, seller_ids, driver_ids = cursor.fetchone()
+            if open_orders:
+                results.append((name, 'skipped', open_orders))
+                continue
+            if archive and rows:
+                cursor.execute(
+                    f"INSERT INTO {quote(ArchivedOrder._meta.db_table)} ({columns}, {quote('archived_at')}) "
+                    f"SELECT {columns}, now() FROM {name}"
+                )
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            invalidate_orders(seller_ids or (), driver_ids or ())
+        results.append((name, 'archived' if archive else 'dropped', rows))
+    return results
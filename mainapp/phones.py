@@ -0,0 +1,43 @@
+"""
+Phone number normalization for customer lookups.
+
+customer_phone is stored as typed; customer_phone_normalized holds an
+E.164-style form ('+212612345678') so the same customer is found whatever
+format the seller used. National numbers get PHONE_DEFAULT_COUNTRY_CODE.
+Numbers longer than E.164 allows normalize to '' and match nothing.
+"""
+import re
+
+from django.conf import settings
+
+DEFAULT_COUNTRY_CODE = '212'
+
+# Longest national number (without trunk prefix) we treat as local
+MAX_NATIONAL_LENGTH = 9
+
+# E.164 numbers have at most 15 digits, so the normalized form fits in 16 characters
+MAX_E164_DIGITS = 15
+
+
+def normalize_e164(value, country_code=None):
+    """Return value as '+<digits>', or '' if it has no digits or too many."""
+    if not value:
+        return ''
+    country_code = country_code or getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', DEFAULT_COUNTRY_CODE)
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return ''
+    if value.startswith('+'):
+        normalized = digits
+    elif digits.startswith('00'):
+        normalized = digits[2:]
+    elif digits.startswith('0'):
+        normalized = f'{country_code}{digits[1:]}'
+    elif len(digits) <= MAX_NATIONAL_LENGTH:
+        normalized = f'{country_code}{digits}'
+    else:
+        normalized = digits
+    if len(normalized) > MAX_E164_DIGITS:
+        return ''
+    return f'+{normalized}'
@@ -0,0 +1,203 @@
+"""
+Per-user cache of rendered GET responses.
+
+Entries are keyed by view, user, path and the normalized query string,
+plus the current value of every generation counter the response depends
+on. Writes bump the counters of the scopes they touch, so stale entries
+are never read again and simply age out (LRU / timeout):
+
+- orders:seller:<id> / orders:driver:<id>  orders of a seller or driver
+- stock:seller:<id> / stock:all            a seller's stock, every stock
+- user:<id>                                a user's own profile
+
+Model saves and deletes bump through signals (mainapp/signals.py); bulk
+queryset updates call invalidate_orders()/invalidate_stock()/
+invalidate_users() themselves.
+Inside a transaction the counters are bumped again on commit, so a read
+that cached the pre-commit rows under the new generation is discarded.
+
+Counters start at a timestamp rather than 0, so a counter evicted from the
+cache can't come back at a value an old entry was stored under.
+
+Settings: RESPONSE_CACHE_ENABLED (default on when REDIS_URL is set; a
+per-process cache would keep serving entries other workers invalidated),
+RESPONSE_CACHE_TIMEOUT (seconds, default 60).
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .models import Order
+
+GENERATION_KEY = 'respcache:gen:{}'
+ENTRY_KEY = 'respcache:{view}:{user}:{digest}'
+STATS_KEY = 'respcache:stats:{}:{}'
+
+# Response headers restored on a cache hit
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow']
+
+# Names of the views using ResponseCacheMixin, for stats
+CACHED_VIEWS = []
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _bump(keys):
+    for key in keys:
+        _incr(key)
+
+
+def bump(*scopes):
+    """Invalidate every cached response that depends on one of the scopes."""
+    keys = [GENERATION_KEY.format(scope) for scope in set(scopes)]
+    if not keys:
+        return
+    _bump(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def generations(scopes):
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            initial = time.time_ns()
+            values[key] = initial if cache.add(key, initial, None) else cache.get(key, initial)
+    return [values[key] for key in keys]
+
+
+def invalidate_orders(seller_ids=(), driver_ids=()):
+    bump(
+        *(f'orders:seller:{seller_id}' for seller_id in seller_ids if seller_id is not None),
+        *(f'orders:driver:{driver_id}' for driver_id in driver_ids if driver_id is not None),
+    )
+
+
+def invalidate_stock(seller_ids=()):
+    bump('stock:all', *(f'stock:seller:{seller_id}' for seller_id in seller_ids if seller_id is not None))
+
+
+def invalidate_users(users):
+    """
+    Invalidate responses showing the given users: their profiles, and the
+    order and stock lists they are nested in. users are (id, role) pairs.
+    """
+    seller_ids = [user_id for user_id, role in users if role == 'seller']
+    driver_ids = [user_id for user_id, role in users if role == 'driver']
+    scopes = [f'user:{user_id}' for user_id, _ in users]
+    partner_driver_ids = partner_seller_ids = []
+    if seller_ids:
+        partner_driver_ids = Order.objects.filter(
+            seller_id__in=seller_ids, driver__isnull=False
+        ).order_by().values_list('driver_id', flat=True).distinct()
+        scopes += ['stock:all', *(f'stock:seller:{seller_id}' for seller_id in seller_ids)]
+    if driver_ids:
+        partner_seller_ids = Order.objects.filter(
+            driver_id__in=driver_ids
+        ).order_by().values_list('seller_id', flat=True).distinct()
+    scopes += [f'orders:seller:{seller_id}' for seller_id in [*seller_ids, *partner_seller_ids]]
+    scopes += [f'orders:driver:{driver_id}' for driver_id in [*driver_ids, *partner_driver_ids]]
+    bump(*scopes)
+
+
+def record(view_name, hit):
+    key = STATS_KEY.format(view_name, 'hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def response_cache_stats():
+    keys = {
+        (name, kind): STATS_KEY.format(name, kind)
+        for name in CACHED_VIEWS for kind in ('hits', 'misses')
+    }
+    counts = cache.get_many(keys.values())
+    views = {}
+    for name in CACHED_VIEWS:
+        hits = counts.get(keys[(name, 'hits')], 0)
+        misses = counts.get(keys[(name, 'misses')], 0)
+        total = hits + misses
+        views[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+    stats = {'views': views}
+    if hasattr(cache, 'stats'):
+        stats['backend'] = cache.stats()
+    return stats
+
+
+def cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+
+
+class ResponseCacheMixin:
+    """
+    Caches successful JSON GET responses per user. Views list the scopes
+    their response depends on in get_cache_scopes().
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        CACHED_VIEWS.append(cls.__name__)
+
+    def get_cache_scopes(self, request):
+        raise NotImplementedError
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (name, value)
+            for name in request.query_params
+            for value in request.query_params.getlist(name)
+        )
+        scopes = self.get_cache_scopes(request)
+        digest = hashlib.sha1('|'.join([
+            request.path, urlencode(params), *scopes, *map(str, generations(scopes))
+        ]).encode()).hexdigest()
+        return ENTRY_KEY.format(view=type(self).__name__, user=request.user.pk, digest=digest)
+
+    def get(self, request, *args, **kwargs):
+        self._response_cache_key = None
+        if not cache_enabled() or request.accepted_renderer.format != 'json':
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        record(type(self).__name__, cached is not None)
+        if cached is None:
+            self._response_cache_key = key
+            return super().get(request, *args, **kwargs)
+
+        content, headers = cached
+        response = get_conditional_response(request, etag=headers.get('ETag'))
+        if response is None:
+            response = HttpResponse(content)
+        for name, value in headers.items():
+            if name != 'Content-Type' or response.status_code == 200:
+                response[name] = value
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+            cache.set(key, (response.content, headers), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60))
+        return response
@@ -0,0 +1,145 @@
+"""
+Delivery route ordering for a driver's open orders.
+
+Located stops are ordered with a nearest-neighbor tour improved by 2-opt
+over a haversine distance matrix. Stops without coordinates are appended
+afterwards, grouped by city and street. Computed routes are cached per driver
+and keyed on a fingerprint of the driver's open orders, so any assignment or
+status change produces a new route.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .assignment import OPEN_ORDER_STATUSES, normalize_city
+from .geo import haversine_km
+from .models import Order
+
+ROUTE_CACHE_KEY = 'routes:driver:{driver_id}:{fingerprint}:{start}'
+ROUTE_CACHE_TIMEOUT = 60 * 60
+
+# Stop 2-opt once a full pass improves the route by less than this (km)
+MIN_IMPROVEMENT_KM = 1e-6
+
+
+def distance_matrix(points):
+    size = len(points)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        lat1, lng1 = points[i]
+        row = matrix[i]
+        for j in range(i + 1, size):
+            distance = haversine_km(lat1, lng1, *points[j])
+            row[j] = distance
+            matrix[j][i] = distance
+    return matrix
+
+
+def nearest_neighbor(matrix, start=0):
+    size = len(matrix)
+    unvisited = set(range(size))
+    unvisited.discard(start)
+    tour = [start]
+    while unvisited:
+        row = matrix[tour[-1]]
+        closest = min(unvisited, key=row.__getitem__)
+        unvisited.remove(closest)
+        tour.append(closest)
+    return tour
+
+
+def two_opt(tour, matrix, max_passes=50):
+    """
+    Improve an open path (fixed first stop) by reversing segments.
+    Reversing tour[i:k+1] replaces edges (i-1, i) and (k, k+1) with
+    (i-1, k) and (i, k+1); the last stop has no outgoing edge.
+    """
+    tour = list(tour)
+    size = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, size - 1):
+            a, b = tour[i - 1], tour[i]
+            row_a = matrix[a]
+            row_b = matrix[b]
+            removed_ab = row_a[b]
+            for k in range(i + 1, size):
+                c = tour[k]
+                if k + 1 < size:
+                    e = tour[k + 1]
+                    delta = row_a[c] + row_b[e] - removed_ab - matrix[c][e]
+                else:
+                    delta = row_a[c] - removed_ab
+                if delta < -MIN_IMPROVEMENT_KM:
+                    tour[i:k + 1] = reversed(tour[i:k + 1])
+                    b = tour[i]
+                    row_b = matrix[b]
+                    removed_ab = row_a[b]
+                    improved = True
+        if not improved:
+            break
+    return tour
+
+
+def optimize_route(points, start=None):
+    """
+    Order points [(lat, lng), ...] into a short open path.
+    If start is given the path begins there. Returns (order, legs) where
+    order lists indexes into points and legs the distance of each step in km.
+    """
+    if not points:
+        return [], []
+    nodes = ([start] if start else []) + list(points)
+    matrix = distance_matrix(nodes)
+    tour = two_opt(nearest_neighbor(matrix, 0), matrix)
+
+    legs = []
+    previous = None
+    for node in tour:
+        legs.append(matrix[previous][node] if previous is not None else 0.0)
+        previous = node
+    if start:
+        tour, legs = tour[1:], legs[1:]
+        return [node - 1 for node in tour], legs
+    return tour, legs
+
+
+def _fingerprint(driver_id):
+    summary = Order.objects.filter(
+        driver_id=driver_id, status__in=OPEN_ORDER_STATUSES
+    ).aggregate(total=Count('id'), last_change=Max('updated_at'))
+    last_change = summary['last_change'].timestamp() if summary['last_change'] else 0
+    return f"{summary['total']}-{last_change}"
+
+
+def build_driver_route(driver_id, start=None):
+    """
+    Return the route for a driver's open orders as a list of
+    (order_id, distance_from_previous_km or None for unlocated stops).
+    """
+    start_key = f"{start[0]:.5f},{start[1]:.5f}" if start else 'none'
+    cache_key = ROUTE_CACHE_KEY.format(
+        driver_id=driver_id, fingerprint=_fingerprint(driver_id), start=start_key
+    )
+    route = cache.get(cache_key)
+    if route is not None:
+        return route
+
+    rows = Order.objects.filter(
+        driver_id=driver_id, status__in=OPEN_ORDER_STATUSES
+    ).order_by('id').values_list(
+        'id', 'delivery_latitude', 'delivery_longitude', 'delivery_city', 'delivery_street'
+    )
+    located = []
+    unlocated = []
+    for order_id, lat, lng, city, street in rows:
+        if lat is not None and lng is not None:
+            located.append((order_id, (lat, lng)))
+        else:
+            unlocated.append((normalize_city(city), (street or '').strip().casefold(), order_id))
+
+    order, legs = optimize_route([point for _, point in located], start)
+    route = [(located[index][0], round(leg, 3)) for index, leg in zip(order, legs)]
+    route += [(order_id, None) for _, _, order_id in sorted(unlocated)]
+
+    cache.set(cache_key, route, ROUTE_CACHE_TIMEOUT)
+    return route
@@ -0,0 +1,196 @@
+"""
+Ranked order search by customer name, phone, street, item and comment.
+
+The search index is maintained by the database itself, so every write
+path, including bulk UPDATEs, keeps it current:
+
+- SQLite: an FTS5 table with the trigram tokenizer, filled by triggers.
+  Phone numbers are indexed as digits only.
+- PostgreSQL: a pg_trgm GIN index over the same columns.
+
+It is created by migration 0009_order_search_index and re-checked after every
+migrate, because SQLite drops the triggers whenever a migration rebuilds the
+order table.
+
+The backend is picked from the database vendor and can be overridden with
+the ORDER_SEARCH_BACKEND setting (dotted path to a backend class).
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'mainapp_order_search'
+FTS_COLUMNS = 'customer_name, customer_phone, delivery_street, item, comment'
+
+_SQLITE_PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace(replace("
+    "{row}.customer_phone, ' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', ''), '/', '')"
+)
+_SQLITE_INDEX_ROW = (
+    f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+    "VALUES ({row}.id, {row}.customer_name, " + _SQLITE_PHONE_DIGITS + ", "
+    "{row}.delivery_street, {row}.item, coalesce({row}.comment, ''));"
+)
+SQLITE_TRIGGERS = {
+    'mainapp_order_search_ai': (
+        "AFTER INSERT ON mainapp_order BEGIN "
+        + _SQLITE_INDEX_ROW.format(row='new') + " END"
+    ),
+    'mainapp_order_search_ad': (
+        f"AFTER DELETE ON mainapp_order BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+    ),
+    'mainapp_order_search_au': (
+        f"AFTER UPDATE OF {FTS_COLUMNS} ON mainapp_order BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+        + _SQLITE_INDEX_ROW.format(row='new') + " END"
+    ),
+}
+
+POSTGRES_DOCUMENT = (
+    "({table}.customer_name || ' ' || regexp_replace({table}.customer_phone, '\\D', '', 'g') "
+    "|| ' ' || {table}.delivery_street || ' ' || {table}.item "
+    "|| ' ' || coalesce({table}.comment, ''))"
+)
+
+# Trigram matching needs at least three characters per term
+MIN_TERM_LENGTH = 3
+
+_PHONE_TERM = re.compile(r'^\+?[\d\s().\-/]+$')
+
+
+def normalize_phone(value):
+    """Keep only the digits of a phone number."""
+    return re.sub(r'\D', '', value or '')
+
+
+def search_terms(query):
+    """Split a search query into terms, normalizing phone-like terms to digits."""
+    terms = []
+    for term in (query or '').split():
+        if _PHONE_TERM.match(term):
+            term = normalize_phone(term)
+        term = term.replace('"', '')
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append(term)
+    return terms
+
+
+class SqliteFTSBackend:
+    """FTS5 trigram index; results ranked by bm25 (best first)."""
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        match = ' AND '.join(f'"{term}"' for term in terms)
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            RawSQL(
+                f"{table}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                [match], output_field=BooleanField()
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                [match], output_field=FloatField()
+            )
+        ).order_by('search_rank', '-updated_at')
+
+
+class PostgresTrigramBackend:
+    """pg_trgm index over the concatenated columns; ranked by word similarity."""
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        document = POSTGRES_DOCUMENT.format(table=queryset.model._meta.db_table)
+        for term in terms:
+            queryset = queryset.filter(
+                RawSQL(f"{document} ILIKE %s", [f'%{term}%'], output_field=BooleanField())
+            )
+        return queryset.annotate(
+            search_rank=RawSQL(f"1 - word_similarity(%s, {document})", [' '.join(terms)], output_field=FloatField())
+        ).order_by('search_rank', '-updated_at')
+
+
+class BasicSearchBackend:
+    """Fallback for other databases: unindexed icontains scan."""
+
+    fields = ['customer_name', 'customer_phone', 'delivery_street', 'item', 'comment']
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SqliteFTSBackend,
+    'postgresql': PostgresTrigramBackend,
+}
+
+
+def get_search_backend():
+    backend = getattr(settings, 'ORDER_SEARCH_BACKEND', None)
+    if backend:
+        return import_string(backend)()
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def search_orders(queryset, query):
+    """Filter an Order queryset to matches for query, best matches first."""
+    return get_search_backend().search(queryset, query)
+
+
+def install_search_index(connection):
+    """
+    Create the search index for the connection's database if it is missing.
+    Safe to run repeatedly; on SQLite the FTS table is refilled whenever a
+    trigger had to be recreated, since writes were not tracked without it.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5({FTS_COLUMNS}, tokenize='trigram')"
+            )
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(f"CREATE TRIGGER {name} {SQLITE_TRIGGERS[name]}")
+            if missing:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMNS}) "
+                    "SELECT id, customer_name, " + _SQLITE_PHONE_DIGITS.format(row='mainapp_order') + ", "
+                    "delivery_street, item, coalesce(comment, '') FROM mainapp_order"
+                )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS mainapp_order_search_trgm ON mainapp_order "
+                f"USING gin ({POSTGRES_DOCUMENT.format(table='mainapp_order')} gin_trgm_ops)"
+            )
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS mainapp_order_search_trgm")
@@ -2,7 +2,9 @@ from django.forms import ValidationError
 from rest_framework import serializers
 
 from users.serializers import UserSerializer
-from .models import Order, Stock, Message
+from .models import Order, Stock, Message, WebhookEndpoint
+from .messaging import pick_admin_recipient
+from .webhooks import resolve_endpoint
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -25,6 +27,85 @@ def validate_google_maps_url(value):
         )
     return value
 
+class SparseFieldsMixin:
+    """
+    Lets GET requests choose the shape of the response:
+
+    ?fields=id,status,seller_id   return only these fields
+    ?expand=seller                return related users as <name>_id, except the
+                                  listed relations which stay nested
+
+    Either parameter switches relations to <name>_id unless they are named in
+    fields or expand. Without them the representation is unchanged.
+    Views call narrow_queryset() so only the needed columns are loaded.
+    """
+    relation_fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        fields, expand = self.parse_sparse_params(request)
+        if fields is None and expand is None:
+            return
+
+        nested = {
+            name for name in self.relation_fields
+            if name in (expand or ()) or name in (fields or ())
+        }
+        for name in self.relation_fields:
+            if name not in nested:
+                self.fields.pop(name, None)
+                # Replaces the write-only <name>_id input field for this response
+                self.fields[f'{name}_id'] = serializers.IntegerField(read_only=True)
+
+        if fields is not None:
+            keep = set(fields) | nested
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @staticmethod
+    def parse_sparse_params(request):
+        def names(param):
+            if param not in request.query_params:
+                return None
+            return [name.strip() for name in request.query_params[param].split(',') if name.strip()]
+        return names('fields'), names('expand')
+
+    @classmethod
+    def narrow_queryset(cls, queryset, request):
+        """Join nested relations and, for sparse requests, load only the used columns"""
+        serializer = cls(context={'request': request})
+        model = queryset.model
+        concrete = {}
+        for field in model._meta.concrete_fields:
+            concrete[field.name] = field.name
+            concrete[field.attname] = field.name
+
+        related = []
+        columns = {'id'}
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                related.append(field.source)
+                columns.add(field.source)
+            elif field.source in concrete:
+                columns.add(concrete[field.source])
+            else:
+                columns = None  # Computed field, keep every column
+                break
+
+        if related:
+            queryset = queryset.select_related(*related)
+        fields, expand = cls.parse_sparse_params(request)
+        if columns is not None and (fields is not None or expand is not None):
+            queryset = queryset.only(*columns)
+        return queryset
+
+
 # mainapp/serializers.py
 # In mainapp/serializers.py - Fix the OrderCreateSerializer
 
@@ -104,10 +185,12 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Detailed serializer for the Order model.
     """
+    relation_fields = ['seller', 'driver']
+
     seller = UserSerializer(read_only=True)
     driver = UserSerializer(read_only=True)
     
@@ -116,6 +199,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'seller', 'driver', 'customer_name', 'customer_phone',
             'delivery_street', 'delivery_city', 'delivery_location',
+            'delivery_latitude', 'delivery_longitude', 'location_short_link',
             'item', 'quantity', 'status', 'comment',
             'created_at', 'updated_at'
         ]
@@ -130,10 +214,12 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
         fields = ['status']
 
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Stock model.
     """
+    relation_fields = ['seller']
+
     seller_id = serializers.IntegerField(required=False, write_only=True)
     seller = UserSerializer(read_only=True)
     
@@ -157,6 +243,25 @@ class StockSerializer(serializers.ModelSerializer):
             return super().update(instance, validated_data)
         
 
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a seller's webhook endpoint. The signing secret is
+    generated on creation and read-only; the URL must be https on a public
+    host.
+    """
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'secret', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['secret', 'created_at', 'updated_at']
+
+    def validate_url(self, value):
+        try:
+            resolve_endpoint(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
 # Add this to mainapp/serializers.py after the existing serializers
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -182,14 +287,11 @@ class MessageSerializer(serializers.ModelSerializer):
         # Handle recipient selection based on user role
         if 'recipient_id' not in validated_data:
             if sender.role in ['seller', 'driver']:
-                # For sellers and drivers, send to the first admin
-                try:
-                    admin_user = User.objects.filter(role='admin').first()
-                    if not admin_user:
-                        raise serializers.ValidationError("No admin user found to send message to")
-                    validated_data['recipient'] = admin_user
-                except User.DoesNotExist:
+                # For sellers and drivers, route to an admin from the cached pool
+                admin_id = pick_admin_recipient()
+                if admin_id is None:
                     raise serializers.ValidationError("No admin user found to send message to")
+                validated_data['recipient_id'] = admin_id
             else:
                 # For admins, require explicit recipient
                 raise serializers.ValidationError("Recipient is required for admin messages")
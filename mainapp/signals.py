@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .messaging import ADMIN_POOL_KEY, invalidate_admin_pool, message_closed, message_opened
+from .models import Message, Order, Stock
+from .response_cache import bump, invalidate_orders, invalidate_stock, invalidate_users
+from .search import FTS_TABLE, install_search_index
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_admin_pool_on_user_change(sender, instance, **kwargs):
+    """
+    Rebuild the message routing pool when an admin is added, removed,
+    deactivated or loses the admin role.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    pool = cache.get(ADMIN_POOL_KEY)
+    if instance.role == 'admin' or (pool and instance.pk in pool):
+        invalidate_admin_pool()
+
+
+@receiver(post_init, sender=Message)
+def remember_message_status(sender, instance, **kwargs):
+    """Keep the loaded status so saves know whether the message opened or closed"""
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Message)
+def count_open_message(sender, instance, created, **kwargs):
+    """
+    Keep the recipient's count of unread messages (their routing slot) in
+    step: a message counts while it is unread. The counter changes once the
+    write has committed, so a rolled-back save or delete never skews it.
+    """
+    was_unread = False if created else instance._loaded_status == 'unread'
+    is_unread = instance.status == 'unread'
+    recipient_id = instance.recipient_id
+    if is_unread and not was_unread:
+        transaction.on_commit(lambda: message_opened(recipient_id))
+    elif was_unread and not is_unread:
+        transaction.on_commit(lambda: message_closed(recipient_id))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Message)
+def release_deleted_message(sender, instance, **kwargs):
+    if instance._loaded_status == 'unread':
+        recipient_id = instance.recipient_id
+        transaction.on_commit(lambda: message_closed(recipient_id))
+
+
+@receiver(post_init, sender=Order)
+def remember_order_owners(sender, instance, **kwargs):
+    """Keep the loaded seller/driver so reassignment invalidates the previous owner too"""
+    # Read from __dict__: deferred fields (only()) would otherwise be fetched
+    instance._loaded_owners = (instance.__dict__.get('seller_id'), instance.__dict__.get('driver_id'))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_responses(sender, instance, **kwargs):
+    seller_ids = {instance.seller_id}
+    driver_ids = {instance.driver_id}
+    loaded_seller_id, loaded_driver_id = getattr(instance, '_loaded_owners', (None, None))
+    seller_ids.add(loaded_seller_id)
+    driver_ids.add(loaded_driver_id)
+    invalidate_orders(seller_ids, driver_ids)
+    instance._loaded_owners = (instance.seller_id, instance.driver_id)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_stock_responses(sender, instance, **kwargs):
+    invalidate_stock([instance.seller_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_responses(sender, instance, created=False, **kwargs):
+    """
+    Users are nested in order and stock responses: a change to a seller or
+    driver invalidates their own lists and those of the users they share
+    orders with.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    if created:
+        bump(f'user:{instance.pk}')
+        return
+    invalidate_users([(instance.pk, instance.role)])
+
+
+def ensure_order_search_index(sender, using, plan=None, **kwargs):
+    """
+    Recreate order search triggers dropped by SQLite table rebuilds.
+    Skipped until migration 0009_order_search_index has been applied.
+    """
+    connection = connections[using]
+    tables = connection.introspection.table_names()
+    if 'mainapp_order' not in tables:
+        return
+    if connection.vendor == 'sqlite' and FTS_TABLE not in tables:
+        return
+    install_search_index(connection)
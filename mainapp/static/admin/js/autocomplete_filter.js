@@ -0,0 +1,16 @@
+'use strict';
+// Reloads the changelist when a value is picked in an AutocompleteFilter
+// (mainapp/admin_tools.py).
+{
+    const $ = django.jQuery;
+    $(document).on('change', 'select[data-filter-parameter]', function() {
+        const params = new URLSearchParams(window.location.search);
+        params.delete(this.dataset.filterParameter);
+        // Back to the first page
+        params.delete('p');
+        if (this.value) {
+            params.set(this.dataset.filterParameter, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
@@ -0,0 +1,17 @@
+"""Background tasks run by `manage.py run_workers` (see mainapp/jobs.py)."""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .jobs import task
+
+
+@task(max_attempts=5)
+def send_email(subject, message, recipient_list, from_email=None):
+    # Raise on failure so the job is retried with backoff
+    send_mail(
+        subject,
+        message,
+        from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list,
+        fail_silently=False,
+    )
@@ -1,12 +1,58 @@
 # tests.py (mainapp/tests.py or create a tests folder with multiple test files)
 
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import authenticate
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APIClient
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
-from rest_framework.authtoken.models import Token
-from users.models import User
-from mainapp.models import Order, Stock
+from users.models import AuthToken, User
+from deleveryno.cache import BoundedLocMemCache
+from deleveryno.db_router import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from mainapp.admin_tools import EstimatedCountPaginator
+from mainapp.archive import archive_orders
+from mainapp.bulk import BULK_MAX_ORDERS
+from mainapp.fastpath import (
+    MessageValuesSerializer, OrderValuesSerializer, StockValuesSerializer, UserValuesSerializer
+)
+from mainapp.jobs import claim_jobs, enqueue, run_pending
+from mainapp.messaging import OPEN_COUNT_KEY
+from mainapp.models import ArchivedOrder, IdempotencyKey, Job, Message, Order, Stock, WebhookEndpoint, WebhookEvent
+from mainapp.partitions import (
+    ensure_partitions, is_partitioned, month_start, next_month, partition_name, retire_partitions,
+)
+from mainapp.phones import normalize_e164
+from mainapp.renderers import FastJSONRenderer
+from mainapp.serializers import MessageSerializer, OrderDetailSerializer, StockSerializer
+from users.authentication import last_used
+from users.serializers import DriverRegistrationSerializer, UserSerializer
+from users.imports import import_users
+from users.usernames import next_free_username
+from mainapp.views import OrderDetailView, OrderListCreateView, SellerOrderListView
+from mainapp.webhooks import SIGNATURE_HEADER, dispatch_webhooks, verify_signature
 
 class AuthenticationTests(TestCase):
     """Test user registration, authentication and permissions"""
@@ -54,9 +100,9 @@ class AuthenticationTests(TestCase):
         )
         
         # Create tokens for authenticated requests
-        self.admin_token = Token.objects.create(user=self.admin)
-        self.seller_token = Token.objects.create(user=self.seller)
-        self.driver_token = Token.objects.create(user=self.driver)
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.driver_token = AuthToken.objects.create(user=self.driver)
         
         # Initialize API client
         self.client = APIClient()
@@ -162,8 +208,8 @@ class UserManagementTests(TestCase):
         )
         
         # Create tokens
-        self.admin_token = Token.objects.create(user=self.admin)
-        self.seller_token = Token.objects.create(user=self.seller)
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
         
         # Initialize API client
         self.client = APIClient()
@@ -209,6 +255,7 @@ class StockManagementTests(TestCase):
     """Test stock management functionalities"""
     
     def setUp(self):
+        cache.clear()
         # Create test users
         self.admin = User.objects.create_user(
             username='testadmin', 
@@ -235,9 +282,9 @@ class StockManagementTests(TestCase):
         )
         
         # Create tokens
-        self.admin_token = Token.objects.create(user=self.admin)
-        self.seller_token = Token.objects.create(user=self.seller)
-        self.driver_token = Token.objects.create(user=self.driver)
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.driver_token = AuthToken.objects.create(user=self.driver)
         
         # Create some stock for the seller
         self.stock = Stock.objects.create(
@@ -335,6 +382,7 @@ class OrderManagementTests(TestCase):
     """Test order management functionalities"""
     
     def setUp(self):
+        cache.clear()
         # Create test users
         self.admin = User.objects.create_user(
             username='testadmin', 
@@ -370,10 +418,10 @@ class OrderManagementTests(TestCase):
         )
         
         # Create tokens
-        self.admin_token = Token.objects.create(user=self.admin)
-        self.seller_token = Token.objects.create(user=self.seller)
-        self.seller2_token = Token.objects.create(user=self.seller2)
-        self.driver_token = Token.objects.create(user=self.driver)
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.seller2_token = AuthToken.objects.create(user=self.seller2)
+        self.driver_token = AuthToken.objects.create(user=self.driver)
         
         # Create stock for sellers
         self.stock = Stock.objects.create(
@@ -564,4 +612,2131 @@ class OrderManagementTests(TestCase):
             self.assertEqual(response.data['results'][0]['id'], self.order.id)
         else:
             # If the response format is different, this test might need adjustment
-            pass
\ No newline at end of file
+            pass
+
+class MessageRoutingTests(TestCase):
+    """Test routing of support messages across admins"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.admin2 = User.objects.create_user(
+            username='testadmin2',
+            email='admin2@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+
+        self.client = APIClient()
+
+    def send_support_message(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        # The open message count is updated once the message is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('message-list-create'), {
+                'subject': 'Help',
+                'content': 'Where is my payout?'
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['recipient']['id']
+
+    def test_messages_spread_across_admins(self):
+        """Messages without a recipient go to the admin with the fewest open messages"""
+        recipients = [self.send_support_message() for _ in range(4)]
+        self.assertEqual(recipients.count(self.admin.id), 2)
+        self.assertEqual(recipients.count(self.admin2.id), 2)
+
+    def test_reading_a_message_frees_the_admin(self):
+        """Once an admin reads a message, new messages are routed back to them"""
+        first = self.send_support_message()
+        second = self.send_support_message()
+        self.assertNotEqual(first, second)
+
+        message = Message.objects.get(recipient_id=self.admin.id)
+        self.set_status(message, 'read')
+
+        self.assertEqual(self.send_support_message(), self.admin.id)
+
+    def set_status(self, message, new_status):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('message-detail', args=[message.id]), {'status': new_status}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def open_count(self, admin):
+        return cache.get(OPEN_COUNT_KEY.format(admin.id))
+
+    def test_rolled_back_read_keeps_the_slot(self):
+        """Reading or deleting a message in a transaction that rolls back leaves the count alone"""
+        self.send_support_message()
+        message = Message.objects.get(recipient_id=self.admin.id)
+        self.assertEqual(self.open_count(self.admin), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            for change in (lambda: Message.objects.get(pk=message.pk).delete(), lambda: message.save()):
+                message.status = 'read'
+                try:
+                    with transaction.atomic():
+                        change()
+                        raise DatabaseError("rolled back")
+                except DatabaseError:
+                    pass
+        self.assertEqual(self.open_count(self.admin), 1)
+
+    def test_marking_a_message_unread_again_is_counted(self):
+        """A read message set back to unread takes the admin's slot again"""
+        self.send_support_message()
+        message = Message.objects.get(recipient_id=self.admin.id)
+        self.set_status(message, 'read')
+        self.assertEqual(self.open_count(self.admin), 0)
+        self.set_status(message, 'unread')
+        self.assertEqual(self.open_count(self.admin), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.get(pk=message.pk).delete()
+        self.assertEqual(self.open_count(self.admin), 0)
+
+    def test_failed_save_is_not_counted(self):
+        """A message whose transaction rolls back doesn't take an admin's routing slot"""
+        self.assertEqual(self.send_support_message(), self.admin.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Message.objects.create(sender=self.seller, recipient=self.admin2, subject='Lost', content='x')
+                    raise DatabaseError("insert failed later")
+            except DatabaseError:
+                pass
+        self.assertEqual(self.send_support_message(), self.admin2.id)
+
+    def test_pool_invalidated_when_admin_changes(self):
+        """Deactivated admins stop receiving messages without waiting for the cache"""
+        self.send_support_message()
+        self.admin.is_active = False
+        self.admin.save()
+        self.admin2.is_active = False
+        self.admin2.save()
+        admin3 = User.objects.create_user(
+            username='testadmin3',
+            email='admin3@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.assertEqual(self.send_support_message(), admin3.id)
+
+
+class AutoAssignmentTests(TestCase):
+    """Test automatic assignment of pending orders to drivers"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.casa_driver = User.objects.create_user(
+            username='casadriver',
+            email='casa@example.com',
+            password='password123',
+            role='driver',
+            city='Casablanca',
+            approved=True
+        )
+
+        self.casa_driver2 = User.objects.create_user(
+            username='casadriver2',
+            email='casa2@example.com',
+            password='password123',
+            role='driver',
+            city='casablanca',
+            approved=True
+        )
+
+        self.rabat_driver = User.objects.create_user(
+            username='rabatdriver',
+            email='rabat@example.com',
+            password='password123',
+            role='driver',
+            city='Rabat',
+            approved=False
+        )
+
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+
+        self.orders = [
+            Order.objects.create(
+                seller=self.seller,
+                customer_name=f'Customer {index}',
+                customer_phone='1234567890',
+                delivery_street='123 Test St',
+                delivery_city=city,
+                item='Test Item',
+                quantity=1
+            )
+            for index, city in enumerate(['Casablanca', 'Casablanca', 'Casablanca', 'Rabat'])
+        ]
+
+        # casa_driver already has an open order
+        Order.objects.filter(pk=self.orders[0].pk).update(driver=self.casa_driver, status='assigned')
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def test_dry_run_does_not_write(self):
+        """A dry run returns the plan and leaves orders pending"""
+        response = self.client.post(reverse('auto-assign-drivers'), {'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned_count'], 2)
+        self.assertEqual(Order.objects.filter(status='pending').count(), 3)
+
+    def test_assignment_matches_city_and_balances_load(self):
+        """Orders go to approved drivers of the same city, least loaded first"""
+        response = self.client.post(reverse('auto-assign-drivers'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unassigned'], [self.orders[3].id])
+
+        self.assertEqual(Order.objects.filter(driver=self.casa_driver).count(), 2)
+        self.assertEqual(Order.objects.filter(driver=self.casa_driver2).count(), 1)
+        self.assertEqual(Order.objects.filter(driver=self.rabat_driver).count(), 0)
+        self.assertEqual(Order.objects.get(pk=self.orders[3].pk).status, 'pending')
+
+    def test_ids_must_be_lists(self):
+        """Strings, objects and oversized lists of IDs are rejected without assigning anything"""
+        for body in [
+            {'order_ids': str(self.orders[1].pk)},
+            {'driver_ids': {str(self.casa_driver.pk): True}},
+            {'order_ids': list(range(1, BULK_MAX_ORDERS + 2))},
+        ]:
+            response = self.client.post(reverse('auto-assign-drivers'), body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+        self.assertEqual(Order.objects.filter(status='pending').count(), 3)
+
+
+class BulkOrderOperationTests(TestCase):
+    """Test bulk driver assignment and bulk status transitions"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+
+        self.stock = Stock.objects.create(
+            seller=self.seller,
+            item_name='Test Item',
+            quantity=5,
+            approved=True
+        )
+
+        self.orders = [
+            Order.objects.create(
+                seller=self.seller,
+                customer_name=f'Customer {index}',
+                customer_phone='1234567890',
+                delivery_street='123 Test St',
+                delivery_city='Test City',
+                item='Test Item',
+                quantity=2
+            )
+            for index in range(3)
+        ]
+        Order.objects.filter(pk=self.orders[2].pk).update(status='delivered')
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def test_bulk_assign(self):
+        """Valid orders are assigned, terminal and unknown orders are reported"""
+        order_ids = [order.id for order in self.orders] + [999999]
+        response = self.client.post(reverse('bulk-assign-driver'), {
+            'order_ids': order_ids,
+            'driver_id': self.driver.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(
+            [outcome['result'] for outcome in response.data['results']],
+            ['updated', 'updated', 'error', 'error']
+        )
+        self.assertEqual(Order.objects.filter(driver=self.driver, status='assigned').count(), 2)
+
+        # Sellers cannot use bulk endpoints
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        response = self.client.post(reverse('bulk-assign-driver'), {
+            'order_ids': order_ids,
+            'driver_id': self.driver.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_status_update_applies_stock_once_per_order(self):
+        """Moving orders to in_transit decrements stock and reports shortages"""
+        Order.objects.filter(pk__in=[self.orders[0].pk, self.orders[1].pk]).update(
+            driver=self.driver, status='assigned'
+        )
+        self.stock.quantity = 3
+        self.stock.save()
+
+        response = self.client.post(reverse('bulk-order-status-update'), {
+            'order_ids': [self.orders[0].id, self.orders[1].id, self.orders[2].id],
+            'status': 'in_transit'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([outcome['result'] for outcome in results], ['updated', 'updated', 'error'])
+        self.assertNotIn('warning', results[0])
+        self.assertIn('Insufficient stock', results[1]['warning'])
+
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 1)
+        self.assertEqual(Order.objects.filter(status='in_transit').count(), 2)
+
+
+class OrderLocationTests(TestCase):
+    """Test coordinate extraction from delivery_location and nearby lookups"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def create_order(self, location):
+        return Order.objects.create(
+            seller=self.seller,
+            customer_name='Test Customer',
+            customer_phone='1234567890',
+            delivery_street='123 Test St',
+            delivery_city='Casablanca',
+            delivery_location=location,
+            item='Test Item',
+            quantity=1
+        )
+
+    def test_coordinates_extracted_on_save(self):
+        """Supported link forms are parsed, short links are flagged"""
+        order = self.create_order('https://www.google.com/maps/@33.5731,-7.5898,15z')
+        self.assertEqual((order.delivery_latitude, order.delivery_longitude), (33.5731, -7.5898))
+
+        order = self.create_order('https://maps.google.com/?q=33.59,-7.61')
+        self.assertEqual((order.delivery_latitude, order.delivery_longitude), (33.59, -7.61))
+
+        order = self.create_order('https://www.google.com/maps?ll=34.02,-6.83&z=12')
+        self.assertEqual((order.delivery_latitude, order.delivery_longitude), (34.02, -6.83))
+
+        order = self.create_order('https://maps.app.goo.gl/abc123')
+        self.assertIsNone(order.delivery_latitude)
+        self.assertTrue(order.location_short_link)
+
+    def test_nearby_orders(self):
+        """Nearest orders come first and far away orders are excluded"""
+        far = self.create_order('https://www.google.com/maps/@34.0209,-6.8416,15z')  # Rabat
+        near = self.create_order('https://www.google.com/maps/@33.5740,-7.5900,15z')
+        nearer = self.create_order('https://www.google.com/maps/@33.5732,-7.5898,15z')
+
+        response = self.client.get(reverse('order-nearby'), {'lat': 33.5731, 'lng': -7.5898, 'radius_km': 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data], [nearer.id, near.id])
+        self.assertLess(response.data[0]['distance_km'], response.data[1]['distance_km'])
+
+        response = self.client.get(reverse('order-nearby'), {
+            'min_lat': 33, 'max_lat': 35, 'min_lng': -7, 'max_lng': -6
+        })
+        self.assertEqual([order['id'] for order in response.data], [far.id])
+
+    def test_nearby_rejects_bad_limit_and_non_finite_coordinates(self):
+        """A limit below 1 or a NaN/infinite coordinate is a 400, not a server error"""
+        box = {'min_lat': 0, 'max_lat': 1, 'min_lng': 0, 'max_lng': 1}
+        for params in [
+            {**box, 'limit': -1},
+            {**box, 'limit': 0},
+            {**box, 'min_lat': 'nan'},
+            {'lat': 'nan', 'lng': -7.5898},
+            {'lat': 33.5731, 'lng': -7.5898, 'radius_km': 'nan'},
+            {'lat': 33.5731, 'lng': 'inf'},
+            {'lat': 33.5731, 'lng': -7.5898, 'limit': -5},
+        ]:
+            response = self.client.get(reverse('order-nearby'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_backfill_command(self):
+        """Existing rows without coordinates are filled in"""
+        order = self.create_order('https://www.google.com/maps/@33.5731,-7.5898,15z')
+        Order.objects.filter(pk=order.pk).update(delivery_latitude=None, delivery_longitude=None)
+
+        call_command('backfill_coordinates', stdout=StringIO())
+
+        order.refresh_from_db()
+        self.assertEqual(order.delivery_latitude, 33.5731)
+
+
+class DriverRouteTests(TestCase):
+    """Test route ordering of a driver's open orders"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+
+        self.driver_token = AuthToken.objects.create(user=self.driver)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.driver_token.key}')
+
+    def create_order(self, location, city='Casablanca'):
+        order = Order.objects.create(
+            seller=self.seller,
+            customer_name='Test Customer',
+            customer_phone='1234567890',
+            delivery_street='123 Test St',
+            delivery_city=city,
+            delivery_location=location,
+            item='Test Item',
+            quantity=1
+        )
+        Order.objects.filter(pk=order.pk).update(driver=self.driver, status='assigned')
+        return order
+
+    def test_route_follows_geography(self):
+        """Stops are ordered along the way and unlocated stops come last"""
+        far = self.create_order('https://www.google.com/maps/@33.60,-7.50,15z')
+        unlocated = self.create_order('', city='Rabat')
+        near = self.create_order('https://www.google.com/maps/@33.58,-7.58,15z')
+        middle = self.create_order('https://www.google.com/maps/@33.59,-7.54,15z')
+
+        response = self.client.get(reverse('driver-route'), {'lat': 33.5731, 'lng': -7.5898})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [stop['id'] for stop in response.data['stops']],
+            [near.id, middle.id, far.id, unlocated.id]
+        )
+        self.assertIsNone(response.data['stops'][-1]['distance_from_previous_km'])
+
+    def test_route_refreshed_when_assignments_change(self):
+        """A cached route is not reused once the driver's orders change"""
+        first = self.create_order('https://www.google.com/maps/@33.58,-7.58,15z')
+        response = self.client.get(reverse('driver-route'))
+        self.assertEqual([stop['id'] for stop in response.data['stops']], [first.id])
+
+        Order.objects.filter(pk=first.pk).update(status='delivered')
+        second = self.create_order('https://www.google.com/maps/@33.59,-7.54,15z')
+        response = self.client.get(reverse('driver-route'))
+        self.assertEqual([stop['id'] for stop in response.data['stops']], [second.id])
+
+
+class OrderSearchTests(TestCase):
+    """Test ranked order search through ?q="""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+
+        self.order = Order.objects.create(
+            seller=self.seller,
+            customer_name='Youssef Benali',
+            customer_phone='+212 612-345-678',
+            delivery_street='12 Rue des Orangers',
+            delivery_city='Casablanca',
+            item='Argan Oil',
+            quantity=1
+        )
+        self.other = Order.objects.create(
+            seller=self.seller,
+            customer_name='Salma Idrissi',
+            customer_phone='0700000000',
+            delivery_street='5 Avenue Hassan II',
+            delivery_city='Rabat',
+            item='Black Soap',
+            quantity=1
+        )
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def search(self, query):
+        response = self.client.get(reverse('order-list-create'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [order['id'] for order in response.data['results']]
+
+    def test_search_by_partial_name_and_phone(self):
+        """Partial names and phones in any format find the order"""
+        self.assertEqual(self.search('benal'), [self.order.id])
+        self.assertEqual(self.search('345 678'), [self.order.id])
+        self.assertEqual(self.search('612-345'), [self.order.id])
+        self.assertEqual(self.search('argan orangers'), [self.order.id])
+        self.assertEqual(self.search('nothing-like-this'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Bulk updates and deletes keep the index current"""
+        Order.objects.filter(pk=self.other.pk).update(comment='Call before arriving')
+        self.assertEqual(self.search('arriving'), [self.other.id])
+
+        self.other.delete()
+        self.assertEqual(self.search('arriving'), [])
+
+
+class CustomerHistoryTests(TestCase):
+    """Test phone normalization and customer history lookups"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.seller2 = User.objects.create_user(
+            username='seller2',
+            email='seller2@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+
+        for phone, order_status, seller in [
+            ('0612345678', 'delivered', self.seller),
+            ('+212 612-345-678', 'no_answer', self.seller),
+            ('00212612345678', 'canceled', self.seller),
+            ('612 34 56 78', 'pending', self.seller),
+            ('0612345678', 'delivered', self.seller2),
+            ('0699999999', 'delivered', self.seller),
+        ]:
+            order = Order.objects.create(
+                seller=seller,
+                customer_name='Test Customer',
+                customer_phone=phone,
+                delivery_street='123 Test St',
+                delivery_city='Test City',
+                item='Test Item',
+                quantity=1
+            )
+            Order.objects.filter(pk=order.pk).update(status=order_status)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+
+    def test_phone_formats_normalized(self):
+        """Every format of the same number shares one normalized value"""
+        phones = set(
+            Order.objects.filter(seller=self.seller).exclude(customer_phone='0699999999')
+            .values_list('customer_phone_normalized', flat=True)
+        )
+        self.assertEqual(phones, {'+212612345678'})
+
+    def test_over_long_phone_is_not_normalized(self):
+        """Numbers with more digits than E.164 allows are saved without a normalized form"""
+        for phone in ['1' * 20, '0' + '9' * 19, '+' + '4' * 16]:
+            order = Order.objects.create(
+                seller=self.seller, customer_name='Long Number', customer_phone=phone,
+                delivery_street='123 Test St', delivery_city='Test City', item='Test Item', quantity=1
+            )
+            self.assertEqual(order.customer_phone_normalized, '')
+        self.assertEqual(normalize_e164('+' + '4' * 15), '+' + '4' * 15)
+        response = self.client.get(reverse('customer-history'), {'phone': '1' * 20})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_history_scoped_to_seller(self):
+        """Sellers get their own history with the customer and the failure rate"""
+        response = self.client.get(reverse('customer-history'), {'phone': '06 12 34 56 78'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_orders'], 4)
+        self.assertEqual(response.data['status_counts']['delivered'], 1)
+        self.assertAlmostEqual(response.data['failure_rate'], 0.667)
+        self.assertTrue(all(order['seller_id'] == self.seller.id for order in response.data['orders']))
+
+
+class QueryPlanAuditTests(TestCase):
+    """Test the EXPLAIN audit of view querysets"""
+
+    def setUp(self):
+        for role in ['admin', 'seller', 'driver']:
+            User.objects.create_user(
+                username=f'test{role}',
+                email=f'{role}@example.com',
+                password='password123',
+                role=role,
+                approved=True
+            )
+
+    def test_scoped_order_lists_use_composite_indexes(self):
+        """Seller and driver order lists need no temp sort for -updated_at"""
+        out = StringIO()
+        call_command('explain_hot_queries', '--verbose-plans', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Checked', output)
+
+        seller_plan = output.split('api/seller/orders/ [seller]')[1].split('api/')[0]
+        self.assertNotIn('TEMP B-TREE', seller_plan)
+        driver_plan = output.split('api/driver/orders/ [driver]')[1].split('api/')[0]
+        self.assertNotIn('TEMP B-TREE', driver_plan)
+
+
+class ReplicaRoutingTests(TestCase):
+    """Test primary/replica read routing decisions"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.router = PrimaryReplicaRouter()
+        self.factory = APIRequestFactory()
+
+    def route_read(self, method, view_class, model=Order):
+        """Run a request through the middleware and return where a read would go"""
+        decisions = []
+
+        def get_response(request):
+            middleware.process_view(request, view_class.as_view(), (), {})
+            decisions.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = getattr(self.factory, method)('/', HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        middleware(request)
+        return decisions[0]
+
+    @mock.patch('deleveryno.db_router.replica_configured', return_value=True)
+    def test_list_reads_use_replica_until_client_writes(self, _):
+        """List reads go to the replica, and stick to the primary after a write"""
+        self.assertEqual(self.route_read('get', SellerOrderListView), 'replica')
+        self.assertEqual(self.route_read('get', OrderDetailView), 'default')
+        self.assertEqual(self.route_read('get', SellerOrderListView, model=AuthToken), 'default')
+
+        self.assertEqual(self.route_read('post', OrderListCreateView), 'default')
+        self.assertEqual(self.route_read('get', SellerOrderListView), 'default')
+
+    def test_no_replica_configured(self):
+        """Without a replica everything stays on the primary"""
+        self.assertEqual(self.route_read('get', SellerOrderListView), 'default')
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= and ?expand= on order and stock endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+
+        self.stock = Stock.objects.create(
+            seller=self.seller,
+            item_name='Test Item',
+            quantity=10
+        )
+
+        self.order = Order.objects.create(
+            seller=self.seller,
+            customer_name='Test Customer',
+            customer_phone='1234567890',
+            delivery_street='123 Test St',
+            delivery_city='Test City',
+            item='Test Item',
+            quantity=2
+        )
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+
+    def test_default_representation_unchanged(self):
+        """Without parameters relations stay nested"""
+        response = self.client.get(reverse('seller-orders'))
+        order = response.data['results'][0]
+        self.assertEqual(order['seller']['id'], self.seller.id)
+        self.assertIsNone(order['driver'])
+
+    def test_fields_returns_only_requested_fields(self):
+        """?fields= limits the output and flattens relations"""
+        last_used.flush()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('seller-orders'), {'fields': 'id,status,seller_id'})
+        # Token lookup, ETag validators, count and page, with only the requested columns loaded
+        self.assertEqual(len(queries), 4)
+        self.assertNotIn('customer_name', queries[-1]['sql'])
+        self.assertEqual(response.data['results'], [
+            {'id': self.order.id, 'status': 'pending', 'seller_id': self.seller.id}
+        ])
+
+        response = self.client.get(reverse('stock-list-create'), {'fields': 'id,quantity,seller'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'quantity', 'seller'})
+        self.assertEqual(response.data['results'][0]['seller']['id'], self.seller.id)
+
+    def test_expand_switches_to_flat_mode(self):
+        """?expand= keeps every field, nesting only the listed relations"""
+        response = self.client.get(reverse('order-detail', args=[self.order.id]), {'expand': 'seller'})
+        self.assertEqual(response.data['seller']['id'], self.seller.id)
+        self.assertIsNone(response.data['driver_id'])
+        self.assertNotIn('driver', response.data)
+        self.assertIn('customer_name', response.data)
+
+
+class FastSerializationTests(TestCase):
+    """Test the .values() list path, the JSON renderer and response compression"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True,
+            rib='MA64011519000001205000534921'
+        )
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+
+        self.driver_token = AuthToken.objects.create(user=self.driver)
+
+        Stock.objects.create(seller=self.seller, item_name='Test Item', quantity=10, approved=True)
+        for number in range(3):
+            Order.objects.create(
+                seller=self.seller,
+                driver=self.driver if number else None,
+                customer_name=f'Customer {number}',
+                customer_phone='0612345678',
+                delivery_street='123 Test St',
+                delivery_city='Test City',
+                delivery_location='https://www.google.com/maps/@33.5731,-7.5898,15z',
+                item='Test Item',
+                comment='Ring twice' if number else None,
+                quantity=2
+            )
+        Message.objects.create(sender=self.seller, recipient=self.admin, subject='Hello', content='Question')
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.driver_token.key}')
+
+    def assertSameJSON(self, fast, drf):
+        self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(drf))
+
+    def test_values_serializers_match_drf_serializers(self):
+        """Each values serializer renders the same JSON as its DRF serializer"""
+        cases = [
+            (OrderValuesSerializer, OrderDetailSerializer, Order.objects.order_by('id')),
+            (StockValuesSerializer, StockSerializer, Stock.objects.order_by('id')),
+            (MessageValuesSerializer, MessageSerializer, Message.objects.order_by('id')),
+            (UserValuesSerializer, UserSerializer, User.objects.order_by('id')),
+        ]
+        for values_class, serializer_class, queryset in cases:
+            serializer = values_class()
+            fast = serializer.serialize(serializer.values(queryset))
+            self.assertSameJSON(fast, serializer_class(queryset, many=True).data)
+
+    def test_driver_orders_use_one_query(self):
+        """The unpaginated driver list is one query after authentication and validators"""
+        # A last_used flush falling due mid-suite would add an UPDATE
+        last_used.flush()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('driver-orders'))
+        self.assertEqual(len(queries), 3)
+        orders = Order.objects.filter(driver=self.driver).order_by('-updated_at')
+        self.assertEqual(response.content, JSONRenderer().render(OrderDetailSerializer(orders, many=True).data))
+
+        # Sparse fieldsets still go through the serializer
+        response = self.client.get(reverse('driver-orders'), {'fields': 'id'})
+        self.assertEqual(set(response.data[0]), {'id'})
+
+    def test_renderer_matches_json_renderer(self):
+        """FastJSONRenderer produces DRF's bytes for DRF's types"""
+        data = {
+            'when': self.seller.date_joined, 'price': Decimal('12.50'), 'name': 'Rabat — Salé',
+            'separator': 'a\u2028b', 'nested': [1, 2.5, None, True], 7: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(json.loads(FastJSONRenderer().render({'text': 'a\u2028b'})), {'text': 'a\u2028b'})
+
+    def test_responses_are_compressed(self):
+        """Large responses are brotli or gzip encoded depending on Accept-Encoding"""
+        response = self.client.get(reverse('driver-orders'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 2)
+
+        response = self.client.get(reverse('driver-orders'), HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get(reverse('driver-orders'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag / Last-Modified revalidation of detail and list endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+
+        self.orders = [
+            Order.objects.create(
+                seller=self.seller,
+                customer_name=f'Customer {number}',
+                customer_phone='1234567890',
+                delivery_street='123 Test St',
+                delivery_city='Test City',
+                item='Test Item',
+                quantity=1
+            )
+            for number in range(2)
+        ]
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+
+    def test_detail_not_modified(self):
+        """An unchanged order answers 304 from the validator query alone"""
+        url = reverse('order-detail', args=[self.orders[0].id])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        last_used.flush()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 2)  # Token and validators
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Changing the order or the nested seller changes the ETag
+        self.orders[0].customer_name = 'Renamed'
+        self.orders[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.seller.phone = '0600000000'
+        self.seller.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_list_not_modified_until_rows_change(self):
+        """List ETags follow updates and deletions and differ per query string"""
+        url = reverse('seller-orders')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.client.get(url, {'fields': 'id'})['ETag'], etag)
+
+        Order.objects.filter(pk=self.orders[0].pk).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_missing_order_is_still_404(self):
+        """Rows outside the user's scope get the normal 404"""
+        response = self.client.get(reverse('order-detail', args=[9999]), HTTP_IF_NONE_MATCH='W/"x"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# The test process is the only worker, so the local cache is safe to use here
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    """Test the per-user response cache and its invalidation"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+        self.driver2 = User.objects.create_user(
+            username='testdriver2',
+            email='driver2@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.driver_token = AuthToken.objects.create(user=self.driver)
+
+        self.order = Order.objects.create(
+            seller=self.seller,
+            driver=self.driver,
+            customer_name='Test Customer',
+            customer_phone='1234567890',
+            delivery_street='123 Test St',
+            delivery_city='Test City',
+            item='Test Item',
+            quantity=1,
+            status='assigned'
+        )
+
+        self.driver_client = APIClient()
+        self.driver_client.credentials(HTTP_AUTHORIZATION=f'Token {self.driver_token.key}')
+
+    def test_repeated_request_is_served_from_cache(self):
+        """The second identical request only authenticates"""
+        url = reverse('driver-orders')
+        first = self.driver_client.get(url, {'status': 'assigned'})
+        last_used.flush()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.driver_client.get(url, {'status': 'assigned'})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        response = self.driver_client.get(url, {'status': 'assigned'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_status_update_invalidates_driver_list(self):
+        """A status change is visible on the next request"""
+        url = reverse('driver-orders')
+        self.driver_client.get(url)
+        response = self.driver_client.patch(
+            reverse('order-status-update', args=[self.order.id]), {'status': 'in_transit'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(self.driver_client.get(url).content)[0]['status'], 'in_transit')
+
+    def test_reassignment_invalidates_previous_driver(self):
+        """Bulk reassignment invalidates both the old and the new driver"""
+        url = reverse('driver-orders')
+        self.assertEqual(len(json.loads(self.driver_client.get(url).content)), 1)
+
+        admin_client = APIClient()
+        admin_client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        admin_client.post(
+            reverse('bulk-assign-driver'), {'order_ids': [self.order.id], 'driver_id': self.driver2.id}, format='json'
+        )
+        self.assertEqual(json.loads(self.driver_client.get(url).content), [])
+
+    def test_nested_seller_change_invalidates_driver_list(self):
+        """Updating a seller's profile refreshes the drivers' lists that embed it"""
+        url = reverse('driver-orders')
+        self.driver_client.get(url)
+
+        seller_client = APIClient()
+        seller_client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        seller_client.get(reverse('user-profile'))
+        seller_client.patch(reverse('user-profile'), {'phone': '0611111111'}, format='json')
+
+        self.assertEqual(seller_client.get(reverse('user-profile')).data['phone'], '0611111111')
+        order = json.loads(self.driver_client.get(url).content)[0]
+        self.assertEqual(order['seller']['phone'], '0611111111')
+
+    def test_stats(self):
+        """Admins can read per-view hit rates"""
+        url = reverse('driver-orders')
+        for _ in range(3):
+            self.driver_client.get(url)
+        admin_client = APIClient()
+        admin_client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        response = admin_client.get(reverse('response-cache-stats'))
+        self.assertEqual(response.data['views']['DriverOrderListView'],
+                         {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+        self.assertIn('bytes', response.data['backend'])
+
+    def test_local_cache_evicts_least_recently_used(self):
+        """BoundedLocMemCache keeps its pickled size under MAX_BYTES"""
+        bounded = BoundedLocMemCache('bounded-test', {'OPTIONS': {'MAX_BYTES': 3000}})
+        bounded.clear()
+        for name in 'abc':
+            bounded.set(name, 'x' * 900)
+        bounded.get('a')
+        bounded.set('d', 'x' * 900)
+        self.assertIsNone(bounded.get('b'))
+        self.assertIsNotNone(bounded.get('a'))
+        self.assertLessEqual(bounded.stats()['bytes'], 3000)
+        self.assertEqual(bounded.stats()['evictions'], 1)
+
+        bounded.set('huge', 'x' * 5000)
+        self.assertIsNone(bounded.get('huge'))
+
+
+class IdempotencyKeyTests(TestCase):
+    """Test Idempotency-Key handling on order creation and status updates"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+        self.driver_token = AuthToken.objects.create(user=self.driver)
+
+        self.stock = Stock.objects.create(seller=self.seller, item_name='Test Item', quantity=10, approved=True)
+
+        self.order_data = {
+            'customer_name': 'Retry Customer',
+            'customer_phone': '0612345678',
+            'delivery_street': '123 Test St',
+            'delivery_city': 'Test City',
+            'item': 'Test Item',
+            'quantity': 2
+        }
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+
+    def test_retried_order_creation_creates_one_order(self):
+        """A retry replays the first response instead of inserting again"""
+        url = reverse('order-list-create')
+        first = self.client.post(url, self.order_data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        last_used.flush()
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post(url, self.order_data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(len(queries), 2)  # Token and the stored result
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.filter(customer_name='Retry Customer').count(), 1)
+
+        # The same key can't be reused for a different order
+        response = self.client.post(
+            url, {**self.order_data, 'quantity': 3}, format='json', HTTP_IDEMPOTENCY_KEY='order-1'
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Without a key every request runs
+        self.client.post(url, self.order_data, format='json')
+        self.assertEqual(Order.objects.filter(customer_name='Retry Customer').count(), 2)
+
+    def test_retried_status_update_decrements_stock_once(self):
+        """Replaying in_transit doesn't touch the stock again"""
+        order = Order.objects.create(seller=self.seller, driver=self.driver, status='assigned', **self.order_data)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.driver_token.key}')
+        url = reverse('order-status-update', args=[order.id])
+        for _ in range(2):
+            response = client.patch(url, {'status': 'in_transit'}, format='json', HTTP_IDEMPOTENCY_KEY='transit-1')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 8)
+
+    def test_failed_requests_are_not_stored(self):
+        """A rejected request can be retried with the same key"""
+        url = reverse('order-list-create')
+        response = self.client.post(
+            url, {**self.order_data, 'quantity': 50}, format='json', HTTP_IDEMPOTENCY_KEY='order-2'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_purge_command(self):
+        """Keys older than the TTL are deleted"""
+        self.client.post(reverse('order-list-create'), self.order_data, format='json', HTTP_IDEMPOTENCY_KEY='old')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class JobQueueTests(TestCase):
+    """Test the background job queue and the queued password reset email"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+        self.client = APIClient()
+
+    def test_password_reset_email_is_sent_by_worker(self):
+        """The request only queues the email; run_workers sends it"""
+        response = self.client.post(reverse('password-reset-request'), {'email': 'seller@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Job.objects.get().task, 'send_email')
+
+        call_command('run_workers', once=True, threads=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['seller@example.com'])
+        self.assertIn('/password-reset/confirm/', mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().status, 'done')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """A failing job is requeued later, then marked failed after max_attempts"""
+        job = enqueue('send_email', subject='Hi', message='Body', recipient_list=['x@example.com'], max_attempts=2)
+        with mock.patch('mainapp.tasks.send_mail', side_effect=ConnectionRefusedError('SMTP down')):
+            self.assertEqual(run_pending(), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertIn('SMTP down', job.last_error)
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_claim_takes_each_job_once(self):
+        """Two workers never claim the same job"""
+        for number in range(5):
+            enqueue('send_email', subject=str(number), message='', recipient_list=['x@example.com'])
+        first = claim_jobs('worker-1', 3)
+        second = claim_jobs('worker-2', 3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(claim_jobs('worker-3', 3), [])
+
+    def test_claim_token_fits_long_hostnames(self):
+        """Claim tokens of workers with 63-character hostnames fit the locked_by column"""
+        enqueue('send_email', subject='Hi', message='', recipient_list=['x@example.com'])
+        worker_id = f"{'pod-' + 'a' * 59}:4194304"
+        job, = claim_jobs(worker_id, 1)
+        self.assertTrue(job.locked_by.startswith(worker_id))
+        self.assertLessEqual(len(job.locked_by), Job._meta.get_field('locked_by').max_length)
+
+    @override_settings(JOB_RETENTION_DAYS=7)
+    def test_finished_jobs_are_purged_after_retention(self):
+        """Done and failed jobs older than the retention period are deleted; queued ones stay"""
+        jobs = [enqueue('send_email', subject=str(number), message='', recipient_list=['x@example.com'])
+                for number in range(4)]
+        old = timezone.now() - timedelta(days=8)
+        Job.objects.filter(pk=jobs[0].pk).update(status='done', updated_at=old)
+        Job.objects.filter(pk=jobs[1].pk).update(status='failed', updated_at=old)
+        Job.objects.filter(pk=jobs[2].pk).update(status='done')
+        Job.objects.filter(pk=jobs[3].pk).update(updated_at=old)
+
+        out = StringIO()
+        call_command('purge_jobs', stdout=out)
+        self.assertIn("Deleted 2 finished jobs", out.getvalue())
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {jobs[2].pk, jobs[3].pk})
+
+
+class WebhookStub(BaseHTTPRequestHandler):
+    """Records webhook deliveries and answers with the server's status_code"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((body, self.headers[SIGNATURE_HEADER]))
+        self.send_response(self.server.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_ALLOW_PRIVATE_HOSTS=True)
+class WebhookTests(TestCase):
+    """Test the seller webhook outbox and its dispatcher against a local HTTP stub"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True
+        )
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.seller_token = AuthToken.objects.create(user=self.seller)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookStub)
+        self.server.received = []
+        self.server.status_code = 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        response = self.client.post(reverse('webhook-list-create'), {
+            'url': f'http://127.0.0.1:{self.server.server_port}/hooks/'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.endpoint = WebhookEndpoint.objects.get(pk=response.data['id'])
+
+        self.order = Order.objects.create(
+            seller=self.seller,
+            customer_name='Test Customer',
+            customer_phone='1234567890',
+            delivery_street='123 Test St',
+            delivery_city='Test City',
+            item='Test Item',
+            quantity=2,
+            status='pending'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def test_order_changes_are_written_to_the_outbox(self):
+        """Assigning and updating an order adds events without calling the endpoint"""
+        self.client.patch(reverse('assign-driver', kwargs={'pk': self.order.pk}), {'driver_id': self.driver.pk}, format='json')
+        self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': 'in_transit'}, format='json')
+
+        events = list(WebhookEvent.objects.order_by('id'))
+        self.assertEqual([event.event_type for event in events], ['order.assigned', 'order.status_changed'])
+        self.assertEqual(events[1].payload['order']['previous_status'], 'assigned')
+        self.assertEqual(events[1].payload['order']['status'], 'in_transit')
+        self.assertEqual(self.server.received, [])
+
+    def test_dispatch_sends_signed_batch(self):
+        """Due events go out in one signed POST per endpoint and are marked delivered"""
+        Order.objects.filter(pk=self.order.pk).update(status='assigned', driver=self.driver)
+        for new_status in ['in_transit', 'delivered']:
+            self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': new_status}, format='json')
+
+        self.assertEqual(dispatch_webhooks(), (2, 0))
+        self.assertEqual(len(self.server.received), 1)
+        body, signature = self.server.received[0]
+        self.assertTrue(verify_signature(self.endpoint.secret, body, signature))
+        self.assertFalse(verify_signature('wrong-secret', body, signature))
+        statuses = [event['order']['status'] for event in json.loads(body)['events']]
+        self.assertEqual(statuses, ['in_transit', 'delivered'])
+        self.assertEqual(set(WebhookEvent.objects.values_list('status', flat=True)), {'delivered'})
+        self.assertEqual(dispatch_webhooks(), (0, 0))
+
+    def test_failed_delivery_backs_off(self):
+        """An error answer keeps the events pending with a later retry time"""
+        self.server.status_code = 500
+        Order.objects.filter(pk=self.order.pk).update(status='assigned', driver=self.driver)
+        self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': 'in_transit'}, format='json')
+
+        self.assertEqual(dispatch_webhooks(), (0, 1))
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'HTTP 500'))
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        # Not due yet, and newer events for the endpoint wait behind it
+        self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': 'delivered'}, format='json')
+        self.assertEqual(dispatch_webhooks(), (0, 0))
+
+        self.server.status_code = 200
+        WebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_webhooks(), (2, 0))
+
+    def test_sellers_only_see_their_endpoints(self):
+        """The secret is generated server-side and endpoints are scoped to their seller"""
+        other = User.objects.create_user(
+            username='otherseller', email='other@example.com', password='password123', role='seller', approved=True
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        self.assertEqual(other_client.get(reverse('webhook-list-create')).data['count'], 0)
+        self.assertEqual(
+            other_client.get(reverse('webhook-detail', kwargs={'pk': self.endpoint.pk})).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(len(self.endpoint.secret), 64)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_HOSTS=False)
+    def test_only_public_https_urls_are_accepted(self):
+        """Plain http and hosts inside the network are refused"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        for url in [
+            'http://shop.example.com/hooks/',
+            f'https://127.0.0.1:{self.server.server_port}/hooks/',
+            'https://10.0.0.5/hooks/',
+            'https://169.254.169.254/latest/meta-data/',
+            'https://[::1]/hooks/',
+        ]:
+            response = self.client.post(reverse('webhook-list-create'), {'url': url}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertIn('url', response.data)
+
+    def test_delivery_checks_the_address_again(self):
+        """An endpoint whose host now resolves to a private address is not called"""
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(url='https://shop.example.com/hooks/')
+        Order.objects.filter(pk=self.order.pk).update(status='assigned', driver=self.driver)
+        self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': 'in_transit'}, format='json')
+
+        rebound = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.5', 443))]
+        with override_settings(WEBHOOK_ALLOW_PRIVATE_HOSTS=False), \
+                mock.patch('mainapp.webhooks.socket.getaddrinfo', return_value=rebound), \
+                mock.patch('mainapp.webhooks.socket.create_connection') as connect:
+            self.assertEqual(dispatch_webhooks(), (0, 1))
+        connect.assert_not_called()
+        self.assertIn('non-public', WebhookEvent.objects.get().last_error)
+
+    def test_redirects_are_not_followed(self):
+        """A redirect answer is a failed delivery"""
+        self.server.status_code = 302
+        Order.objects.filter(pk=self.order.pk).update(status='assigned', driver=self.driver)
+        self.client.patch(reverse('order-status-update', kwargs={'pk': self.order.pk}), {'status': 'in_transit'}, format='json')
+
+        self.assertEqual(dispatch_webhooks(), (0, 1))
+        self.assertEqual(len(self.server.received), 1)
+        self.assertEqual(WebhookEvent.objects.get().last_error, 'HTTP 302')
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=3)
+class EmailLoginTests(TestCase):
+    """Test the email backend, failed-login limiting and hasher policy"""
+
+    def setUp(self):
+        cache.clear()
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+        self.client = APIClient()
+
+    def test_login_is_one_query(self):
+        """A successful login reads the user once and a failed one doesn't fall through"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(authenticate(email='driver@example.com', password='password123'), self.driver)
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(authenticate(email='driver@example.com', password='wrong'))
+        self.assertEqual(len(queries), 1)
+
+    def test_repeated_failures_are_blocked(self):
+        """After the limit even the right password is refused, without a query"""
+        url = reverse('login')
+        for _ in range(3):
+            response = self.client.post(url, {'email': 'driver@example.com', 'password': 'wrong'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'email': 'driver@example.com', 'password': 'password123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(len(queries), 0)
+
+        cache.clear()
+        response = self.client.post(url, {'email': 'driver@example.com', 'password': 'password123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_changed_hasher_cost_rehashes_on_login(self):
+        """Stored hashes follow PASSWORD_PBKDF2_ITERATIONS after the next login"""
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            authenticate(email='driver@example.com', password='password123')
+            self.driver.refresh_from_db()
+            self.assertTrue(self.driver.password.startswith('pbkdf2_sha256$1000$'))
+            self.assertTrue(self.driver.check_password('password123'))
+
+
+class TokenLifecycleTests(TestCase):
+    """Test expiring per-device tokens, rotation, revocation and purging"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        self.driver = User.objects.create_user(
+            username='testdriver',
+            email='driver@example.com',
+            password='password123',
+            role='driver',
+            approved=True
+        )
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.client = APIClient()
+
+    def profile_status(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client.get(reverse('user-profile')).status_code
+
+    def test_each_login_gets_its_own_token(self):
+        """Two devices get two tokens; logging out one leaves the other"""
+        keys = []
+        for device in ['phone', 'tablet']:
+            response = self.client.post(reverse('login'), {
+                'email': 'driver@example.com', 'password': 'password123', 'device': device
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('expires_at', response.data)
+            keys.append(response.data['token'])
+        self.assertNotEqual(*keys)
+        self.assertEqual(sorted(self.driver.auth_tokens.values_list('device', flat=True)), ['phone', 'tablet'])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {keys[0]}')
+        self.assertEqual(len(self.client.get(reverse('token-list')).data), 2)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.profile_status(keys[0]), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.profile_status(keys[1]), status.HTTP_200_OK)
+
+    def test_expired_token_is_rejected(self):
+        """A token past expires_at no longer authenticates"""
+        token = AuthToken.objects.create(user=self.driver, expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.profile_status(token.key), status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotate_replaces_the_key(self):
+        """Rotation returns a new key for the device and retires the old one"""
+        token = AuthToken.objects.create(user=self.driver, device='phone')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.post(reverse('token-rotate'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.profile_status(token.key), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.profile_status(response.data['token']), status.HTTP_200_OK)
+        self.assertEqual(AuthToken.objects.get(key=response.data['token']).device, 'phone')
+
+    def test_revoke_role_is_one_statement(self):
+        """Revoking a role deletes its tokens in one query and keeps the others"""
+        for _ in range(3):
+            AuthToken.objects.create(user=self.driver)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('token-revoke'), {'role': 'driver'}, format='json')
+        self.assertEqual(response.data, {'revoked': 3})
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 1)
+        self.assertEqual(list(AuthToken.objects.values_list('user_id', flat=True)), [self.admin.pk])
+
+    @override_settings(TOKEN_LAST_USED_INTERVAL=60)
+    def test_last_used_is_written_in_batches(self):
+        """Requests don't write last_used_at; the recorder flushes them in one UPDATE"""
+        last_used.flush()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.client.get(reverse('token-list'))
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(last_used.flush(), 1)
+        self.assertEqual(len(queries), 1)
+        self.admin_token.refresh_from_db()
+        self.assertIsNotNone(self.admin_token.last_used_at)
+
+    def test_purge_command(self):
+        """Expired tokens are deleted, live ones kept"""
+        AuthToken.objects.create(user=self.driver, expires_at=timezone.now() - timedelta(days=1))
+        call_command('purge_tokens', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(AuthToken.objects.all()), [self.admin_token])
+
+
+class BulkUserManagementTests(TestCase):
+    """Test bulk approval, rejection and role changes of users"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        self.drivers = [
+            User.objects.create_user(
+                username=f'driver{number}',
+                email=f'driver{number}@example.com',
+                password='password123',
+                role='driver',
+                approved=False
+            )
+            for number in range(3)
+        ]
+        self.seller = User.objects.create_user(
+            username='testseller',
+            email='seller@example.com',
+            password='password123',
+            role='seller',
+            approved=True,
+            rib='MA64 0000 0000'
+        )
+        self.admin_token = AuthToken.objects.create(user=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.admin_token.key}')
+
+    def updates(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "users_user"')]
+
+    def test_bulk_approve(self):
+        """Pending users are approved with one UPDATE, with an outcome per user"""
+        user_ids = [driver.pk for driver in self.drivers] + [self.seller.pk, self.admin.pk, 999999]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('bulk-approve-users'), {'user_ids': user_ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['updated_count'], response.data['unchanged_count'], response.data['error_count']), (3, 1, 2)
+        )
+        self.assertEqual(len(self.updates(queries)), 1)
+        self.assertEqual(User.objects.filter(role='driver', approved=True).count(), 3)
+
+    def test_role_change_clears_seller_rib_in_same_update(self):
+        """A seller moved to driver loses the RIB in the role UPDATE, and cached profiles refresh"""
+        seller_token = AuthToken.objects.create(user=self.seller)
+        seller_client = APIClient()
+        seller_client.credentials(HTTP_AUTHORIZATION=f'Token {seller_token.key}')
+        self.assertEqual(seller_client.get(reverse('user-profile')).json()['role'], 'seller')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('bulk-user-role'), {
+                'user_ids': [self.seller.pk, self.drivers[0].pk], 'role': 'driver'
+            }, format='json')
+        self.assertEqual(response.data['updated_count'], 1)
+        self.assertEqual(len(self.updates(queries)), 1)
+        self.seller.refresh_from_db()
+        self.assertEqual((self.seller.role, self.seller.rib), ('driver', ''))
+        self.assertEqual(seller_client.get(reverse('user-profile')).json()['role'], 'driver')
+
+    def test_bulk_reject_signs_users_out(self):
+        """Rejected users are deactivated and their tokens no longer work"""
+        driver = self.drivers[0]
+        token = AuthToken.objects.create(user=driver)
+        response = self.client.post(reverse('bulk-reject-users'), {'user_ids': [driver.pk]}, format='json')
+        self.assertEqual(response.data['updated_count'], 1)
+        driver.refresh_from_db()
+        self.assertFalse(driver.is_active)
+        self.assertFalse(AuthToken.objects.filter(pk=token.pk).exists())
+
+    def test_invalid_requests(self):
+        """Bad ids or roles are rejected and non-admins are forbidden"""
+        url = reverse('bulk-user-role')
+        self.assertEqual(self.client.post(url, {'user_ids': 'x', 'role': 'driver'}, format='json').status_code, 400)
+        self.assertEqual(
+            self.client.post(url, {'user_ids': [self.seller.pk], 'role': 'boss'}, format='json').status_code, 400
+        )
+        seller_client = APIClient()
+        seller_client.force_authenticate(self.seller)
+        response = seller_client.post(reverse('bulk-approve-users'), {'user_ids': [self.seller.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UsernameGenerationTests(TestCase):
+    """Test usernames generated from the email for registrations without one"""
+
+    def test_next_number_after_the_highest(self):
+        """A taken base gets one past the highest number, in one query"""
+        for username in ['amine', 'amine_2', 'amine_7', 'amine_x', 'aminex']:
+            User.objects.create(username=username, email=f'{username}@example.com')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(next_free_username('amine'), 'amine_8')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(next_free_username('karim'), 'karim')
+
+    def test_registration_without_username(self):
+        """The email prefix is used, cut and cleaned"""
+        serializer = DriverRegistrationSerializer(data={
+            'email': 'very.long+tag!name@example.com', 'password': 'password123'
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().username, 'very.long+tagna')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """Test username allocation under parallel signups"""
+
+    def register(self, number):
+        try:
+            serializer = DriverRegistrationSerializer(data={
+                'email': f'driver@shop{number}.example.com', 'password': 'password123'
+            })
+            serializer.is_valid(raise_exception=True)
+            return serializer.save().username
+        finally:
+            connection.close()
+
+    def test_parallel_signups_sharing_a_prefix(self):
+        """1,000 parallel signups with the same email prefix all get distinct usernames"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            usernames = list(pool.map(self.register, range(1000)))
+        self.assertEqual(len(set(usernames)), 1000)
+        self.assertEqual(User.objects.filter(email__startswith='driver@').count(), 1000)
+        self.assertIn('driver', usernames)
+        for username in usernames:
+            self.assertRegex(username, r'^driver(_\d+)?$')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    """Test the CSV user import"""
+
+    CSV = (
+        "email,role,username,password,first_name,city,rib\n"
+        "amine@agency.ma,driver,,secret-1,Amine,Casablanca,\n"
+        "shop@agency.ma,seller,shopowner,secret-2,Sara,Rabat,MA64 1111\n"
+        "rider@agency.ma,driver,,,Youssef,Fes,MA64 2222\n"
+        "amine@agency.ma,driver,,secret-3,Amine,Casablanca,\n"
+        "existing@example.com,driver,,secret-4,Old,Tanger,\n"
+        "boss@agency.ma,admin,,secret-5,Boss,Rabat,\n"
+        "not-an-email,driver,,secret-6,Bad,Rabat,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='testadmin',
+            email='admin@example.com',
+            password='password123',
+            role='admin',
+            approved=True
+        )
+        User.objects.create_user(username='amine', email='existing@example.com', password='x', role='driver')
+
+    def test_import_with_error_report(self):
+        """Valid rows are created in bulk and every rejected row is reported with its line"""
+        result = import_users(StringIO(self.CSV), workers=2, approve=True)
+        self.assertEqual(result['created'], 3)
+        self.assertEqual([error['line'] for error in result['errors']], [5, 6, 7, 8])
+        self.assertIn("Duplicate email in file", result['errors'][0]['errors'])
+        self.assertIn("A user with this email already exists", result['errors'][1]['errors'])
+
+        amine = User.objects.get(email='amine@agency.ma')
+        self.assertEqual((amine.username, amine.approved), ('amine_1', True))
+        self.assertTrue(amine.check_password('secret-1'))
+        self.assertEqual(User.objects.get(email='shop@agency.ma').rib, 'MA64 1111')
+        rider = User.objects.get(email='rider@agency.ma')
+        self.assertIsNone(rider.rib)
+        self.assertFalse(rider.has_usable_password())
+
+    def test_one_lookup_and_one_insert_per_chunk(self):
+        """Each chunk checks uniqueness with one query and inserts with one statement"""
+        rows = "email,role\n" + "".join(f"rider{number}@agency.ma,driver\n" for number in range(40))
+        with CaptureQueriesContext(connection) as queries:
+            result = import_users(StringIO(rows), workers=1, chunk_size=20)
+        self.assertEqual(result['created'], 40)
+        user_queries = [query['sql'] for query in queries if '"users_user"' in query['sql']]
+        self.assertEqual(sum(sql.startswith('SELECT') for sql in user_queries), 2)
+        self.assertEqual(sum(sql.startswith('INSERT') for sql in user_queries), 2)
+
+    def test_upload_endpoint(self):
+        """Admins upload a CSV; dry_run validates without creating users"""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('drivers.csv', self.CSV.encode(), content_type='text/csv')
+        response = client.post(reverse('user-import'), {'file': upload, 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['error_count']), (3, 4))
+        self.assertFalse(User.objects.filter(email='amine@agency.ma').exists())
+
+    def test_upload_is_imported_in_the_background(self):
+        """A real import is queued as a job and the report is emailed to the admin"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('drivers.csv', self.CSV.encode(), content_type='text/csv')
+        response = client.post(reverse('user-import'), {'file': upload, 'approve': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.task, 'import_users_csv')
+        # The queued job names the saved upload; no password is stored in it
+        self.assertNotIn('secret-1', json.dumps(job.payload))
+        upload_name = job.payload['upload_name']
+        self.assertTrue(default_storage.exists(upload_name))
+        self.assertFalse(User.objects.filter(email='amine@agency.ma').exists())
+
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.payload), ('done', {}))
+        self.assertFalse(default_storage.exists(upload_name))
+        self.assertTrue(User.objects.get(email='amine@agency.ma').approved)
+        self.assertEqual(mail.outbox[0].to, ['admin@example.com'])
+        self.assertIn("Created 3 users, 4 rows rejected.", mail.outbox[0].body)
+
+        bad = SimpleUploadedFile('drivers.csv', b'name,city\nAmine,Rabat\n', content_type='text/csv')
+        response = client.post(reverse('user-import'), {'file': bad}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdminChangelistTests(TestCase):
+    """Admin changelists run a fixed number of queries however many rows they show"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='superadmin', email='superadmin@example.com', password='password123', role='admin'
+        )
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for number in range(Order.objects.count(), Order.objects.count() + count):
+            seller = User.objects.create_user(
+                username=f'adminseller{number}', email=f'adminseller{number}@example.com',
+                password='x', role='seller', approved=True,
+            )
+            driver = User.objects.create_user(
+                username=f'admindriver{number}', email=f'admindriver{number}@example.com',
+                password='x', role='driver', approved=True,
+            )
+            Order.objects.create(
+                seller=seller, driver=driver, customer_name=f'Customer {number}', customer_phone='0600000000',
+                delivery_street='1 Rue Atlas', delivery_city='Casablanca', item='Box', quantity=1,
+                status='assigned',
+            )
+            Stock.objects.create(seller=seller, item_name=f'Item {number}', quantity=5)
+            Message.objects.create(sender=seller, recipient=driver, subject='Pickup', content='Ready')
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        self.add_rows(2)
+        few = self.changelist_queries(url)
+        self.add_rows(8)
+        self.assertEqual(self.changelist_queries(url), few)
+
+    def test_order_changelist(self):
+        """Sellers and drivers are joined into the order list"""
+        self.assert_constant_queries(reverse('admin:mainapp_order_changelist'))
+
+    def test_stock_changelist(self):
+        """The stock list joins sellers and its seller filter doesn't load every user"""
+        self.assert_constant_queries(reverse('admin:mainapp_stock_changelist'))
+        seller = Stock.objects.first().seller
+        response = self.client.get(reverse('admin:mainapp_stock_changelist'), {'seller__id__exact': seller.pk})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'data-filter-parameter="seller__id__exact"')
+        self.assertContains(response, 'admin/js/autocomplete_filter.js')
+
+    def test_message_changelist(self):
+        """Senders and recipients are joined into the message list"""
+        self.assert_constant_queries(reverse('admin:mainapp_message_changelist'))
+
+    def test_user_changelist(self):
+        """The user list doesn't grow with the number of users"""
+        self.assert_constant_queries(reverse('admin:users_user_changelist'))
+
+    def test_order_search_by_city_and_short_terms(self):
+        """Admin order search finds cities and short terms the search index can't serve"""
+        self.add_rows(2)
+        seller = User.objects.get(username='adminseller0')
+        jo = Order.objects.create(
+            seller=seller, customer_name='Jo Bo', customer_phone='0611111111',
+            delivery_street='9 Rue Atlas', delivery_city='Marrakech', item='Box', quantity=1,
+        )
+        url = reverse('admin:mainapp_order_changelist')
+
+        def found(term):
+            response = self.client.get(url, {'q': term})
+            return {order.pk for order in response.context['cl'].result_list}
+
+        casablanca = set(Order.objects.filter(delivery_city='Casablanca').values_list('pk', flat=True))
+        self.assertEqual(found('Casablanca'), casablanca)
+        self.assertEqual(found('Jo'), {jo.pk})
+        self.assertEqual(found('Marrakech Atlas'), {jo.pk})
+        self.assertEqual(found('Atlas'), casablanca | {jo.pk})
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=3)
+    def test_estimated_count_above_threshold(self):
+        """Unfiltered lists above the threshold use the estimate, filtered ones count exactly"""
+        self.add_rows(4)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Order.objects.filter(pk=Order.objects.order_by('pk').first().pk).delete()
+        # The estimate is as of the last ANALYZE
+        self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('pk'), 10).count, 4)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.filter(status='assigned'), 10).count, 3)
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=100000):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('pk'), 10).count, 3)
+
+
+class OrderArchiveTests(TestCase):
+    """Archival of old delivered/canceled orders and reads through to the archive"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='archiveadmin', email='archiveadmin@example.com', password='x', role='admin', approved=True
+        )
+        self.seller = User.objects.create_user(
+            username='archiveseller', email='archiveseller@example.com', password='x', role='seller', approved=True
+        )
+        self.driver = User.objects.create_user(
+            username='archivedriver', email='archivedriver@example.com', password='x', role='driver', approved=True
+        )
+        old = timezone.now() - timedelta(days=120)
+        self.orders = {}
+        for name, order_status, updated_at in [
+            ('Old Delivered', 'delivered', old),
+            ('Old Canceled', 'canceled', old - timedelta(days=1)),
+            ('Recent Delivered', 'delivered', timezone.now()),
+            ('Old Pending', 'pending', old + timedelta(days=1)),
+        ]:
+            order = Order.objects.create(
+                seller=self.seller, driver=self.driver, customer_name=name, customer_phone='0612345678',
+                delivery_street='5 Rue Fes', delivery_city='Rabat', item='Parcel', quantity=1, status='assigned',
+            )
+            Order.objects.filter(pk=order.pk).update(status=order_status, updated_at=updated_at, created_at=updated_at)
+            self.orders[name] = order.pk
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def test_archive_moves_old_terminal_orders(self):
+        """Only delivered/canceled orders older than the window move, with their ids and columns"""
+        before = Order.objects.values().get(pk=self.orders['Old Delivered'])
+        self.assertEqual(archive_orders(batch_size=1), 2)
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list('pk', flat=True)),
+            {self.orders['Old Delivered'], self.orders['Old Canceled']},
+        )
+        self.assertEqual(
+            set(Order.objects.values_list('customer_name', flat=True)), {'Recent Delivered', 'Old Pending'}
+        )
+        after = ArchivedOrder.objects.values().get(pk=self.orders['Old Delivered'])
+        self.assertEqual({name: after[name] for name in before}, before)
+        self.assertEqual(archive_orders(), 0)
+
+    def test_list_reads_through_only_when_asked(self):
+        """Lists skip the archive unless include_archived or an old date range asks for it"""
+        archive_orders()
+        response = self.client.get(reverse('seller-orders'))
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(reverse('seller-orders'), {'include_archived': '1'})
+        names = [order['customer_name'] for order in response.data['results']]
+        self.assertEqual(names, ['Recent Delivered', 'Old Pending', 'Old Delivered', 'Old Canceled'])
+
+        response = self.client.get(reverse('seller-orders'), {'include_archived': '1', 'fields': 'id,customer_name'})
+        self.assertEqual([order['customer_name'] for order in response.data['results']], names)
+
+        old_day = (timezone.now() - timedelta(days=125)).date().isoformat()
+        response = self.client.get(reverse('order-list-create'), {'min_date': old_day, 'status': 'delivered'})
+        self.assertEqual(
+            [order['customer_name'] for order in response.data['results']], ['Recent Delivered', 'Old Delivered']
+        )
+
+        # A range open below covers the archived orders too
+        today = timezone.now().date().isoformat()
+        response = self.client.get(reverse('order-list-create'), {'max_date': today, 'status': 'delivered'})
+        self.assertEqual(
+            [order['customer_name'] for order in response.data['results']], ['Recent Delivered', 'Old Delivered']
+        )
+        response = self.client.get(reverse('order-list-create'), {'min_date': today, 'max_date': today})
+        self.assertNotIn('Old Delivered', [order['customer_name'] for order in response.data['results']])
+
+    def test_detail_reads_through_read_only(self):
+        """An archived order is found with include_archived, by its owner only, and can't be edited"""
+        archive_orders()
+        url = reverse('order-detail', args=[self.orders['Old Delivered']])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url + '?include_archived=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['customer_name'], response.data['status']), ('Old Delivered', 'delivered'))
+
+        response = self.client.patch(url + '?include_archived=1', {'comment': 'late'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        other_seller = User.objects.create_user(
+            username='otherseller', email='otherseller@example.com', password='x', role='seller', approved=True
+        )
+        self.client.force_authenticate(other_seller)
+        self.assertEqual(self.client.get(url + '?include_archived=1').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderPartitionTests(TestCase):
+    """Month partition helpers and the date filters that prune partitions"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='partitionadmin', email='partitionadmin@example.com', password='x', role='admin', approved=True
+        )
+        self.seller = User.objects.create_user(
+            username='partitionseller', email='partitionseller@example.com', password='x', role='seller', approved=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_order(self, name, created_at):
+        order = Order.objects.create(
+            seller=self.seller, customer_name=name, customer_phone='0612345678',
+            delivery_street='3 Rue Tanger', delivery_city='Tetouan', item='Parcel', quantity=1,
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def test_date_filters_cover_whole_days(self):
+        """min_date and max_date include every order of those days and nothing around them"""
+        day = timezone.now().date() - timedelta(days=3)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        self.create_order('Just Before', start - timedelta(seconds=1))
+        self.create_order('Morning', start + timedelta(hours=8))
+        self.create_order('Late Night', start + timedelta(hours=23, minutes=59))
+        self.create_order('Next Day', start + timedelta(days=1))
+
+        response = self.client.get(reverse('order-list-create'), {'min_date': day, 'max_date': day})
+        self.assertEqual(
+            sorted(order['customer_name'] for order in response.data['results']), ['Late Night', 'Morning']
+        )
+
+    def test_month_helpers(self):
+        """Partitions are named and bounded by UTC calendar month"""
+        moment = datetime(2025, 12, 31, 23, 30, tzinfo=timezone.get_fixed_timezone(-60))
+        month = month_start(moment)
+        self.assertEqual((month.year, month.month, month.day, month.hour), (2026, 1, 1, 0))
+        self.assertEqual(partition_name(month), 'mainapp_order_p2026_01')
+        self.assertEqual(next_month(datetime(2025, 12, 1, tzinfo=month.tzinfo)).month, 1)
+
+    def test_command_without_partitioning(self):
+        """On SQLite the order table stays whole and the command says so"""
+        self.assertFalse(is_partitioned())
+        out = StringIO()
+        call_command('order_partitions', '--retire-before', '2024-01', stdout=out)
+        self.assertIn("isn't partitioned", out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', "Order partitioning is PostgreSQL only")
+class PostgresPartitionTests(TransactionTestCase):
+    """The partitioned order table: migration, routing of rows and retiring old months"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='partitionseller', email='partitionseller@example.com', password='x', role='seller', approved=True
+        )
+
+    def create_order(self, name, created_at, status='pending'):
+        order = Order.objects.create(
+            seller=self.seller, customer_name=name, customer_phone='0612345678',
+            delivery_street='3 Rue Tanger', delivery_city='Tetouan', item='Parcel', quantity=1,
+        )
+        # Moves the row to the partition of its new month
+        Order.objects.filter(pk=order.pk).update(created_at=created_at, status=status)
+        return order.pk
+
+    def partition_of(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {Order._meta.db_table} WHERE id = %s", [pk])
+            return cursor.fetchone()[0]
+
+    def add_partition(self, month):
+        name = partition_name(month)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {Order._meta.db_table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            )
+        self.addCleanup(self.drop_table, name)
+
+    def drop_table(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+
+    def test_migrate_backward_and_forward(self):
+        """Unpartitioning and partitioning again keep the rows and the id sequence"""
+        first = self.create_order('First', timezone.now())
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes()
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(latest))
+
+        executor.migrate([('mainapp', '0015_archived_orders')])
+        self.assertFalse(is_partitioned())
+        self.assertEqual(list(Order.objects.values_list('pk', flat=True)), [first])
+        second = self.create_order('Second', timezone.now())
+        self.assertGreater(second, first)
+
+        executor.loader.build_graph()
+        executor.migrate(latest)
+        self.assertTrue(is_partitioned())
+        self.assertEqual(sorted(Order.objects.values_list('pk', flat=True)), [first, second])
+        self.assertGreater(self.create_order('Third', timezone.now()), second)
+
+    def test_inserts_across_month_boundaries(self):
+        """Rows land in the partition of their UTC month, either side of midnight"""
+        ensure_partitions(months_ahead=1)
+        month = month_start(timezone.now())
+        boundary = next_month(month)
+        before = self.create_order('Last Moment', boundary - timedelta(microseconds=1))
+        after = self.create_order('First Moment', boundary)
+        self.assertEqual(self.partition_of(before), partition_name(month))
+        self.assertEqual(self.partition_of(after), partition_name(boundary))
+
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        day = (boundary - timedelta(days=1)).date()
+        results = client.get(reverse('order-list-create'), {'min_date': day, 'max_date': day}).data['results']
+        self.assertEqual([order['customer_name'] for order in results], ['Last Moment'])
+
+    def test_retire_only_finished_partitions(self):
+        """A month of delivered/canceled orders is archived and dropped; one with open orders stays"""
+        finished = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        open_month = next_month(finished)
+        self.add_partition(finished)
+        self.add_partition(open_month)
+        delivered = self.create_order('Delivered', finished + timedelta(days=3), status='delivered')
+        self.create_order('Canceled', finished + timedelta(days=4), status='canceled')
+        self.create_order('Done', open_month + timedelta(days=1), status='delivered')
+        pending = self.create_order('Pending', open_month + timedelta(days=2))
+
+        results = retire_partitions(next_month(open_month))
+        self.assertEqual(results, [
+            (partition_name(finished), 'archived', 2),
+            (partition_name(open_month), 'skipped', 1),
+        ])
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list('customer_name', flat=True)), {'Delivered', 'Canceled'}
+        )
+        self.assertFalse(Order.objects.filter(pk=delivered).exists())
+        self.assertEqual(self.partition_of(pending), partition_name(open_month))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [partition_name(finished)])
+            self.assertIsNone(cursor.fetchone()[0])
@@ -1,5 +1,7 @@
 from django.urls import path
-from .views import ApproveStockView, AssignDriverView, MessageDetailView, MessageListCreateView
+from .views import ApproveStockView, AssignDriverView, AutoAssignDriversView, MessageDetailView, MessageListCreateView
+from .views import BulkAssignDriverView, BulkOrderStatusUpdateView, CustomerHistoryView, DriverRouteView, OrderNearbyView
+from .views import ResponseCacheStatsView, WebhookEndpointDetailView, WebhookEndpointListCreateView
 from .views import (
     OrderListCreateView, OrderDetailView, OrderStatusUpdateView, 
     DriverOrderListView, SellerOrderListView,
@@ -12,8 +14,14 @@ urlpatterns = [
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:pk>/status/', OrderStatusUpdateView.as_view(), name='order-status-update'),
     path('driver/orders/', DriverOrderListView.as_view(), name='driver-orders'),
+    path('driver/route/', DriverRouteView.as_view(), name='driver-route'),
     path('seller/orders/', SellerOrderListView.as_view(), name='seller-orders'),
     path('orders/<int:pk>/assign/', AssignDriverView.as_view(), name='assign-driver'),
+    path('orders/auto-assign/', AutoAssignDriversView.as_view(), name='auto-assign-drivers'),
+    path('orders/bulk/assign/', BulkAssignDriverView.as_view(), name='bulk-assign-driver'),
+    path('orders/customer-history/', CustomerHistoryView.as_view(), name='customer-history'),
+    path('orders/nearby/', OrderNearbyView.as_view(), name='order-nearby'),
+    path('orders/bulk/status/', BulkOrderStatusUpdateView.as_view(), name='bulk-order-status-update'),
     
     # Stock endpoints
     path('stock/', StockListCreateView.as_view(), name='stock-list-create'),
@@ -28,6 +36,13 @@ urlpatterns = [
     # Message endpoints
     path('messages/', MessageListCreateView.as_view(), name='message-list-create'),
     path('messages/<int:pk>/', MessageDetailView.as_view(), name='message-detail'),
+
+    # Response cache monitoring
+    path('cache/stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+
+    # Seller webhook endpoints
+    path('webhooks/', WebhookEndpointListCreateView.as_view(), name='webhook-list-create'),
+    path('webhooks/<int:pk>/', WebhookEndpointDetailView.as_view(), name='webhook-detail'),
    
     
     
@@ -1,3 +1,7 @@
+import heapq
+import math
+from datetime import timedelta
+
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -5,14 +9,31 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as filters
+from django.db import transaction
 from django.db.models import Q
 
 from users.serializers import UserSerializer
 
-from .models import  Order, Stock , Message
+from .models import  ArchivedOrder, Order, Stock , Message, WebhookEndpoint
+from .archive import ArchiveReadThroughMixin
+from .assignment import assign_pending_orders
+from .bulk import BULK_MAX_ORDERS, bulk_assign_driver, bulk_update_status, summarize
+from .conditional import ConditionalGetMixin
+from .fastpath import (
+    FastListMixin, MessageValuesSerializer, OrderValuesSerializer,
+    StockValuesSerializer, UserValuesSerializer
+)
+from .geo import bounding_box, haversine_km
+from .idempotency import idempotent
+from .partitions import day_start
+from .phones import normalize_e164
+from .response_cache import ResponseCacheMixin, response_cache_stats
+from .routes import build_driver_route
+from .search import search_orders
+from .webhooks import generate_secret, record_order_events
 from .serializers import (
     MessageSerializer, OrderCreateSerializer, OrderDetailSerializer,
-    OrderStatusUpdateSerializer, StockSerializer
+    OrderStatusUpdateSerializer, StockSerializer, WebhookEndpointSerializer
 )
 from .permissions import (
     IsAdmin, IsAdminSeller, IsSeller, IsDriver,
@@ -28,13 +49,52 @@ User = get_user_model()
 
 
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderFilter(filters.FilterSet):
+    # Whole days, compared with constant timestamps so PostgreSQL only reads
+    # the monthly partitions in range (mainapp/partitions.py)
+    min_date = filters.DateFilter(method='filter_min_date')
+    max_date = filters.DateFilter(method='filter_max_date')
+    
+    class Meta:
+        model = Order
+        fields = ['status', 'created_at', 'delivery_city', 'customer_name', 'min_date', 'max_date']
+
+    def filter_min_date(self, queryset, name, value):
+        return queryset.filter(created_at__gte=day_start(value))
+
+    def filter_max_date(self, queryset, name, value):
+        return queryset.filter(created_at__lt=day_start(value + timedelta(days=1)))
+
+
+class SparseFieldsViewMixin:
+    """
+    Narrows the queryset of GET requests to what the serializer renders:
+    related users are joined, and ?fields= / ?expand= requests load only the
+    columns they return (see SparseFieldsMixin).
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.request.method in ('GET', 'HEAD') and hasattr(serializer_class, 'narrow_queryset'):
+            queryset = serializer_class.narrow_queryset(queryset, self.request)
+        return queryset
+
+
+class OrderListCreateView(ConditionalGetMixin, ArchiveReadThroughMixin, FastListMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows orders to be viewed or created.
     GET: Admins can see all orders. Sellers can only see their own orders.
+         ?include_archived=1, or a date range archived orders can fall in
+         (min_date before the hot window, or max_date without min_date),
+         also lists archived orders (see mainapp/archive.py).
     POST: Admins can create orders for any seller. Sellers can only create their own orders.
+          Retries can send an Idempotency-Key header (see mainapp/idempotency.py).
     """
     permission_classes = [IsAuthenticated, IsAdminSeller]
+    conditional_related = ['seller', 'driver']
+    replica_reads = True
+    values_serializer_class = OrderValuesSerializer
+    archive_date_range = ('min_date', 'max_date')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -44,15 +104,36 @@ class OrderListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
-            return Order.objects.all().order_by('-updated_at')  # Explicitly order the queryset
+            queryset = Order.objects.all().order_by('-updated_at')  # Explicitly order the queryset
         elif user.role == 'seller':
-            return Order.objects.filter(seller=user).order_by('-updated_at')  # Explicitly order the queryset
+            queryset = Order.objects.filter(seller=user).order_by('-updated_at')  # Explicitly order the queryset
         elif user.role == 'driver':
-            return Order.objects.filter(driver=user).order_by('-updated_at')  # Explicitly order the queryset
-        return Order.objects.none()
+            queryset = Order.objects.filter(driver=user).order_by('-updated_at')  # Explicitly order the queryset
+        else:
+            return Order.objects.none()
+
+        # ?q= runs a ranked search over customer, phone, street, item and comment
+        query = self.request.query_params.get('q')
+        if query:
+            queryset = search_orders(queryset, query)
+        return queryset
+
+    def get_archive_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return ArchivedOrder.objects.order_by('-updated_at')
+        elif user.role == 'seller':
+            return ArchivedOrder.objects.filter(seller=user).order_by('-updated_at')
+        elif user.role == 'driver':
+            return ArchivedOrder.objects.filter(driver=user).order_by('-updated_at')
+        return ArchivedOrder.objects.none()
     
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['status', 'created_at', 'delivery_city', 'customer_name']
+    filterset_class = OrderFilter
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """
@@ -75,39 +156,106 @@ class OrderListCreateView(generics.ListCreateAPIView):
             serializer.save(seller=user)
 
 
-class SellerOrderListView(generics.ListAPIView):
+class SellerOrderListView(ResponseCacheMixin, ConditionalGetMixin, ArchiveReadThroughMixin, FastListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     """
     API endpoint that allows a seller to view their own orders.
+    ?include_archived=1 adds their archived orders.
     """
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated, IsSeller]
+    conditional_related = ['seller', 'driver']
+    replica_reads = True
+    values_serializer_class = OrderValuesSerializer
     
+    def get_cache_scopes(self, request):
+        return [f'orders:seller:{request.user.pk}']
+
     def get_queryset(self):
         return Order.objects.filter(seller=self.request.user).order_by('-updated_at')
 
+    def get_archive_queryset(self):
+        return ArchivedOrder.objects.filter(seller=self.request.user).order_by('-updated_at')
 
-class DriverOrderListView(generics.ListAPIView):
+
+class DriverOrderListView(ResponseCacheMixin, ConditionalGetMixin, ArchiveReadThroughMixin, FastListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     """
     API endpoint that allows a driver to view orders assigned to them.
+    ?include_archived=1 adds their archived orders.
     """
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated, IsDriver]
+    conditional_related = ['seller', 'driver']
+    replica_reads = True
+    values_serializer_class = OrderValuesSerializer
     pagination_class = None #uncomment this line to disable pagination
     
+    def get_cache_scopes(self, request):
+        return [f'orders:driver:{request.user.pk}']
+
     def get_queryset(self):
         return Order.objects.filter(driver=self.request.user).order_by('-updated_at')
 
+    def get_archive_queryset(self):
+        return ArchivedOrder.objects.filter(driver=self.request.user).order_by('-updated_at')
+
+
+class DriverRouteView(APIView):
+    """
+    API endpoint that returns a driver's open orders in delivery order.
+    Drivers get their own route; admins pass ?driver_id=.
+    Optional ?lat=&lng= sets the starting point (e.g. the driver's position).
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrAssignedDriver]
+
+    def get(self, request):
+        if request.user.role == 'admin':
+            try:
+                driver_id = int(request.query_params['driver_id'])
+            except (KeyError, ValueError):
+                return Response({"error": "driver_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            driver_id = request.user.id
+
+        start = None
+        if 'lat' in request.query_params or 'lng' in request.query_params:
+            try:
+                start = (float(request.query_params['lat']), float(request.query_params['lng']))
+            except (KeyError, ValueError):
+                return Response({"error": "lat and lng must both be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        route = build_driver_route(driver_id, start)
+        orders = Order.objects.select_related('seller', 'driver').in_bulk([order_id for order_id, _ in route])
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
+        stops = []
+        total_distance = 0.0
+        for sequence, (order_id, leg) in enumerate(route, start=1):
+            if order_id not in orders:
+                continue  # Deleted since the route was cached
+            stop = OrderDetailSerializer(orders[order_id]).data
+            stop['sequence'] = sequence
+            stop['distance_from_previous_km'] = leg
+            total_distance += leg or 0.0
+            stops.append(stop)
+
+        return Response({
+            "driver_id": driver_id,
+            "total_distance_km": round(total_distance, 3),
+            "stops": stops,
+        })
+
+
+class OrderDetailView(ConditionalGetMixin, ArchiveReadThroughMixin, SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API endpoint that allows a single order to be viewed, updated, or deleted.
     GET: Admins can see any order. Sellers can only see their own orders.
          Drivers can only see orders assigned to them.
+         With ?include_archived=1, archived orders are found too (read-only).
     PUT/PATCH: Admins can update any order. Sellers can update their own orders' details (not status).
     DELETE: Only admins can delete orders.
     """
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated]
+    conditional_related = ['seller', 'driver']
     
     def get_queryset(self):
         user = self.request.user
@@ -118,6 +266,16 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
         elif user.role == 'driver':
             return Order.objects.filter(driver=user)
         return Order.objects.none()
+
+    def get_archive_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return ArchivedOrder.objects.all()
+        elif user.role == 'seller':
+            return ArchivedOrder.objects.filter(seller=user)
+        elif user.role == 'driver':
+            return ArchivedOrder.objects.filter(driver=user)
+        return ArchivedOrder.objects.none()
     
     def get_permissions(self):
         """
@@ -148,9 +306,11 @@ class OrderStatusUpdateView(APIView):
     - Admins can update any order's status
     - Assigned drivers can only update their assigned orders' status
     - Sellers cannot update status (they must go through admin)
+    - Retries can send an Idempotency-Key header (see mainapp/idempotency.py)
     """
     permission_classes = [IsAuthenticated, IsAdminOrAssignedDriver]
     
+    @idempotent
     def patch(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
         
@@ -178,13 +338,19 @@ class OrderStatusUpdateView(APIView):
         serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
         
         if serializer.is_valid():
-            # Save the order first
-            updated_order = serializer.save()
-            
-            # If status changed to in_transit, update stock
-            if previous_status != 'in_transit' and updated_order.status == 'in_transit':
-                self._update_stock_on_transit(updated_order)
-                
+            with transaction.atomic():
+                # Save the order first
+                updated_order = serializer.save()
+
+                # If status changed to in_transit, update stock
+                if previous_status != 'in_transit' and updated_order.status == 'in_transit':
+                    self._update_stock_on_transit(updated_order)
+
+                if updated_order.status != previous_status:
+                    record_order_events(
+                        'order.status_changed', [updated_order], {updated_order.pk: previous_status}
+                    )
+
             return Response(OrderDetailSerializer(updated_order).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -202,7 +368,7 @@ class OrderStatusUpdateView(APIView):
             # Log this situation but don't break the flow
             print(f"Warning: Stock not found for item {order.item} from seller {order.seller.id}")
 
-class StockListCreateView(generics.ListCreateAPIView):
+class StockListCreateView(ResponseCacheMixin, ConditionalGetMixin, FastListMixin, SparseFieldsViewMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows stock items to be viewed or created.
     GET: Admins can see all stock items. Sellers can only see their own stock.
@@ -210,7 +376,15 @@ class StockListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated, IsAdminSeller]
+    conditional_related = ['seller']
+    replica_reads = True
+    values_serializer_class = StockValuesSerializer
     
+    def get_cache_scopes(self, request):
+        if request.user.role == 'admin':
+            return ['stock:all']
+        return [f'stock:seller:{request.user.pk}']
+
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
@@ -241,12 +415,13 @@ class StockListCreateView(generics.ListCreateAPIView):
             serializer.save(seller=user)
 
 
-class StockDetailView(generics.RetrieveUpdateDestroyAPIView):
+class StockDetailView(ConditionalGetMixin, SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API endpoint that allows a single stock item to be viewed, updated, or deleted.
     """
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated, IsAdminOrSellerOwner]
+    conditional_related = ['seller']
     
     def get_queryset(self):
         user = self.request.user
@@ -271,18 +446,252 @@ class AssignDriverView(APIView):
         except User.DoesNotExist:
             return Response({"error": "Driver not found"}, status=status.HTTP_404_NOT_FOUND)
             
+        previous_status = order.status
         order.driver = driver
         order.status = 'assigned'
-        order.save()
-        
+        with transaction.atomic():
+            order.save()
+            record_order_events('order.assigned', [order], {order.pk: previous_status})
+
         return Response(OrderDetailSerializer(order).data)
-class UserListView(generics.ListAPIView):
+
+
+class AutoAssignDriversView(APIView):
+    """
+    API endpoint for admins to assign pending orders to drivers automatically.
+    Orders are matched on the driver's city and balanced by open orders.
+    Optional body fields: order_ids, driver_ids, max_open_orders, dry_run.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        order_ids = request.data.get('order_ids')
+        driver_ids = request.data.get('driver_ids')
+        max_open_orders = request.data.get('max_open_orders')
+        dry_run = str(request.data.get('dry_run', False)).lower() in ['1', 'true']
+
+        try:
+            # A string or object would otherwise be iterated character by character or by key
+            for ids in (order_ids, driver_ids):
+                if ids is not None and (not isinstance(ids, list) or len(ids) > BULK_MAX_ORDERS):
+                    raise TypeError
+            if order_ids is not None:
+                order_ids = [int(order_id) for order_id in order_ids]
+            if driver_ids is not None:
+                driver_ids = [int(driver_id) for driver_id in driver_ids]
+            if max_open_orders is not None:
+                max_open_orders = int(max_open_orders)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": f"order_ids and driver_ids must be lists of at most {BULK_MAX_ORDERS} IDs, "
+                          "max_open_orders a number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = assign_pending_orders(
+            order_ids=order_ids,
+            driver_ids=driver_ids,
+            dry_run=dry_run,
+            max_open_orders=max_open_orders
+        )
+        return Response({
+            "dry_run": result['dry_run'],
+            "assigned_count": len(result['assignments']),
+            "unassigned_count": len(result['unassigned']),
+            "assignments": [
+                {"order_id": order_id, "driver_id": driver_id}
+                for order_id, driver_id in result['assignments'].items()
+            ],
+            "unassigned": result['unassigned'],
+        })
+
+
+class CustomerHistoryView(APIView):
+    """
+    API endpoint returning a customer's previous orders by phone number.
+    GET ?phone=[&exclude_order_id=&limit=]: sellers see their own orders with the
+    customer; admins see every seller's, or one seller's with ?seller_id=.
+    Includes delivery outcome counts to flag risky cash-on-delivery orders.
+    """
+    permission_classes = [IsAuthenticated, IsAdminSeller]
+    replica_reads = True
+    default_limit = 20
+    max_limit = 100
+    failed_statuses = ['no_answer', 'canceled']
+
+    def get(self, request):
+        phone = normalize_e164(request.query_params.get('phone', ''))
+        if not phone:
+            return Response({"error": "A valid phone number is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            exclude_order_id = int(request.query_params.get('exclude_order_id', 0))
+            seller_id = int(request.query_params['seller_id']) if 'seller_id' in request.query_params else None
+        except ValueError:
+            return Response({"error": "limit, exclude_order_id and seller_id must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Order.objects.filter(customer_phone_normalized=phone)
+        if request.user.role == 'seller':
+            queryset = queryset.filter(seller=request.user)
+        elif seller_id is not None:
+            queryset = queryset.filter(seller_id=seller_id)
+        if exclude_order_id:
+            queryset = queryset.exclude(pk=exclude_order_id)
+
+        # A single query on the (customer_phone_normalized, seller) index; a
+        # customer's history is small enough to count in Python
+        orders = list(queryset.order_by('-created_at').values(
+            'id', 'seller_id', 'customer_name', 'delivery_city', 'item', 'quantity', 'status', 'created_at'
+        ))
+        outcomes = {}
+        for order in orders:
+            outcomes[order['status']] = outcomes.get(order['status'], 0) + 1
+        finished = sum(outcomes.get(name, 0) for name in ['delivered'] + self.failed_statuses)
+        failed = sum(outcomes.get(name, 0) for name in self.failed_statuses)
+
+        return Response({
+            "phone": phone,
+            "total_orders": len(orders),
+            "status_counts": outcomes,
+            "failure_rate": round(failed / finished, 3) if finished else None,
+            "orders": orders[:limit],
+        })
+
+
+class OrderNearbyView(APIView):
+    """
+    API endpoint for dispatchers (admins) to find orders by location.
+    GET ?lat=&lng=[&radius_km=&limit=]: nearest orders first, with distance_km.
+    GET ?min_lat=&max_lat=&min_lng=&max_lng=[&limit=]: orders inside the box.
+    Both accept ?status=pending,assigned to narrow the statuses.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    replica_reads = True
+    default_limit = 20
+    max_limit = 200
+    default_radius_km = 10
+    max_radius_km = 200
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+            if all(name in params for name in ('min_lat', 'max_lat', 'min_lng', 'max_lng')):
+                center = None
+                box = tuple(float(params[name]) for name in ('min_lat', 'max_lat', 'min_lng', 'max_lng'))
+            else:
+                center = (float(params['lat']), float(params['lng']))
+                radius_km = min(float(params.get('radius_km', self.default_radius_km)), self.max_radius_km)
+                if not (math.isfinite(radius_km) and radius_km > 0) or not all(map(math.isfinite, center)):
+                    raise ValueError("radius_km and coordinates must be finite, radius_km positive")
+                box = bounding_box(center[0], center[1], radius_km)
+            # float() accepts 'nan' and 'inf'
+            if limit < 1 or not all(map(math.isfinite, box)):
+                raise ValueError("limit must be positive and coordinates finite")
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "Provide lat and lng, or min_lat, max_lat, min_lng and max_lng"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        min_lat, max_lat, min_lng, max_lng = box
+        queryset = Order.objects.filter(
+            delivery_latitude__range=(min_lat, max_lat),
+            delivery_longitude__range=(min_lng, max_lng),
+        )
+        if params.get('status'):
+            queryset = queryset.filter(status__in=params['status'].split(','))
+
+        if center is None:
+            orders = list(queryset.select_related('seller', 'driver').order_by('-updated_at')[:limit])
+            return Response(OrderDetailSerializer(orders, many=True).data)
+
+        # The box is served by the coordinate index, exact distances are computed
+        # on the narrow candidate set only
+        candidates = queryset.order_by().values_list('id', 'delivery_latitude', 'delivery_longitude')
+        distances = {}
+        for order_id, lat, lng in candidates:
+            distance = haversine_km(center[0], center[1], lat, lng)
+            if distance <= radius_km:
+                distances[order_id] = distance
+        nearest = heapq.nsmallest(limit, distances, key=distances.get)
+        orders = Order.objects.select_related('seller', 'driver').in_bulk(nearest)
+
+        data = []
+        for order_id in nearest:
+            item = OrderDetailSerializer(orders[order_id]).data
+            item['distance_km'] = round(distances[order_id], 3)
+            data.append(item)
+        return Response(data)
+
+
+def _parse_bulk_order_ids(request):
+    """Read a de-duplicated list of order IDs from a bulk request, or None if invalid"""
+    order_ids = request.data.get('order_ids')
+    if not isinstance(order_ids, list) or not order_ids or len(order_ids) > BULK_MAX_ORDERS:
+        return None
+    try:
+        return list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    except (TypeError, ValueError):
+        return None
+
+
+class BulkAssignDriverView(APIView):
+    """
+    API endpoint for admins to assign a driver to many orders at once.
+    Expects order_ids (list) and driver_id. Returns an outcome per order.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        order_ids = _parse_bulk_order_ids(request)
+        if order_ids is None:
+            return Response(
+                {"error": f"order_ids must be a list of 1 to {BULK_MAX_ORDERS} order IDs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        driver_id = request.data.get('driver_id')
+        if not driver_id:
+            return Response({"error": "Driver ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            driver = User.objects.get(pk=driver_id, role='driver')
+        except (User.DoesNotExist, ValueError):
+            return Response({"error": "Driver not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(summarize(bulk_assign_driver(order_ids, driver)))
+
+
+class BulkOrderStatusUpdateView(APIView):
+    """
+    API endpoint for admins to move many orders to the same status at once.
+    Expects order_ids (list) and status. Returns an outcome per order.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        order_ids = _parse_bulk_order_ids(request)
+        if order_ids is None:
+            return Response(
+                {"error": f"order_ids must be a list of 1 to {BULK_MAX_ORDERS} order IDs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        new_status = request.data.get('status')
+        if new_status not in dict(Order.ORDER_STATUS_CHOICES):
+            return Response({"error": "A valid status is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(summarize(bulk_update_status(order_ids, new_status)))
+
+
+class UserListView(ConditionalGetMixin, FastListMixin, generics.ListAPIView):
     """
     API endpoint for listing users.
     GET: Admin can see all users, sellers and drivers can see only themselves.
     """
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    values_serializer_class = UserValuesSerializer
     
     def get_queryset(self):
         user = self.request.user
@@ -293,13 +702,48 @@ class UserListView(generics.ListAPIView):
     
 
 
-class OrderFilter(filters.FilterSet):
-    min_date = filters.DateFilter(field_name="created_at", lookup_expr='gte')
-    max_date = filters.DateFilter(field_name="created_at", lookup_expr='lte')
-    
-    class Meta:
-        model = Order
-        fields = ['status', 'delivery_city', 'min_date', 'max_date']
+class ResponseCacheStatsView(APIView):
+    """
+    API endpoint for admins to monitor the per-user response cache:
+    hits, misses and hit rate per view, and memory use of the local backend.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response(response_cache_stats())
+
+
+class WebhookEndpointListCreateView(generics.ListCreateAPIView):
+    """
+    API endpoint for sellers to manage the URLs that receive their order
+    events (see mainapp/webhooks.py). Admins can list every endpoint.
+    """
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated, IsAdminSeller]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return WebhookEndpoint.objects.all().order_by('id')
+        return WebhookEndpoint.objects.filter(seller=user).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(seller=self.request.user, secret=generate_secret())
+
+
+class WebhookEndpointDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    API endpoint to view, pause (is_active), change or delete a webhook endpoint.
+    """
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrSellerOwner]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return WebhookEndpoint.objects.all()
+        return WebhookEndpoint.objects.filter(seller=user)
+
 
 class ApproveStockView(APIView):
     """
@@ -324,7 +768,7 @@ class ApproveStockView(APIView):
 
 
 # Add these views to mainapp/views.py
-class MessageListCreateView(generics.ListCreateAPIView):
+class MessageListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows messages to be viewed or created.
     GET: List all messages sent to or from the current user.
@@ -332,6 +776,9 @@ class MessageListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    conditional_related = ['sender', 'recipient']
+    replica_reads = True
+    values_serializer_class = MessageValuesSerializer
     
     def get_queryset(self):
         user = self.request.user
@@ -365,6 +812,7 @@ class MessageDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def perform_update(self, serializer):
         # Only allow updating the status field
+        # The recipient's routing slot follows the status (mainapp/signals.py)
         instance = self.get_object()
         serializer.save(
             status=serializer.validated_data.get('status', instance.status)
@@ -0,0 +1,300 @@
+"""
+Seller webhooks for order events, through a transactional outbox.
+
+Order transitions call record_order_events() inside the transaction that
+changes the order, adding one WebhookEvent row per active endpoint of the
+seller. Nothing leaves the process during the request; if the transaction
+rolls back, so do the events.
+
+`manage.py dispatch_webhooks` delivers them:
+
+- due events are claimed (conditional UPDATE to 'sending' tagged with a
+  claim token, so concurrent dispatchers never send the same event)
+- events are grouped per endpoint and POSTed in batches of up to
+  WEBHOOK_BATCH_SIZE, oldest first: {"events": [...]}
+- endpoints are sent to in parallel from a thread pool; the threads only
+  do HTTP, the database is written from the dispatcher thread
+- each body is signed: X-Deleveryno-Signature: t=<unix time>,v1=<hex
+  HMAC-SHA256 of "<t>.<body>" with the endpoint secret>
+- a non-2xx answer or network error retries the batch with the job
+  queue's exponential backoff; while an endpoint is backing off its newer
+  events wait too, so each endpoint receives events in order. After
+  WEBHOOK_MAX_ATTEMPTS the events are marked failed.
+
+Endpoint URLs must be https and resolve to public addresses only, checked
+when the endpoint is saved and again before each delivery (DNS can change
+in between). Deliveries connect to the address that was checked and don't
+follow redirects, so a seller can't point the dispatcher at loopback, the
+private network or a cloud metadata address. WEBHOOK_ALLOW_PRIVATE_HOSTS
+lifts both rules, for local development against a stub on http://127.0.0.1.
+"""
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import secrets
+import socket
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .jobs import retry_delay
+from .models import WebhookEndpoint, WebhookEvent
+
+SIGNATURE_HEADER = 'X-Deleveryno-Signature'
+
+# Result of a batch held back because an earlier batch to its endpoint failed
+NOT_SENT = object()
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+def resolve_endpoint(url):
+    """
+    The address to deliver to url at. Raises ValueError if url isn't https
+    or its host resolves to a loopback, private, link-local or other
+    non-public address.
+    """
+    allow_private = getattr(settings, 'WEBHOOK_ALLOW_PRIVATE_HOSTS', False)
+    parts = urlsplit(url)
+    if parts.scheme != 'https' and not (allow_private and parts.scheme == 'http'):
+        raise ValueError("Webhook URLs must use https.")
+    if not parts.hostname:
+        raise ValueError("Webhook URL has no host.")
+    try:
+        addresses = [
+            info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443, type=socket.SOCK_STREAM)
+        ]
+    except (OSError, UnicodeError):
+        raise ValueError(f"Can't resolve {parts.hostname}.")
+    if not allow_private:
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split('%')[0])
+            # Every address must be public, or a lookup could pick the other one
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError(f"{parts.hostname} resolves to a non-public address.")
+    return addresses[0]
+
+
+def sign(secret, body, timestamp=None):
+    """Signature header value for body (bytes)."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify_signature(secret, body, header, tolerance=300):
+    """Check a signature header, as a receiving shop would."""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, timestamp), header)
+
+
+def order_event_payload(event_type, order, previous_status=None):
+    """order is an Order or a dict with id, status, driver_id and updated_at."""
+    get = order.get if isinstance(order, dict) else lambda name: getattr(order, name)
+    return {
+        'type': event_type,
+        'occurred_at': timezone.now().isoformat(),
+        'order': {
+            'id': get('id'),
+            'status': get('status'),
+            'previous_status': previous_status,
+            'driver_id': get('driver_id'),
+            'updated_at': get('updated_at'),
+        },
+    }
+
+
+def record_order_events(event_type, orders, previous_statuses=None):
+    """
+    Add outbox rows for the sellers' active endpoints. Call inside the
+    transaction that changes the orders. orders are Order instances or
+    dicts with id, seller_id, status, driver_id and updated_at.
+    """
+    previous_statuses = previous_statuses or {}
+    by_seller = defaultdict(list)
+    for order in orders:
+        seller_id = order['seller_id'] if isinstance(order, dict) else order.seller_id
+        by_seller[seller_id].append(order)
+
+    endpoints = defaultdict(list)
+    for endpoint_id, seller_id in WebhookEndpoint.objects.filter(
+        seller_id__in=list(by_seller), is_active=True
+    ).values_list('id', 'seller_id'):
+        endpoints[seller_id].append(endpoint_id)
+    if not endpoints:
+        return []
+
+    events = []
+    for seller_id, endpoint_ids in endpoints.items():
+        for order in by_seller[seller_id]:
+            order_id = order['id'] if isinstance(order, dict) else order.id
+            # Round-trip through JSON so datetimes are stored as strings
+            payload = json.loads(json.dumps(
+                order_event_payload(event_type, order, previous_statuses.get(order_id)), cls=DjangoJSONEncoder
+            ))
+            events.extend(
+                WebhookEvent(endpoint_id=endpoint_id, event_type=event_type, payload=payload)
+                for endpoint_id in endpoint_ids
+            )
+    return WebhookEvent.objects.bulk_create(events)
+
+
+def claim_events(limit):
+    """Claim up to limit due events, skipping endpoints that are backing off."""
+    now = timezone.now()
+    backing_off = WebhookEvent.objects.filter(
+        status='pending', attempts__gt=0, next_attempt_at__gt=now
+    ).values('endpoint_id')
+    ids = list(
+        WebhookEvent.objects.filter(status='pending', next_attempt_at__lte=now)
+        .exclude(endpoint_id__in=backing_off)
+        .order_by('id').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    WebhookEvent.objects.filter(id__in=ids, status='pending').update(status='sending', locked_by=token, locked_at=now)
+    return list(
+        WebhookEvent.objects.filter(id__in=ids, locked_by=token)
+        .select_related('endpoint').order_by('id')
+    )
+
+
+def deliver(endpoint, events):
+    """POST a batch to one endpoint. Returns None on success or an error message."""
+    body = json.dumps(
+        {'events': [{'id': event.pk, **event.payload} for event in events]}, cls=DjangoJSONEncoder
+    ).encode()
+    try:
+        address = resolve_endpoint(endpoint.url)
+    except ValueError as exc:
+        return str(exc)
+    parts = urlsplit(endpoint.url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    # http.client doesn't follow redirects; a 3xx answer counts as a failure
+    connection = connection_class(parts.hostname, parts.port, timeout=getattr(settings, 'WEBHOOK_TIMEOUT', 5))
+    # Connect to the checked address rather than looking the host up again;
+    # TLS still verifies the certificate against the hostname
+    connection._create_connection = lambda host_port, *args: socket.create_connection((address, host_port[1]), *args)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    try:
+        connection.request('POST', path, body=body, headers={
+            'Content-Type': 'application/json', SIGNATURE_HEADER: sign(endpoint.secret, body),
+        })
+        response = connection.getresponse()
+        if 200 <= response.status < 300:
+            return None
+        return f"HTTP {response.status}"
+    except (http.client.HTTPException, OSError) as exc:
+        return str(exc) or exc.__class__.__name__
+    finally:
+        connection.close()
+
+
+def release(events):
+    """Return claimed events that were not sent to the queue, unchanged."""
+    WebhookEvent.objects.filter(id__in=[event.pk for event in events]).update(
+        status='pending', locked_by='', locked_at=None
+    )
+
+
+def record_outcome(events, error):
+    ids = [event.pk for event in events]
+    now = timezone.now()
+    if error is None:
+        WebhookEvent.objects.filter(id__in=ids).update(
+            status='delivered', delivered_at=now, locked_by='', locked_at=None, last_error=''
+        )
+        return
+    max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+    for event in events:
+        event.attempts += 1
+        event.last_error = error
+        event.locked_by = ''
+        event.locked_at = None
+        if event.attempts >= max_attempts:
+            event.status = 'failed'
+        else:
+            event.status = 'pending'
+            event.next_attempt_at = now + retry_delay(event.attempts)
+    WebhookEvent.objects.bulk_update(
+        events, ['attempts', 'last_error', 'locked_by', 'locked_at', 'status', 'next_attempt_at']
+    )
+
+
+def dispatch_webhooks(limit=500, max_workers=None):
+    """
+    Deliver one round of due events. Returns (delivered, failed) event
+    counts, where failed counts events whose batch will be retried or
+    has given up.
+    """
+    events = claim_events(limit)
+    if not events:
+        return 0, 0
+
+    batch_size = getattr(settings, 'WEBHOOK_BATCH_SIZE', 50)
+    batches = []
+    by_endpoint = defaultdict(list)
+    for event in events:
+        by_endpoint[event.endpoint_id].append(event)
+    for endpoint_events in by_endpoint.values():
+        for start in range(0, len(endpoint_events), batch_size):
+            batches.append(endpoint_events[start:start + batch_size])
+
+    def send_endpoint(endpoint_batches):
+        # Batches of one endpoint go out in order; after a failure the rest
+        # stay queued behind it
+        results = []
+        for index, batch in enumerate(endpoint_batches):
+            error = deliver(batch[0].endpoint, batch)
+            results.append((batch, error))
+            if error is not None:
+                results.extend((later, NOT_SENT) for later in endpoint_batches[index + 1:])
+                break
+        return results
+
+    per_endpoint = defaultdict(list)
+    for batch in batches:
+        per_endpoint[batch[0].endpoint_id].append(batch)
+    workers = max_workers or getattr(settings, 'WEBHOOK_DISPATCH_THREADS', 8)
+    with ThreadPoolExecutor(max_workers=min(workers, len(per_endpoint))) as pool:
+        results = [result for results in pool.map(send_endpoint, per_endpoint.values()) for result in results]
+
+    delivered = failed = 0
+    for batch, error in results:
+        if error is NOT_SENT:
+            release(batch)
+            continue
+        record_outcome(batch, error)
+        if error is None:
+            delivered += len(batch)
+        else:
+            failed += len(batch)
+    return delivered, failed
+
+
+def requeue_stale_events():
+    """Release events a dispatcher claimed but never recorded (it died mid-round)."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_STALE_TIMEOUT', 600))
+    return WebhookEvent.objects.filter(status='sending', locked_at__lt=cutoff).update(
+        status='pending', locked_by='', locked_at=None
+    )
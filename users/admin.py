@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from mainapp.admin_tools import EstimatedCountPaginator
 from .models import User
 
 @admin.register(User)
@@ -12,4 +13,6 @@ class CustomUserAdmin(UserAdmin):
     add_fieldsets = UserAdmin.add_fieldsets + (
         ('Custom Fields', {'fields': ('role', 'phone', 'city', 'approved')}),
     )
-    search_fields = ('username', 'email', 'first_name', 'last_name')
\ No newline at end of file
+    search_fields = ('username', 'email', 'first_name', 'last_name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
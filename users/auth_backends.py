@@ -1,14 +1,39 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+
+from .login_limits import client_ip, clear_failures, login_blocked, record_failure
 
 User = get_user_model()
 
 class EmailBackend(ModelBackend):
+    """
+    Authenticates with email and password in one query on the unique email
+    index. Failed email logins raise PermissionDenied, which makes
+    authenticate() stop instead of trying ModelBackend as well; addresses
+    and emails over the failure limit are refused before the query and the
+    password hash (see users/login_limits.py). Username logins (the admin
+    site) are left to ModelBackend.
+    """
+
     def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        ip = client_ip(request)
+        if login_blocked(email, ip):
+            raise PermissionDenied
+
         try:
             user = User.objects.get(email=email)
-            if user.check_password(password):
-                return user
-            return None
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+            user = None
+
+        # check_password rehashes with the preferred hasher when needed
+        if user is not None and user.check_password(password) and self.user_can_authenticate(user):
+            clear_failures(email)
+            return user
+        record_failure(email, ip)
+        raise PermissionDenied
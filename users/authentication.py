@@ -0,0 +1,127 @@
+"""
+Expiring, per-device API tokens.
+
+Clients still send `Authorization: Token <key>`. Each login issues a new
+AuthToken, so a user can be signed in on several devices; a token stops
+working at its expires_at (TOKEN_TTL seconds after issue, default 30
+days) and can be rotated or revoked on its own.
+
+last_used_at is not written on every request. Tokens seen by this process
+are collected in memory and written with one UPDATE at most every
+TOKEN_LAST_USED_INTERVAL seconds (default 60); a token whose stored
+last_used_at is fresher than that isn't collected at all. The value is
+therefore accurate to about the interval, and uses not yet flushed are lost
+if the process exits.
+
+Revoking all tokens of a user or a role is one DELETE (revoke_tokens()),
+and expired tokens are removed in chunks by `manage.py purge_tokens`.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import AuthToken
+
+logger = logging.getLogger(__name__)
+
+
+def last_used_interval():
+    return timedelta(seconds=getattr(settings, 'TOKEN_LAST_USED_INTERVAL', 60))
+
+
+class LastUsedRecorder:
+    """Collects token uses and writes them in one UPDATE per interval."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushed_at = time.monotonic()
+
+    def touch(self, token, now):
+        interval = last_used_interval()
+        if token.last_used_at is not None and now - token.last_used_at < interval:
+            return
+        with self.lock:
+            self.pending[token.key] = now
+            due = time.monotonic() - self.flushed_at >= interval.total_seconds()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            return AuthToken.objects.filter(key__in=list(pending)).update(last_used_at=max(pending.values()))
+        except DatabaseError:
+            logger.exception("Could not record last use of %s tokens", len(pending))
+            return 0
+
+
+last_used = LastUsedRecorder()
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        try:
+            token = AuthToken.objects.select_related('user').get(key=key)
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        now = timezone.now()
+        if token.expires_at <= now:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        last_used.touch(token, now)
+        return token.user, token
+
+
+def issue_token(user, device=''):
+    return AuthToken.objects.create(user=user, device=device[:100])
+
+
+def rotate_token(token):
+    """Replace token with a new one for the same device. Returns the new token."""
+    with transaction.atomic():
+        new_token = issue_token(token.user, token.device)
+        AuthToken.objects.filter(pk=token.pk).delete()
+    return new_token
+
+
+def revoke_tokens(user_ids=None, role=None):
+    """Delete every token of the given users and/or role in one statement."""
+    if user_ids is None and role is None:
+        raise ValueError("Pass user_ids or role")
+    tokens = AuthToken.objects.all()
+    if user_ids is not None:
+        tokens = tokens.filter(user_id__in=user_ids)
+    if role is not None:
+        tokens = tokens.filter(user__role=role)
+    return tokens.delete()[0]
+
+
+def purge_expired_tokens(batch_size=1000):
+    """Delete expired tokens in batches. Returns the number deleted."""
+    now = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            AuthToken.objects.filter(expires_at__lte=now)
+            .order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += AuthToken.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,104 @@
+"""
+Bulk user approval and role changes for admins.
+
+Onboarding waves approve hundreds of drivers at once. These helpers check
+every user in memory, then apply one scoped UPDATE per operation inside a
+transaction and return an outcome per user, in the format of
+mainapp.bulk.summarize(). Queryset updates skip the User signals, so the
+cached responses showing the users, the message routing pool and (on
+reject) their tokens are invalidated here in one step each.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from mainapp.messaging import invalidate_admin_pool
+from mainapp.response_cache import invalidate_users
+
+from .authentication import revoke_tokens
+from .models import User
+
+# Upper bound on the number of users handled in one request
+BULK_MAX_USERS = 1000
+
+
+def _lock_users(user_ids):
+    return {
+        row['id']: row
+        for row in User.objects.select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by()
+        .values('id', 'role', 'approved', 'is_active')
+    }
+
+
+def _outcome(user_id, result, **extra):
+    return {'id': user_id, 'result': result, **extra}
+
+
+def _apply(user_ids, acting_user, is_unchanged, changes, new_role=None):
+    """
+    Run one UPDATE of changes over the users not already in the target state.
+    Returns (outcomes, updated rows).
+    """
+    outcomes = {}
+    to_update = []
+    users = _lock_users(user_ids)
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is None:
+            outcomes[user_id] = _outcome(user_id, 'error', error="User not found")
+        elif user_id == acting_user.pk:
+            outcomes[user_id] = _outcome(user_id, 'error', error="You cannot change your own account")
+        elif is_unchanged(user):
+            outcomes[user_id] = _outcome(user_id, 'unchanged')
+        else:
+            to_update.append(user)
+            outcomes[user_id] = _outcome(user_id, 'updated')
+
+    if to_update:
+        User.objects.filter(pk__in=[user['id'] for user in to_update]).update(
+            **changes, updated_at=timezone.now()
+        )
+        affected = {(user['id'], user['role']) for user in to_update}
+        if new_role is not None:
+            affected |= {(user['id'], new_role) for user in to_update}
+        invalidate_users(sorted(affected))
+        if any(role == 'admin' for _, role in affected):
+            invalidate_admin_pool()
+    return [outcomes[user_id] for user_id in user_ids], to_update
+
+
+def bulk_approve(user_ids, acting_user):
+    with transaction.atomic():
+        outcomes, _ = _apply(
+            user_ids, acting_user,
+            lambda user: user['approved'] and user['is_active'],
+            {'approved': True, 'is_active': True},
+        )
+    return outcomes
+
+
+def bulk_reject(user_ids, acting_user):
+    """Unapprove and deactivate users, signing out all their devices."""
+    with transaction.atomic():
+        outcomes, updated = _apply(
+            user_ids, acting_user,
+            lambda user: not user['approved'] and not user['is_active'],
+            {'approved': False, 'is_active': False},
+        )
+        if updated:
+            revoke_tokens(user_ids=[user['id'] for user in updated])
+    return outcomes
+
+
+def bulk_change_role(user_ids, role, acting_user):
+    """Move users to role; sellers leaving the role lose their RIB in the same UPDATE."""
+    changes = {}
+    if role != 'seller':
+        # Listed before role: MySQL evaluates SET clauses left to right
+        changes['rib'] = Case(When(role='seller', then=Value('')), default=F('rib'))
+    changes['role'] = role
+    with transaction.atomic():
+        outcomes, _ = _apply(user_ids, acting_user, lambda user: user['role'] == role, changes, new_role=role)
+    return outcomes
@@ -0,0 +1,59 @@
+"""
+Password hashers whose cost comes from settings.
+
+They keep the algorithm names of Django's hashers, so existing hashes keep
+verifying. Django rehashes a password on the next successful login when its
+hasher or parameters differ from the preferred one (the first entry of
+PASSWORD_HASHERS), so changing PASSWORD_HASHER or a cost setting upgrades
+(or downgrades) stored hashes transparently as users log in.
+
+Argon2 needs the optional argon2-cffi package.
+"""
+import os
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+
+def hash_password(password):
+    """make_password for a process pool; an empty password becomes unusable."""
+    return hashers.make_password(password or None)
+
+
+def init_hashing_worker(password_hashers=None):
+    # Spawned processes don't inherit Django's setup, nor settings the parent
+    # changed at runtime; password_hashers is the parent's PASSWORD_HASHERS
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deleveryno.settings')
+        django.setup()
+    if password_hashers is not None:
+        settings.PASSWORD_HASHERS = password_hashers
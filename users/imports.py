@@ -0,0 +1,206 @@
+"""
+CSV import of drivers and sellers.
+
+Columns (header row required; only email is mandatory):
+
+    email, role, username, password, first_name, last_name, phone, city, rib
+
+The file is read as a stream and handled in chunks of `chunk_size` rows:
+
+- rows are validated in memory (email, role, field lengths, duplicates
+  within the file); a missing role falls back to default_role, RIBs are
+  kept for sellers only
+- emails and usernames already in the database are found with one query
+  per chunk; generated usernames (email prefix, as in registration) are
+  allocated for the whole chunk at once (users/usernames.py)
+- passwords are hashed in a process pool, since PBKDF2/scrypt are CPU
+  bound; rows without a password get an unusable one (the user sets it
+  through the password reset flow). The pool's processes are spawned,
+  not forked, since the callers (run_workers) run threads
+- the chunk is inserted with one bulk_create. If a concurrent signup takes
+  an email or username meanwhile, the chunk is retried row by row so only
+  the conflicting rows fail.
+
+Returns {'created': n, 'error_count': n, 'errors': [...]}, with one error
+entry per rejected row: its line number in the file, email and messages.
+With dry_run nothing is hashed or written and created counts the rows that
+would be.
+"""
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .hashers import hash_password, init_hashing_worker
+from .models import User
+from .usernames import allocate_usernames, username_base
+
+IMPORT_ROLES = ('driver', 'seller')
+FIELDS = ('email', 'role', 'username', 'password', 'first_name', 'last_name', 'phone', 'city', 'rib')
+
+_validate_username = UnicodeUsernameValidator()
+
+
+def _max_length(name):
+    return User._meta.get_field(name).max_length
+
+
+def check_header(fieldnames):
+    if 'email' not in (fieldnames or []):
+        raise ValueError("The CSV header must include an email column")
+
+
+def clean_row(row, default_role=None):
+    """Return (user fields, password, errors) for one CSV row."""
+    data = {name: (row.get(name) or '').strip() for name in FIELDS}
+    errors = []
+
+    try:
+        validate_email(data['email'])
+    except ValidationError:
+        errors.append("Enter a valid email address")
+    data['role'] = data['role'].lower() or (default_role or '')
+    if data['role'] not in IMPORT_ROLES:
+        errors.append(f"Role must be one of: {', '.join(IMPORT_ROLES)}")
+    if data['username']:
+        try:
+            _validate_username(data['username'])
+        except ValidationError as exc:
+            errors.extend(exc.messages)
+    for name in ('username', 'first_name', 'last_name', 'phone', 'city', 'rib'):
+        if len(data[name]) > _max_length(name):
+            errors.append(f"{name} is longer than {_max_length(name)} characters")
+
+    password = data.pop('password')
+    if data['role'] != 'seller':
+        data['rib'] = None
+    return data, password, errors
+
+
+class UserImporter:
+    def __init__(self, default_role=None, approve=False, chunk_size=500, workers=None, dry_run=False):
+        self.default_role = default_role
+        self.approve = approve
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else getattr(settings, 'USER_IMPORT_WORKERS', os.cpu_count())
+        self.dry_run = dry_run
+        self.created = 0
+        self.errors = []
+        self.seen_emails = set()
+        self.seen_usernames = set()
+
+    def error(self, line, email, messages):
+        self.errors.append({'line': line, 'email': email, 'errors': messages})
+
+    def run(self, lines):
+        """lines: an iterable of CSV text lines (e.g. an open file)."""
+        reader = csv.DictReader(lines)
+        check_header(reader.fieldnames)
+
+        pool = None
+        if self.workers > 1 and not self.dry_run:
+            pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_hashing_worker, initargs=(settings.PASSWORD_HASHERS,),
+            )
+        try:
+            # Line numbers count the header as line 1
+            rows = enumerate(reader, start=2)
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        errors = sorted(self.errors, key=lambda error: error['line'])
+        return {'created': self.created, 'error_count': len(errors), 'errors': errors}
+
+    def import_chunk(self, chunk, pool):
+        valid = []
+        for line, row in chunk:
+            data, password, errors = clean_row(row, self.default_role)
+            email_key = data['email'].lower()
+            if not errors and email_key in self.seen_emails:
+                errors.append("Duplicate email in file")
+            if not errors and data['username'] and data['username'] in self.seen_usernames:
+                errors.append("Duplicate username in file")
+            if errors:
+                self.error(line, data['email'], errors)
+                continue
+            self.seen_emails.add(email_key)
+            if data['username']:
+                self.seen_usernames.add(data['username'])
+            valid.append((line, data, password))
+
+        # One query for both unique columns
+        emails = [data['email'] for _, data, _ in valid]
+        wanted = {data['username'] or username_base(data['email']) for _, data, _ in valid}
+        existing_emails, taken = set(), set()
+        for email, username in User.objects.filter(
+            Q(email__in=emails) | Q(username__in=wanted)
+        ).values_list('email', 'username'):
+            existing_emails.add(email)
+            taken.add(username)
+
+        rows = []
+        for line, data, password in valid:
+            if data['email'] in existing_emails:
+                self.error(line, data['email'], ["A user with this email already exists"])
+            elif data['username'] and data['username'] in taken:
+                self.error(line, data['email'], ["A user with this username already exists"])
+            else:
+                rows.append((line, data, password))
+        generated = allocate_usernames(
+            [username_base(data['email']) for _, data, _ in rows if not data['username']],
+            taken | {data['username'] for _, data, _ in rows if data['username']},
+        )
+        generated = iter(generated)
+        for _, data, _ in rows:
+            if not data['username']:
+                data['username'] = next(generated)
+
+        if self.dry_run:
+            self.created += len(rows)
+            return
+
+        passwords = [password for _, _, password in rows]
+        if pool is not None:
+            hashes = list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (self.workers * 4))))
+        else:
+            hashes = [hash_password(password) for password in passwords]
+
+        users = [
+            (line, User(**data, password=encoded, approved=self.approve))
+            for (line, data, _), encoded in zip(rows, hashes)
+        ]
+        if not users:
+            return
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in users])
+            self.created += len(users)
+        except IntegrityError:
+            self.insert_one_by_one(users)
+
+    def insert_one_by_one(self, users):
+        for line, user in users:
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                self.created += 1
+            except IntegrityError:
+                self.error(line, user.email, ["A user with this email or username already exists"])
+
+
+def import_users(lines, **options):
+    return UserImporter(**options).run(lines)
@@ -0,0 +1,63 @@
+"""
+Failed-login rate limiting in the shared cache.
+
+Failures are counted per email and per client address over a sliding
+LOGIN_FAILURE_WINDOW (seconds, default 900). Once an email reaches
+LOGIN_FAILURE_LIMIT failures (default 5), or an address reaches
+LOGIN_FAILURE_IP_LIMIT (default 50), further attempts are refused before any
+database query or password hashing until the window expires. A successful
+login clears the email's counter.
+
+The counters live in the default cache, so every worker shares them when
+CACHES points at Redis.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY = 'login:fail:{}:{}'
+
+
+def _settings():
+    return (
+        getattr(settings, 'LOGIN_FAILURE_LIMIT', 5),
+        getattr(settings, 'LOGIN_FAILURE_IP_LIMIT', 50),
+        getattr(settings, 'LOGIN_FAILURE_WINDOW', 15 * 60),
+    )
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '') if request is not None else ''
+
+
+def _keys(email, ip):
+    digest = hashlib.sha1((email or '').strip().lower().encode()).hexdigest()
+    return KEY.format('email', digest), KEY.format('ip', ip or '-')
+
+
+def login_blocked(email, ip):
+    """True when either the email or the address is over its failure limit."""
+    email_limit, ip_limit, _ = _settings()
+    email_key, ip_key = _keys(email, ip)
+    counts = cache.get_many([email_key, ip_key])
+    return counts.get(email_key, 0) >= email_limit or counts.get(ip_key, 0) >= ip_limit
+
+
+def record_failure(email, ip):
+    _, _, window = _settings()
+    for key in _keys(email, ip):
+        # add() starts the window; incr() keeps the original expiry
+        cache.add(key, 0, window)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, window)
+
+
+def clear_failures(email):
+    cache.delete(_keys(email, None)[0])
+
+
+def retry_after():
+    return _settings()[2]
@@ -0,0 +1,63 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.module_loading import import_string
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark successful email logins per second on one core, per password hasher. "
+        "Test users are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+        parser.add_argument('--hashers', default='pbkdf2_sha256,scrypt,argon2',
+                            help="Comma-separated algorithms; unavailable ones are skipped")
+
+    def hashers_preferring(self, algorithm):
+        """PASSWORD_HASHERS with the hasher for algorithm moved first."""
+        paths = sorted(settings.PASSWORD_HASHERS, key=lambda path: import_string(path).algorithm != algorithm)
+        if import_string(paths[0]).algorithm != algorithm:
+            raise ValueError(f"No hasher for '{algorithm}' in PASSWORD_HASHERS")
+        return paths
+
+    def measure(self, algorithm, count):
+        password = 'Bench-password-1'
+        tag = uuid.uuid4().hex[:8]
+        with override_settings(PASSWORD_HASHERS=self.hashers_preferring(algorithm)), transaction.atomic():
+            encoded = make_password(password)
+            emails = [f'bench-{tag}-{number}@example.com' for number in range(count)]
+            User.objects.bulk_create(
+                User(username=f'bench-{tag}-{number}', email=email, password=encoded, role='driver')
+                for number, email in enumerate(emails)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for email in emails:
+                    if authenticate(email=email, password=password) is None:
+                        raise RuntimeError(f"Login failed for {email}")
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed, len(queries) / count
+
+    def handle(self, *args, **options):
+        count = options['logins']
+        for algorithm in options['hashers'].split(','):
+            try:
+                elapsed, queries = self.measure(algorithm.strip(), count)
+            except (ValueError, KeyError) as exc:
+                self.stdout.write(f"{algorithm:14} skipped: {exc}")
+                continue
+            self.stdout.write(
+                f"{algorithm:14} {count / elapsed:8.1f} logins/s  {elapsed / count * 1000:7.1f} ms/login"
+                f"  {queries:.0f} queries/login"
+            )
@@ -0,0 +1,47 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import IMPORT_ROLES, import_users
+
+
+class Command(BaseCommand):
+    help = "Create drivers and sellers from a CSV file (see users/imports.py for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--role', choices=IMPORT_ROLES, help="Role for rows without one")
+        parser.add_argument('--approve', action='store_true', help="Create the users already approved")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Password hashing processes (default USER_IMPORT_WORKERS)")
+        parser.add_argument('--report', help="Write rejected rows to this CSV file")
+        parser.add_argument('--dry-run', action='store_true', help="Validate without creating users")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                result = import_users(
+                    csv_file, default_role=options['role'], approve=options['approve'],
+                    chunk_size=options['chunk_size'], workers=options['workers'], dry_run=options['dry_run'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'email', 'errors'])
+                for error in result['errors']:
+                    writer.writerow([error['line'], error['email'], '; '.join(error['errors'])])
+        else:
+            for error in result['errors']:
+                self.stderr.write(f"line {error['line']} ({error['email']}): {'; '.join(error['errors'])}")
+
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} users in {elapsed:.1f}s, {result['error_count']} rows rejected"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.authentication import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired API tokens in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired tokens"))
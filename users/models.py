@@ -1,4 +1,8 @@
-from datetime import timezone
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from django.db import models
 
 from django.contrib.auth.models import AbstractUser
@@ -30,3 +34,28 @@ class User(AbstractUser):
         if not self.pk and not self.updated_at:
             self.updated_at = timezone.now()
         super().save(*args, **kwargs)
+
+
+def token_expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'TOKEN_TTL', 30 * 24 * 60 * 60))
+
+
+class AuthToken(models.Model):
+    """
+    An API token for one device of a user (see users/authentication.py).
+    A user can hold several; each expires at expires_at.
+    """
+    key = models.CharField(max_length=40, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auth_tokens')
+    device = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=token_expiry, db_index=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = secrets.token_hex(20)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.user} ({self.device or 'unknown device'})"
@@ -1,7 +1,7 @@
 
-import uuid
 from rest_framework import serializers
-from .models import User
+from .models import AuthToken, User
+from .usernames import save_with_generated_username
 
 class BaseRegistrationSerializer(serializers.ModelSerializer):
     """Base serializer for user registration with auto-username generation."""
@@ -18,30 +18,14 @@ class BaseRegistrationSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'password', 'first_name', 'last_name', 'phone', 'city']
 
     def create(self, validated_data):
-        # Generate username if not provided
-        if 'username' not in validated_data or not validated_data['username']:
-            email_prefix = validated_data['email'].split('@')[0]
-            # Create a unique username based on email prefix
-            base_username = email_prefix[:15]  # Limit length
-            username = base_username
-            
-            # Check if username exists and append random string if needed
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                # Generate a shorter unique suffix
-                suffix = str(uuid.uuid4())[:8]
-                username = f"{base_username[:10]}_{suffix}"
-                counter += 1
-                if counter > 10:  # Avoid infinite loop
-                    username = f"user_{str(uuid.uuid4())[:10]}"
-                    break
-                    
-            validated_data['username'] = username
-        
         # Extract password to hash it properly
         password = validated_data.pop('password')
         user = User(**validated_data)
         user.set_password(password)  # This properly hashes the password
+
+        # Generate username if not provided
+        if not validated_data.get('username'):
+            return save_with_generated_username(user, validated_data['email'])
         user.save()
         return user
 
@@ -96,6 +80,22 @@ class UserSerializer(serializers.ModelSerializer):
         
 
 
+class AuthTokenSerializer(serializers.ModelSerializer):
+    """
+    A signed-in device of the current user. The key itself is only shown
+    when the token is issued; current marks the token of this request.
+    """
+    current = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuthToken
+        fields = ['id', 'device', 'created_at', 'expires_at', 'last_used_at', 'current']
+
+    def get_current(self, obj):
+        request = self.context.get('request')
+        return request is not None and getattr(request.auth, 'pk', None) == obj.pk
+
+
 class LoginSerializer(serializers.Serializer):
     """
     Serializer for user login.
@@ -0,0 +1,35 @@
+"""Background tasks run by `manage.py run_workers` (see mainapp/jobs.py)."""
+import io
+
+from django.core.files.storage import default_storage
+
+from mainapp.jobs import enqueue, task
+
+from .imports import import_users
+from .models import User
+
+
+# A retry would report the users the first attempt created as existing ones.
+# The upload may hold passwords: the job only names it and forgets even that.
+@task(max_attempts=1, clear_payload=True)
+def import_users_csv(upload_name, admin_id, default_role=None, approve=False):
+    """
+    Import a CSV saved in the default storage (users/imports.py), delete it
+    and email the report to the admin who sent it.
+    """
+    try:
+        with default_storage.open(upload_name, 'rb') as upload:
+            result = import_users(
+                io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''),
+                default_role=default_role, approve=approve,
+            )
+    finally:
+        default_storage.delete(upload_name)
+    admin = User.objects.filter(pk=admin_id).first()
+    if admin is None or not admin.email:
+        return
+    lines = [f"Created {result['created']} users, {result['error_count']} rows rejected."]
+    lines.extend(
+        f"line {error['line']} ({error['email']}): {'; '.join(error['errors'])}" for error in result['errors']
+    )
+    enqueue('send_email', subject='User import finished', message='\n'.join(lines), recipient_list=[admin.email])
@@ -1,13 +1,24 @@
 from django.urls import path
+from .views import BulkApproveUsersView, BulkRejectUsersView, BulkUserRoleView, UserImportView
+from .views import LogoutView, TokenDetailView, TokenListView, TokenRevokeView, TokenRotateView
 from .views import DebugView, PasswordResetConfirmView, PasswordResetRequestView, SellerRegistrationView, DriverRegistrationView, LoginView, UserDetailView, UserListView, UserProfileView, ApproveUserView
 
 urlpatterns = [
     path('register/seller/', SellerRegistrationView.as_view(), name='register-seller'),
     path('register/driver/', DriverRegistrationView.as_view(), name='register-driver'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('tokens/', TokenListView.as_view(), name='token-list'),
+    path('tokens/rotate/', TokenRotateView.as_view(), name='token-rotate'),
+    path('tokens/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
+    path('tokens/<int:pk>/', TokenDetailView.as_view(), name='token-detail'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('users/<int:pk>/approve/', ApproveUserView.as_view(), name='approve-user'),
     path('users/', UserListView.as_view(), name='user-list'),
+    path('users/bulk/approve/', BulkApproveUsersView.as_view(), name='bulk-approve-users'),
+    path('users/bulk/reject/', BulkRejectUsersView.as_view(), name='bulk-reject-users'),
+    path('users/bulk/role/', BulkUserRoleView.as_view(), name='bulk-user-role'),
+    path('users/import/', UserImportView.as_view(), name='user-import'),
     path('debug/', DebugView.as_view(), name='debug'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     # Password reset URLs
@@ -0,0 +1,124 @@
+"""
+Username allocation for registrations that don't choose one.
+
+The base is the email's local part (cut to 15 characters). If it is taken,
+the user gets base_<n> with n one past the highest number already used for
+that base, found with a single indexed query over the usernames starting
+with the base. Two concurrent signups can still pick the same name, so the
+insert runs in a savepoint and a unique violation on the username recomputes
+the name and retries, picking among a few numbers past the highest so the
+losers of a race spread out; after MAX_ATTEMPTS the name falls back to a
+random suffix.
+"""
+import random
+import re
+import uuid
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+
+from .models import User
+
+BASE_LENGTH = 15
+MAX_ATTEMPTS = 10
+
+# Numbers to choose from, per failed attempt, when retrying after a collision
+RETRY_SPREAD = 4
+
+# Characters Django's username validator rejects
+INVALID_CHARACTERS = re.compile(r'[^\w.@+-]')
+
+
+def username_base(email):
+    base = INVALID_CHARACTERS.sub('', email.split('@')[0])[:BASE_LENGTH]
+    return base or 'user'
+
+
+def _numbered(base):
+    """Usernames base_<anything>, as a condition the unique index can serve."""
+    if connection.vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and can't use the BINARY unique
+        # index; a range over the same prefix can
+        return Q(username__gte=f'{base}_', username__lt=f'{base}_\U0010ffff')
+    # PostgreSQL has a pattern_ops index for the unique column, MySQL indexes LIKE 'x%'
+    return Q(username__startswith=f'{base}_')
+
+
+def _taken_usernames(base):
+    """base itself and base_<anything>, read from the unique index."""
+    return User.objects.filter(Q(username=base) | _numbered(base)).values_list('username', flat=True)
+
+
+def _number(base, username):
+    match = re.fullmatch(rf'{re.escape(base)}_(\d+)', username)
+    return int(match.group(1)) if match else 0
+
+
+def next_free_username(base, spread=0):
+    """
+    base if it is free, otherwise base_<highest used number + 1>. With
+    spread, the number is picked at random among the next spread + 1, so
+    signups retrying after a collision don't all race for the same one.
+    """
+    base_taken, highest = False, 0
+    for username in _taken_usernames(base):
+        if username == base:
+            base_taken = True
+        else:
+            highest = max(highest, _number(base, username))
+    if not base_taken:
+        return base
+    return f'{base}_{highest + 1 + random.randint(0, spread)}'
+
+
+def allocate_usernames(bases, taken):
+    """
+    One free username per entry of bases, in order, for a batch insert.
+    taken holds the usernames already known to exist, including which bases
+    do; the numbers in use for bases that need one are read in one query per
+    100 bases.
+    """
+    taken = set(taken)
+    highest = {}
+    # Bases that will need a number: taken, or wanted more than once
+    counts = Counter(bases)
+    busy = sorted(base for base, count in counts.items() if base in taken or count > 1)
+    for start in range(0, len(busy), 100):
+        group = busy[start:start + 100]
+        condition = Q()
+        for base in group:
+            condition |= _numbered(base)
+        for username in User.objects.filter(condition).values_list('username', flat=True):
+            taken.add(username)
+    for base in busy:
+        highest[base] = max((_number(base, username) for username in taken if username.startswith(f'{base}_')), default=0)
+
+    usernames = []
+    for base in bases:
+        if base not in taken:
+            username = base
+        else:
+            highest[base] = highest.get(base, 0) + 1
+            username = f'{base}_{highest[base]}'
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def save_with_generated_username(user, email):
+    """Pick a free username for the unsaved user and insert it, retrying on races."""
+    base = username_base(email)
+    for attempt in range(MAX_ATTEMPTS):
+        user.username = next_free_username(base, spread=attempt * RETRY_SPREAD)
+        try:
+            with transaction.atomic():
+                user.save()
+            return user
+        except IntegrityError:
+            if not User.objects.filter(username=user.username).exists():
+                # Another constraint (e.g. the email) failed
+                raise
+    user.username = f'{base[:10]}_{uuid.uuid4().hex[:8]}'
+    user.save()
+    return user
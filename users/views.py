@@ -1,25 +1,39 @@
 # users/views.py
+import csv
+import io
+import uuid
 from urllib import request
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate
-from rest_framework.authtoken.models import Token
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
 
-from .models import User
+from .imports import IMPORT_ROLES, check_header, import_users
+from .bulk import BULK_MAX_USERS, bulk_approve, bulk_change_role, bulk_reject
+from .authentication import issue_token, revoke_tokens, rotate_token
+from .login_limits import client_ip, login_blocked, retry_after
+from .models import AuthToken, User
 from .serializers import (
+    AuthTokenSerializer,
     SellerRegistrationSerializer,
     DriverRegistrationSerializer,
     LoginSerializer,
     UserSerializer
 )
+from mainapp.conditional import ConditionalGetMixin
+from mainapp.fastpath import FastListMixin, UserValuesSerializer
+from mainapp.bulk import summarize
+from mainapp.jobs import enqueue
 from mainapp.permissions import IsAdmin
+from mainapp.response_cache import ResponseCacheMixin
 
 class SellerRegistrationView(APIView):
     """
@@ -55,7 +69,12 @@ class LoginView(APIView):
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
-        
+
+        if login_blocked(email, client_ip(request)):
+            return Response({"error": "Too many failed login attempts. Try again later."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={'Retry-After': str(retry_after())})
+
         # Use the authenticate function with email parameter
         user = authenticate(request=request, email=email, password=password)
         
@@ -64,20 +83,132 @@ class LoginView(APIView):
                 return Response({"error": "User not approved by admin."},
                             status=status.HTTP_403_FORBIDDEN)
             
-            token, created = Token.objects.get_or_create(user=user)
+            # A new token per login, so each device can be signed out on its own
+            device = request.data.get('device') or request.META.get('HTTP_USER_AGENT', '')
+            token = issue_token(user, device)
             return Response({
                 "token": token.key,
+                "expires_at": token.expires_at,
                 "user": UserSerializer(user).data
             }, status=status.HTTP_200_OK)
         
         return Response({"error": "Invalid credentials"}, 
                       status=status.HTTP_401_UNAUTHORIZED)
 
-class UserProfileView(APIView):
+class LogoutView(APIView):
+    """
+    API endpoint that revokes the token used for this request.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        AuthToken.objects.filter(pk=request.auth.pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenListView(generics.ListAPIView):
+    """
+    API endpoint listing the current user's signed-in devices (tokens).
+    """
+    serializer_class = AuthTokenSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return AuthToken.objects.filter(user=self.request.user, expires_at__gt=timezone.now()).order_by('-created_at')
+
+
+class TokenDetailView(generics.DestroyAPIView):
+    """
+    API endpoint to sign out one of the current user's devices.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AuthToken.objects.filter(user=self.request.user)
+
+
+class TokenRotateView(APIView):
+    """
+    API endpoint that replaces the current token with a new one for the
+    same device. The old key stops working immediately.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        token = rotate_token(request.auth)
+        return Response({"token": token.key, "expires_at": token.expires_at})
+
+
+class TokenRevokeView(APIView):
+    """
+    API endpoint for admins to sign out every device of some users or of a
+    whole role. Body: user_ids (list) and/or role.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        user_ids = request.data.get('user_ids')
+        role = request.data.get('role')
+        if user_ids is None and role is None:
+            return Response({"error": "user_ids or role is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if role is not None and role not in dict(User.ROLE_CHOICES):
+            return Response({"error": "Invalid role"}, status=status.HTTP_400_BAD_REQUEST)
+        if user_ids is not None and (
+            not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids)
+        ):
+            return Response({"error": "user_ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"revoked": revoke_tokens(user_ids=user_ids, role=role)})
+
+
+class UserImportView(APIView):
+    """
+    API endpoint for admins to create drivers and sellers from an uploaded
+    CSV file (multipart field "file"; see users/imports.py for the columns).
+    Optional fields: role (for rows without one), approve, dry_run.
+
+    A dry run validates the file in the request and returns the number of
+    users it would create and an error report per rejected row. Otherwise
+    the file is saved to the default storage (which the workers must share)
+    and queued by name for the background workers, which hash the passwords,
+    delete the file and email the report to the admin; the response is 202
+    with the job id. Passwords never reach the job table.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "A CSV file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        role = request.data.get('role') or None
+        if role is not None and role not in IMPORT_ROLES:
+            return Response({"error": "Invalid role"}, status=status.HTTP_400_BAD_REQUEST)
+        approve = str(request.data.get('approve', '')).lower() in ('1', 'true')
+
+        try:
+            text = upload.read().decode('utf-8-sig')
+            if str(request.data.get('dry_run', '')).lower() in ('1', 'true'):
+                result = import_users(io.StringIO(text, newline=''), default_role=role, approve=approve, dry_run=True)
+                return Response(result)
+            check_header(next(csv.reader(io.StringIO(text, newline='')), None))
+        except (UnicodeDecodeError, ValueError) as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload_name = default_storage.save(f'user-imports/{uuid.uuid4().hex}.csv', ContentFile(text.encode()))
+        job = enqueue(
+            'import_users_csv', upload_name=upload_name, admin_id=request.user.pk, default_role=role, approve=approve
+        )
+        return Response({"job_id": job.pk}, status=status.HTTP_202_ACCEPTED)
+
+
+class UserProfileView(ResponseCacheMixin, APIView):
     """
     API endpoint for retrieving and updating the current user's profile.
     """
     permission_classes = [IsAuthenticated]
+
+    def get_cache_scopes(self, request):
+        return [f'user:{request.user.pk}']
     
     def get(self, request):
         serializer = UserSerializer(request.user)
@@ -121,12 +252,69 @@ class ApproveUserView(APIView):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
         
         user.approved = True
-        user.save()
+        user.save(update_fields=['approved', 'updated_at'])
         
         return Response(UserSerializer(user).data)
 
+
+def _parse_bulk_user_ids(request):
+    """Read a de-duplicated list of user IDs from a bulk request, or None if invalid"""
+    user_ids = request.data.get('user_ids')
+    if not isinstance(user_ids, list) or not user_ids or len(user_ids) > BULK_MAX_USERS:
+        return None
+    try:
+        return list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    except (TypeError, ValueError):
+        return None
+
+
+class BulkUserActionView(APIView):
+    """
+    Base for the bulk user endpoints. Expects user_ids (list) and returns an
+    outcome per user.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        user_ids = _parse_bulk_user_ids(request)
+        if user_ids is None:
+            return Response(
+                {"error": f"user_ids must be a list of 1 to {BULK_MAX_USERS} user IDs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.apply(request, user_ids)
+
+
+class BulkApproveUsersView(BulkUserActionView):
+    """
+    API endpoint for admins to approve many users at once.
+    """
+    def apply(self, request, user_ids):
+        return Response(summarize(bulk_approve(user_ids, request.user)))
+
+
+class BulkRejectUsersView(BulkUserActionView):
+    """
+    API endpoint for admins to reject many users at once: they are
+    unapproved, deactivated and signed out of every device.
+    """
+    def apply(self, request, user_ids):
+        return Response(summarize(bulk_reject(user_ids, request.user)))
+
+
+class BulkUserRoleView(BulkUserActionView):
+    """
+    API endpoint for admins to change the role of many users at once.
+    Expects user_ids and role. Sellers moved to another role lose their RIB.
+    """
+    def apply(self, request, user_ids):
+        role = request.data.get('role')
+        if role not in dict(User.ROLE_CHOICES):
+            return Response({"error": "A valid role is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summarize(bulk_change_role(user_ids, role, request.user)))
+
 # Add this to users/views.py
-class UserListView(generics.ListAPIView):
+class UserListView(ConditionalGetMixin, FastListMixin, generics.ListAPIView):
     """
     API endpoint for listing users.
     GET: Admin can see all users, sellers and drivers can see only themselves.
@@ -134,6 +322,8 @@ class UserListView(generics.ListAPIView):
     """
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    values_serializer_class = UserValuesSerializer
     
     def get_queryset(self):
         user = self.request.user
@@ -167,16 +357,11 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
-    def update(self, request, *args, **kwargs):
-        print("Received data:", request.data)  # Debug statement - this shows the incoming data
-        
-        # Call the parent implementation to continue normal processing
-        return super().update(request, *args, **kwargs)
-        
+
     def perform_update(self, serializer):
         
         # Get the current user role
-        instance = self.get_object()
+        instance = serializer.instance
         current_role = instance.role
         new_role = serializer.validated_data.get('role', current_role)
     
@@ -196,7 +381,7 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
 class PasswordResetRequestView(APIView):
     """
     API endpoint for requesting a password reset.
-    Sends an email with a password reset link.
+    Queues an email with a password reset link (sent by manage.py run_workers).
     """
     def post(self, request):
         email = request.data.get('email')
@@ -214,13 +399,12 @@ class PasswordResetRequestView(APIView):
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
             reset_url = f"{frontend_url}/password-reset/confirm/{uid}/{token}/"
             
-            # Send email
-            send_mail(
-                'Password Reset Request',
-                f'Please click the link to reset your password: {reset_url}',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
+            # Sent by the background workers so SMTP never blocks the request
+            enqueue(
+                'send_email',
+                subject='Password Reset Request',
+                message=f'Please click the link to reset your password: {reset_url}',
+                recipient_list=[user.email],
             )
             
             return Response({"detail": "Password reset email has been sent."})